@@ -136,4 +136,50 @@ export class AngleCalculator {
       ctx.fillText(`${angle.toFixed(1)}°`, textX, textY)
     }
   }
+
+  // Draw an overlay returned by the backend with render=vector. Overlay
+  // coordinates are in the server's resized image space, so they are scaled
+  // to the canvas the local image is drawn on.
+  static drawOverlay(ctx, overlay, color = "#FF0000") {
+    if (!overlay) return
+
+    const scaleX = ctx.canvas.width / overlay.width
+    const scaleY = ctx.canvas.height / overlay.height
+
+    ctx.save()
+    ctx.scale(scaleX, scaleY)
+    ctx.strokeStyle = color
+    ctx.fillStyle = color
+    ctx.lineWidth = 2 / Math.min(scaleX, scaleY)
+
+    // Draw limb segments
+    overlay.segments.forEach(([x1, y1, x2, y2]) => {
+      ctx.beginPath()
+      ctx.moveTo(x1, y1)
+      ctx.lineTo(x2, y2)
+      ctx.stroke()
+    })
+
+    // Draw joints
+    overlay.points.forEach(([x, y]) => {
+      ctx.beginPath()
+      ctx.arc(x, y, 4 / Math.min(scaleX, scaleY), 0, 2 * Math.PI)
+      ctx.fill()
+    })
+
+    // Draw angle arc
+    if (overlay.arc) {
+      const { center, radius, start, end } = overlay.arc
+      ctx.beginPath()
+      ctx.arc(center[0], center[1], radius, start, end, false)
+      ctx.stroke()
+    }
+
+    // Draw angle text
+    if (overlay.label) {
+      ctx.font = `${16 / Math.min(scaleX, scaleY)}px Arial`
+      ctx.fillText(overlay.label.text, overlay.label.position[0], overlay.label.position[1])
+    }
+    ctx.restore()
+  }
 }
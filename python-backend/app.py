@@ -1,6 +1,5 @@
 import os
 import io
-import base64
 import numpy as np
 import cv2
 import mediapipe as mp
@@ -10,6 +9,8 @@ from flask_cors import CORS
 from PIL import Image
 import numpy as np
 
+from encoding import encode_image, negotiate_options
+
 class ClinicalAngleCalculator:
     @staticmethod
     def calculate_angle(p1, p2, p3):
@@ -153,6 +154,17 @@ def analyze_metrics():
     side = request.form.get('side', 'right')
     results = {}
     
+    try:
+        encode_options = negotiate_options(
+            request.headers.get('Accept'),
+            request.form.get('image_format'),
+            request.form.get('quality', type=int),
+            request.form.get('target_kb', type=int),
+            request.form.get('thumbnail', type=int)
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     required_metrics = ['ankle', 'knee', 'hipFlexion', 'R1', 'popliteal', 'R2']
     
     for metric in required_metrics:
@@ -197,13 +209,13 @@ def analyze_metrics():
         # Draw annotations
         annotated_img = draw_annotations(filtered_keypoints, processed_img, metric, angle, side)
         
-        # Convert image to base64
-        _, buffer = cv2.imencode('.png', annotated_img)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
+        # Encode as JPEG/WebP instead of full-size PNG
+        encoded = encode_image(annotated_img, encode_options)
         
         results[metric] = {
             'angle': angle,
-            'image': f"data:image/png;base64,{img_base64}"
+            'image': encoded.data_url(),
+            'encoding': encoded.report()
         }
     
     return jsonify(results)
@@ -0,0 +1,65 @@
+"""
+Benchmark annotation: mp_drawing-based draw_landmarks_and_angles against
+renderer.render_annotations (metric limb only and full skeleton).
+
+    python benchmarks/bench_annotation.py [image.jpg] [iterations]
+
+Without an image a synthetic 800x600 frame with random landmarks is used.
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+from renderer import render_annotations  # noqa: E402
+
+
+def load_inputs(path):
+    if path:
+        with open(path, "rb") as f:
+            img = main.preprocess_image(f.read())
+        main.pose_pool.ensure_ready()
+        with main.pose_pool.acquire() as pose_model:
+            landmarks = main.infer_landmarks(pose_model, img)
+        if landmarks is not None:
+            return img, landmarks
+        print("No pose detected, falling back to random landmarks")
+    else:
+        img = np.random.randint(0, 255, (800, 600, 3), dtype=np.uint8)
+    rng = np.random.default_rng(0)
+    landmarks = np.column_stack([rng.uniform(0.1, 0.9, (33, 3)), rng.uniform(0.6, 1.0, 33)]).astype(np.float32)
+    return img, landmarks
+
+
+def bench(label, fn, iterations):
+    fn()  # warm up
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    per_call = (time.perf_counter() - started) / iterations * 1000
+    print(f"{label:<40} {per_call:8.3f} ms/call")
+    return per_call
+
+
+def main_bench():
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    img, landmarks = load_inputs(path)
+    proto = main.landmarks_to_proto(landmarks)
+    print(f"Image {img.shape[1]}x{img.shape[0]}, {iterations} iterations")
+
+    baseline = bench("mp_drawing (draw_landmarks_and_angles)",
+                     lambda: main.draw_landmarks_and_angles(img, proto, 123.4, "knee", "right"), iterations)
+    limb = bench("render_annotations (metric limb)",
+                 lambda: render_annotations(img, landmarks, 123.4, "knee", "right"), iterations)
+    full = bench("render_annotations (full skeleton)",
+                 lambda: render_annotations(img, landmarks, 123.4, "knee", "right", full_skeleton=True), iterations)
+    print(f"Speedup: {baseline / limb:.1f}x (limb), {baseline / full:.1f}x (full skeleton)")
+
+
+if __name__ == "__main__":
+    main_bench()
@@ -0,0 +1,80 @@
+"""
+Peak-RSS benchmark for the frame buffer arena.
+
+Runs the preprocessing pipeline (decode, resize, RGB conversion, annotation,
+JPEG encode) without inference on a mix of synthetic photo sizes, once with
+BUFFER_ARENA_ENABLED=false and once with it enabled. Each mode runs in a fresh
+subprocess so peak RSS is measured independently.
+
+    python benchmarks/bench_buffer_arena.py [iterations] [threads]
+"""
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SIZES = [(4032, 3024), (3024, 4032), (1920, 1080), (1280, 960), (2048, 1536)]
+
+
+def worker(iterations, threads):
+    sys.path.insert(0, BACKEND_DIR)
+    import cv2
+    import numpy as np
+    import main
+    from metrics import registry
+
+    rng = np.random.default_rng(0)
+    payloads = []
+    for width, height in SIZES:
+        img = cv2.resize(rng.integers(0, 255, (height // 16, width // 16, 3), dtype=np.uint8), (width, height))
+        payloads.append(cv2.imencode(".jpg", img)[1].tobytes())
+    landmarks = np.column_stack([rng.uniform(0.1, 0.9, (33, 3)), np.ones(33)]).astype(np.float32)
+    baseline_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    def run_one(i):
+        with main.buffer_arena.lease() as buffers:
+            img = main.preprocess_image(payloads[i % len(payloads)], buffers)
+            rgb = buffers.take(img.shape)
+            cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=rgb)
+            main.build_metric_result(img, landmarks, "knee", "right", main.RENDER_RASTER, buffers)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(run_one, range(iterations)))
+    elapsed = time.perf_counter() - started
+    counters = registry.snapshot()["counters"]
+    print(json.dumps({
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "pipeline_rss_mb": (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline_rss) / 1024,
+        "ms_per_frame": elapsed / iterations * 1000,
+        "allocations": sum(counters.get("arena_allocations_total", {}).values()),
+        "reuses": sum(counters.get("arena_reuses_total", {}).values()),
+        "oversize": sum(counters.get("arena_oversize_total", {}).values()),
+    }))
+
+
+def main_bench():
+    iterations = sys.argv[1] if len(sys.argv) > 1 else "300"
+    threads = sys.argv[2] if len(sys.argv) > 2 else "4"
+    for enabled in ("false", "true"):
+        env = dict(os.environ, BUFFER_ARENA_ENABLED=enabled)
+        output = subprocess.run(
+            [sys.executable, __file__, "--worker", iterations, threads],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout.strip().splitlines()[-1]
+        stats = json.loads(output)
+        print(f"arena={enabled:<5} peak RSS {stats['peak_rss_mb']:7.1f} MB "
+              f"(+{stats['pipeline_rss_mb']:.1f} MB over imports)  "
+              f"{stats['ms_per_frame']:6.2f} ms/frame  allocations={stats['allocations']} "
+              f"reuses={stats['reuses']} unpooled={stats['oversize']}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        worker(int(sys.argv[2]), int(sys.argv[3]))
+    else:
+        main_bench()
@@ -0,0 +1,63 @@
+"""
+Benchmark serialization of a six-metric /analyze-metrics response:
+FastAPI's jsonable_encoder + JSONResponse against responses.FastJSONResponse.
+
+    python benchmarks/bench_json.py [iterations]
+"""
+import base64
+import os
+import sys
+import time
+
+import numpy as np
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from responses import FastJSONResponse  # noqa: E402
+
+METRICS = ["ankle", "knee", "hipFlexion", "R1", "popliteal", "R2"]
+
+
+def build_response(render: str):
+    rng = np.random.default_rng(0)
+    results = {}
+    for metric in METRICS:
+        keypoints = [{"name": f"LANDMARK_{i}", "x": int(rng.integers(0, 800)), "y": int(rng.integers(0, 800))}
+                     for i in range(33)]
+        result = {"angle": np.float64(rng.uniform(0, 180)), "keypoints": keypoints}
+        if render == "raster":
+            # ~100 KB JPEG per metric, which is incompressible like the real thing
+            result["image"] = "data:image/jpeg;base64," + base64.b64encode(rng.bytes(100_000)).decode()
+        else:
+            result["overlay"] = {"width": 800, "height": 600, "segments": [[1.0, 2.0, 3.0, 4.0]] * 2,
+                                 "points": [[1.0, 2.0]] * 3, "reference": None, "arc": None, "label": None}
+            result["image"] = None
+        results[metric] = result
+    return results
+
+
+def bench(label, fn, iterations):
+    fn()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        response = fn()
+    per_call = (time.perf_counter() - started) / iterations * 1000
+    encoding = dict(response.headers).get("content-encoding", "identity")
+    print(f"{label:<48} {per_call:8.3f} ms  {len(response.body):>8} bytes ({encoding})")
+
+
+def main_bench():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    for render in ("raster", "vector"):
+        content = build_response(render)
+        print(f"render={render}")
+        bench("  jsonable_encoder + JSONResponse", lambda: JSONResponse(jsonable_encoder(content)), iterations)
+        bench("  FastJSONResponse", lambda: FastJSONResponse(content), iterations)
+        bench("  FastJSONResponse (Accept-Encoding: gzip, br)",
+              lambda: FastJSONResponse(content, accept_encoding="gzip, br"), iterations)
+
+
+if __name__ == "__main__":
+    main_bench()
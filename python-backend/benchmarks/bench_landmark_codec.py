@@ -0,0 +1,91 @@
+"""
+Benchmark the quantized landmark codec and archive against the JSON list of
+dicts used in responses: bytes per frame, encode/decode throughput, random
+access latency and the round-trip error.
+
+    python benchmarks/bench_landmark_codec.py [frames]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from landmark_codec import SCALE, LandmarkArchive, LandmarkArchiveWriter  # noqa: E402
+
+NAMES = [f"LANDMARK_{i}" for i in range(33)]
+
+
+def synthetic_video(frames: int) -> list:
+    """Mostly still subject with jitter, a few movements and short pose dropouts."""
+    rng = np.random.default_rng(0)
+    base = np.column_stack([rng.uniform(0.2, 0.8, (33, 2)), rng.uniform(-0.5, 0.5, 33), rng.uniform(0, 1, 33)])
+    out = []
+    for i in range(frames):
+        phase = (i % 300) / 300
+        offset = 0.1 * np.sin(2 * np.pi * phase) if phase > 0.7 else 0.0  # moving 30% of the time
+        landmarks = base.copy()
+        landmarks[:, :2] += offset + rng.normal(0, 0.002, (33, 2))
+        landmarks[:, 2] += rng.normal(0, 0.01, 33)
+        out.append(None if i % 500 == 499 else landmarks.astype(np.float32))
+    return out
+
+
+def as_json(landmarks, width=800, height=600) -> bytes:
+    if landmarks is None:
+        return b"null"
+    return json.dumps([
+        {"name": n, "x": float(x), "y": float(y), "z": float(z), "visibility": float(v)}
+        for n, (x, y, z, v) in zip(NAMES, landmarks)
+    ]).encode()
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    video = synthetic_video(frames)
+
+    started = time.perf_counter()
+    json_bytes = sum(len(as_json(lm)) for lm in video)
+    json_seconds = time.perf_counter() - started
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "video.lmk")
+        started = time.perf_counter()
+        with LandmarkArchiveWriter(path) as writer:
+            for landmarks in video:
+                writer.append(landmarks)
+        encode_seconds = time.perf_counter() - started
+        archive_bytes = os.path.getsize(path) + os.path.getsize(path + ".idx")
+
+        with LandmarkArchive(path) as archive:
+            started = time.perf_counter()
+            decoded = list(archive.frames())
+            decode_seconds = time.perf_counter() - started
+
+            rng = np.random.default_rng(1)
+            picks = rng.integers(0, frames, 2000)
+            started = time.perf_counter()
+            for i in picks:
+                archive[int(i)]
+            random_seconds = (time.perf_counter() - started) / len(picks)
+
+            coord_error = max(float(np.abs(d[:, :3] - o[:, :3]).max()) for d, o in zip(decoded, video) if o is not None)
+            vis_error = max(float(np.abs(d[:, 3] - o[:, 3]).max()) for d, o in zip(decoded, video) if o is not None)
+            assert all((d is None) == (o is None) for d, o in zip(decoded, video))
+
+    print(f"frames                 {frames}")
+    print(f"json                   {json_bytes / frames:8.1f} bytes/frame  ({frames / json_seconds:,.0f} frames/s)")
+    print(f"archive (incl. index)  {archive_bytes / frames:8.1f} bytes/frame  ({json_bytes / archive_bytes:.1f}x smaller)")
+    print(f"encode                 {frames / encode_seconds:,.0f} frames/s")
+    print(f"sequential decode      {frames / decode_seconds:,.0f} frames/s")
+    print(f"random access          {random_seconds * 1e6:.1f} us/frame")
+    print(f"max coordinate error   {coord_error:.2e} (bound {0.5 / SCALE:.2e})")
+    print(f"max visibility error   {vis_error:.2e} (bound {0.5 / 255:.2e})")
+
+
+if __name__ == "__main__":
+    main()
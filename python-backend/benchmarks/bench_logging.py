@@ -0,0 +1,73 @@
+"""
+Benchmark the logging cost a request pays on its own thread: the previous
+setup (basicConfig, f-strings, synchronous writes) against the queued
+structured pipeline of structured_logging.py, with and without sampling.
+Output goes to a temporary file in both cases.
+
+    python benchmarks/bench_logging.py [requests]
+"""
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import structured_logging  # noqa: E402
+
+METRICS = ["ankle", "knee", "hipFlexion", "R1", "popliteal", "R2"]
+logger = logging.getLogger("bench")
+
+
+def request_before(side: str) -> None:
+    # The lines one six-image request used to log
+    logger.info(f"Processing {len(METRICS)} images for side: {side}")
+    for metric in METRICS:
+        angle = 123.456789
+        logger.info(f"Calculating angle for {metric} ({side} side)")
+        logger.info(f"Calculated angle for {metric}: {angle}")
+        logger.info(f"Successfully processed {metric}")
+
+
+def request_after(side: str) -> None:
+    # The same request now: per-image chatter at DEBUG, lazy %-style arguments
+    structured_logging.bind_request(os.urandom(8).hex())
+    logger.info("Processing %d images for side: %s", len(METRICS), side)
+    for metric in METRICS:
+        angle = 123.456789
+        structured_logging.record_stage("inference", 0.08)
+        logger.debug("Calculating angle for %s (%s side)", metric, side)
+        logger.debug("Calculated angle for %s: %s", metric, angle)
+        logger.info("Processed %s", metric)
+    logger.info("%s %s %d", "POST", "/analyze-metrics", 200, extra={"duration_ms": 250.0})
+
+
+def run(label: str, request, requests: int, finish=None) -> None:
+    started = time.perf_counter()
+    for i in range(requests):
+        request("left" if i % 2 else "right")
+    caller = time.perf_counter() - started
+    if finish is not None:
+        finish()
+    total = time.perf_counter() - started
+    print(f"{label:<40} {caller / requests * 1e6:8.1f} us/request on the caller, "
+          f"{total / requests * 1e6:8.1f} us/request including the writer")
+
+
+def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 20_000
+    with tempfile.TemporaryDirectory() as tmp:
+        with open(os.path.join(tmp, "before.log"), "w") as out:
+            handler = logging.StreamHandler(out)
+            logging.basicConfig(level=logging.INFO, handlers=[handler], force=True)
+            run("before: sync text, f-strings", request_before, requests)
+
+        for label, rates in (("after: queued json", None), ("after: queued json, INFO=0.1", {logging.INFO: 0.1})):
+            with open(os.path.join(tmp, "after.log"), "w") as out:
+                listener = structured_logging.configure("INFO", "json", rates, queue_size=1_000_000, stream=out)
+                run(label, request_after, requests, lambda: structured_logging.shutdown(listener))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+Benchmark the measurement store: write-behind insert throughput and
+paginated history queries over a few million rows.
+
+    python benchmarks/bench_measurements.py [rows] [patients]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from measurement_store import Measurement, MeasurementStore  # noqa: E402
+
+METRICS = ["ankle", "knee", "hipFlexion", "R1", "popliteal", "R2"]
+
+
+def fill(store: MeasurementStore, rows: int, patients: int) -> float:
+    rng = np.random.default_rng(0)
+    landmarks = rng.random((33, 4), dtype=np.float32)
+    start_time = time.time() - 365 * 86400
+    started = time.perf_counter()
+    for i in range(rows):
+        measurement = Measurement(
+            patient_id=f"patient-{i % patients}",
+            metric=METRICS[(i // patients) % len(METRICS)],
+            side="right" if (i // (patients * len(METRICS))) % 2 else "left",
+            angle=float(i % 180),
+            confidence=0.9,
+            landmarks=landmarks,
+            created_at=start_time + i * (365 * 86400 / rows),
+        )
+        while not store.record(measurement):
+            time.sleep(0.001)  # Queue full: let the writer catch up
+    store.stop(timeout=600)
+    return time.perf_counter() - started
+
+
+def time_query(label: str, fn, repeat: int = 200) -> None:
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeat):
+        page = fn()
+    elapsed = (time.perf_counter() - started) / repeat
+    print(f"{label:<44} {elapsed * 1000:8.3f} ms  ({len(page['items'])} rows)")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    patients = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    with tempfile.TemporaryDirectory() as tmp:
+        store = MeasurementStore(os.path.join(tmp, "measurements.sqlite3"), max_queue=50_000)
+        store.start()
+        elapsed = fill(store, rows, patients)
+        size_mb = os.path.getsize(os.path.join(tmp, "measurements.sqlite3")) / 1e6
+        print(f"inserted {rows} rows for {patients} patients in {elapsed:.1f} s "
+              f"({rows / elapsed:,.0f} rows/s, {size_mb:.0f} MB)")
+
+        patient = f"patient-{patients // 2}"
+        time_query("latest 50, all metrics", lambda: store.history(patient))
+        time_query("latest 50, knee", lambda: store.history(patient, metric="knee"))
+        time_query("knee, right side, last 180 days", lambda: store.history(
+            patient, metric="knee", side="right", since=time.time() - 180 * 86400, limit=200))
+        cursor = store.history(patient, limit=100)["next_cursor"]
+        time_query("second page via cursor", lambda: store.history(patient, limit=100, cursor=cursor))
+        time_query("latest 50 with landmarks", lambda: store.history(patient, include_landmarks=True))
+        time_query("unknown patient", lambda: store.history("nobody"))
+
+
+if __name__ == "__main__":
+    main()
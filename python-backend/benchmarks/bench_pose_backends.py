@@ -0,0 +1,168 @@
+"""
+Benchmark the Tasks PoseLandmarker backend against the legacy mp.solutions
+backend: single-image latency, landmark agreement, and sustained video
+throughput in each backend's video and live-stream modes.
+
+    python benchmarks/bench_pose_backends.py video.mp4 [image.jpg ...] [--frames 300] [--repeats 20]
+        [--model-dir DIR]
+
+The Tasks bundle comes from --model-dir (a MODEL_DIR, see model_registry.py)
+or is built from the installed mediapipe's models in a temporary directory.
+Live streams are fed at the video's frame rate.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import (ModelRegistry, mediapipe_model_path, pose_landmarker_model,  # noqa: E402
+                            write_task_bundle)
+from pose_backends import SolutionsBackend, TasksBackend  # noqa: E402
+
+SIZE = 512  # main.preprocess_image's default max_size
+COMPLEXITY = 1
+
+
+def fit(img_bgr):
+    h, w = img_bgr.shape[:2]
+    scale = min(1.0, SIZE / max(h, w))
+    if scale < 1.0:
+        img_bgr = cv2.resize(img_bgr, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+
+
+def read_video(path, limit):
+    capture = cv2.VideoCapture(path)
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = []
+    while len(frames) < limit:
+        ok, frame = capture.read()
+        if not ok:
+            break
+        frames.append(fit(frame))
+    capture.release()
+    return frames, fps
+
+
+def bundle_path(model_dir, scratch):
+    name = pose_landmarker_model(COMPLEXITY)
+    if model_dir:
+        model_registry = ModelRegistry(model_dir)
+        model_registry.verify([name])
+        return model_registry.path(name)
+    path = os.path.join(scratch, name + ".task")
+    write_task_bundle(mediapipe_model_path("pose_detection"), mediapipe_model_path("pose_landmark_full"), path)
+    return path
+
+
+def latency(backend, images, repeats):
+    """Per-call milliseconds (median, p95) of infer over images, after a warm-up pass."""
+    for img in images:
+        backend.infer(img)
+    samples = []
+    for _ in range(repeats):
+        for img in images:
+            started = time.perf_counter()
+            backend.infer(img)
+            samples.append((time.perf_counter() - started) * 1000)
+    return np.median(samples), np.percentile(samples, 95)
+
+
+def video_throughput(backend, frames, fps):
+    """Frames per second through a video session, and the landmarks of every frame."""
+    with backend.video() as video:
+        video.infer(frames[0], 0)  # Warm up; the session's clock then starts after it
+        started = time.perf_counter()
+        landmarks = [video.infer(frame, round((i + 1) * 1000 / fps)) for i, frame in enumerate(frames)]
+        seconds = time.perf_counter() - started
+    return len(frames) / seconds, landmarks
+
+
+def live_throughput(backend, frames, fps):
+    """Results per second and the share of frames answered, feeding frames in real time."""
+    results = []  # Arrival times
+    done = threading.Event()
+
+    def on_result(timestamp_ms, landmarks):
+        results.append(time.perf_counter())
+        if timestamp_ms >= last_timestamp:
+            done.set()
+
+    last_timestamp = round((len(frames) - 1) * 1000 / fps)
+    with backend.live_stream(on_result) as stream:
+        started = time.perf_counter()
+        for i, frame in enumerate(frames):
+            delay = started + i / fps - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            stream.send(frame, round(i * 1000 / fps))
+        done.wait(5)  # The last frame may have been skipped
+    seconds = max(results[-1] - started, len(frames) / fps) if results else len(frames) / fps
+    return len(results) / seconds, len(results) / len(frames)
+
+
+def mean_distance(a, b):
+    pairs = [(x, y) for x, y in zip(a, b) if x is not None and y is not None]
+    if not pairs:
+        return float("nan")
+    return float(np.mean([np.linalg.norm(x[:, :2] - y[:, :2], axis=1).mean() for x, y in pairs]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("video")
+    parser.add_argument("images", nargs="*")
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--model-dir", default="")
+    args = parser.parse_args()
+
+    frames, fps = read_video(args.video, args.frames)
+    if not frames:
+        sys.exit(f"Could not read {args.video}")
+    images = [fit(cv2.imread(path)) for path in args.images] or frames[::max(1, len(frames) // 8)][:8]
+
+    with tempfile.TemporaryDirectory() as scratch:
+        started = time.perf_counter()
+        legacy = SolutionsBackend(static_image_mode=True, model_complexity=COMPLEXITY, min_detection_confidence=0.5)
+        legacy_load = time.perf_counter() - started
+        started = time.perf_counter()
+        tasks = TasksBackend(bundle_path(args.model_dir, scratch))
+        tasks_load = time.perf_counter() - started
+        tracking = SolutionsBackend(static_image_mode=False, model_complexity=COMPLEXITY, min_detection_confidence=0.5)
+        h, w = frames[0].shape[:2]
+        print(f"{len(images)} images, {len(frames)} video frames of {w}x{h} at {fps:.0f} fps")
+        print(f"Load: mediapipe {legacy_load * 1000:.0f} ms, tasks {tasks_load * 1000:.0f} ms")
+
+        print(f"\n{'single image':<38}{'median ms':>10}{'p95 ms':>10}")
+        for label, backend in (("mediapipe", legacy), ("tasks (IMAGE)", tasks)):
+            median, p95 = latency(backend, images, args.repeats)
+            print(f"{label:<38}{median:>10.2f}{p95:>10.2f}")
+        agreement = mean_distance([legacy.infer(img) for img in images], [tasks.infer(img) for img in images])
+        print(f"Mean |dxy| tasks vs mediapipe: {agreement:.5f}")
+
+        print(f"\n{'video':<38}{'frames/s':>10}{'|dxy|':>10}   (|dxy| vs mediapipe per frame)")
+        reference_fps, reference = video_throughput(legacy, frames, fps)
+        print(f"{'mediapipe (per frame)':<38}{reference_fps:>10.1f}{0:>10.4f}")
+        for label, backend in (("mediapipe (static_image_mode=False)", tracking), ("tasks (VIDEO)", tasks)):
+            rate, landmarks = video_throughput(backend, frames, fps)
+            print(f"{label:<38}{rate:>10.1f}{mean_distance(reference, landmarks):>10.4f}")
+
+        print(f"\n{'live stream at %.0f fps' % fps:<38}{'results/s':>10}{'answered':>10}")
+        for label, backend in (("mediapipe (background thread)", legacy), ("tasks (LIVE_STREAM)", tasks)):
+            rate, answered = live_throughput(backend, frames, fps)
+            print(f"{label:<38}{rate:>10.1f}{answered:>10.0%}")
+
+        for backend in (legacy, tasks, tracking):
+            backend.close()
+
+
+if __name__ == "__main__":
+    main()
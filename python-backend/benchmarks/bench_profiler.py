@@ -0,0 +1,70 @@
+"""
+Measure what the always-on stack sampler costs: throughput of a CPU-bound,
+multi-threaded workload with the sampler off and on at several intervals,
+next to the overhead the sampler reports for itself (and caps).
+
+    python benchmarks/bench_profiler.py [seconds] [threads]
+"""
+import os
+import statistics
+import sys
+import threading
+import time
+
+os.environ.setdefault("OPENBLAS_NUM_THREADS", "1")  # Keep BLAS threads out of the measurement
+
+import numpy as np  # noqa: E402
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from profiler import StackSampler  # noqa: E402
+
+
+def work(depth: int = 20) -> float:
+    # Some Python frames on the stack, like a request handler, and some numpy
+    if depth:
+        return work(depth - 1)
+    a = np.random.default_rng(0).random((64, 64))
+    return float(sum(sum(row) for row in (a @ a).tolist()))
+
+
+def throughput(seconds: float, threads: int) -> float:
+    done = [0] * threads
+    stop = time.monotonic() + seconds
+
+    def loop(i):
+        while time.monotonic() < stop:
+            work()
+            done[i] += 1
+
+    workers = [threading.Thread(target=loop, args=(i,), name=f"pose_{i}") for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return sum(done) / seconds
+
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    threads = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    rounds = 7
+    throughput(seconds, threads)  # Warm up
+    for interval_ms, max_overhead in ((10, 0.01), (1, 0.01), (1, 1.0)):
+        # Alternate runs with and without the sampler; machine noise drifts more than the effect
+        slowdowns = []
+        sampler = StackSampler(interval=interval_ms / 1000, max_overhead=max_overhead)
+        for _ in range(rounds):
+            off = throughput(seconds, threads)
+            sampler.start()
+            on = throughput(seconds, threads)
+            sampler.stop()
+            slowdowns.append(1 - on / off)
+        cap = "uncapped" if max_overhead >= 1 else f"cap {max_overhead:.0%}"
+        print(f"{f'{interval_ms} ms, {cap}':<20} median slowdown {statistics.median(slowdowns):6.2%}  "
+              f"reported overhead {sampler.overhead:6.2%}  final interval {sampler.interval * 1000:5.1f} ms  "
+              f"samples {sampler.samples}")
+
+
+if __name__ == "__main__":
+    main()
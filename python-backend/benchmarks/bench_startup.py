@@ -0,0 +1,108 @@
+"""
+Measure cold start: time until the port accepts connections and /healthz
+answers (time-to-listen) and until /readyz reports the API and first pose
+model loaded (time-to-ready), for the staged entry point (server.py) and for
+running main.py directly. Also lists the slowest imports of the API module
+from python -X importtime.
+
+    python benchmarks/bench_startup.py [runs] [--inference-mode thread|process]
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def status(port: int, path: str) -> int:
+    try:
+        with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=1) as response:
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+    except OSError:
+        return 0
+
+
+def start(command, port: int, env) -> subprocess.Popen:
+    env = dict(env, PORT=str(port))
+    return subprocess.Popen(command, cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def measure(command, env, ready_path: str, timeout: float = 120):
+    """(time-to-listen, time-to-ready) in seconds of one cold start."""
+    port = free_port()
+    started = time.perf_counter()
+    process = start(command, port, env)
+    listen = ready = None
+    try:
+        while time.perf_counter() - started < timeout and process.poll() is None:
+            if listen is None and status(port, "/healthz"):  # Any answer, main.py has no /healthz
+                listen = time.perf_counter() - started
+            if listen is not None and status(port, ready_path) == 200:
+                ready = time.perf_counter() - started
+                break
+            time.sleep(0.01)
+    finally:
+        process.terminate()
+        try:
+            process.wait(15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return listen, ready
+
+
+def import_profile(limit: int = 12):
+    """Slowest cumulative imports of main, from python -X importtime."""
+    output = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND,
+                            capture_output=True, text=True).stderr
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative), name.rstrip()))
+    return sorted(rows, reverse=True)[:limit]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("runs", type=int, nargs="?", default=3)
+    parser.add_argument("--inference-mode", default="thread", choices=("thread", "process"))
+    args = parser.parse_args()
+    env = dict(os.environ, INFERENCE_MODE=args.inference_mode, PROFILER_ENABLED="0",
+               RESULT_CACHE_BACKEND="memory", JOB_DB_PATH=":memory:", MEASUREMENT_DB_PATH=":memory:")
+
+    print("Slowest imports of main (cumulative ms):")
+    for cumulative, name in import_profile():
+        print(f"  {cumulative / 1000:8.1f}  {name}")
+
+    # main.py has no /readyz: it is ready once it answers at all, its model loads on the first request
+    entry_points = (
+        ("server.py (staged)", [sys.executable, "server.py"], "/readyz"),
+        ("uvicorn main:app", [sys.executable, "-c",
+                              "import os, uvicorn, main; uvicorn.run(main.app, port=int(os.environ['PORT']))"], "/"),
+    )
+    print(f"\n{'entry point':<22}{'listen s':>10}{'ready s':>10}   (median of {args.runs}, INFERENCE_MODE={args.inference_mode})")
+    for name, command, ready_path in entry_points:
+        runs = [measure(command, env, ready_path) for _ in range(args.runs)]
+        listens = sorted(r[0] for r in runs if r[0] is not None)
+        readies = sorted(r[1] for r in runs if r[1] is not None)
+        listen = f"{listens[len(listens) // 2]:.2f}" if listens else "-"
+        ready = f"{readies[len(readies) // 2]:.2f}" if readies else "-"
+        print(f"{name:<22}{listen:>10}{ready:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark the TFLite pose engine against the MediaPipe graph (mp.solutions.pose
+in static image mode): landmark agreement on the same images, then throughput
+of the graph and the engine, one image at a time.
+
+    python benchmarks/bench_tflite_engine.py [image.jpg | video.mp4 ...] [--frames 32]
+        [--threads 1] [--no-xnnpack] [--model-dir DIR]
+
+Videos contribute up to --frames evenly spaced frames. Models come from
+--model-dir (a MODEL_DIR, see model_registry.py) or the mediapipe package.
+"""
+import argparse
+import os
+import sys
+import time
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from model_registry import ModelRegistry, mediapipe_model_path, pose_models  # noqa: E402
+from tflite_engine import TFLiteLandmarkEngine  # noqa: E402
+
+SIZE = 512  # main.preprocess_image's default max_size
+
+
+def fit(img_bgr):
+    h, w = img_bgr.shape[:2]
+    scale = min(1.0, SIZE / max(h, w))
+    if scale < 1.0:
+        img_bgr = cv2.resize(img_bgr, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+    return cv2.cvtColor(img_bgr, cv2.COLOR_BGR2RGB)
+
+
+def load_images(paths, frames):
+    images = []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is not None:
+            images.append(fit(img))
+            continue
+        capture = cv2.VideoCapture(path)
+        total = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        for index in np.linspace(0, max(total - 1, 0), min(frames, max(total, 1))).astype(int):
+            capture.set(cv2.CAP_PROP_POS_FRAMES, int(index))
+            ok, img = capture.read()
+            if ok:
+                images.append(fit(img))
+        capture.release()
+    if not images:
+        rng = np.random.default_rng(0)
+        images = [rng.integers(0, 255, (SIZE, SIZE, 3), dtype=np.uint8) for _ in range(frames)]
+        print("No images given or readable, using noise (throughput only)")
+    return images
+
+
+def model_paths(model_dir):
+    names = pose_models(1)
+    if model_dir:
+        model_registry = ModelRegistry(model_dir)
+        model_registry.verify(names)
+        return [model_registry.path(name) for name in names]
+    return [mediapipe_model_path(name) for name in names]
+
+
+def mediapipe_landmarks(pose, img):
+    results = pose.process(img)
+    if not results.pose_landmarks:
+        return None
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in results.pose_landmarks.landmark], dtype=np.float32)
+
+
+def timed(fn, repeats=3):
+    """Best wall time of fn over repeats, in seconds."""
+    fn()  # warm up
+    best = float("inf")
+    for _ in range(repeats):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("inputs", nargs="*")
+    parser.add_argument("--frames", type=int, default=32)
+    parser.add_argument("--threads", type=int, default=1)
+    parser.add_argument("--no-xnnpack", action="store_true")
+    parser.add_argument("--model-dir", default="")
+    args = parser.parse_args()
+
+    import mediapipe as mp
+
+    images = load_images(args.inputs, args.frames)
+    detector, landmarks = model_paths(args.model_dir)
+    engine = TFLiteLandmarkEngine(detector, landmarks, num_threads=args.threads, use_xnnpack=not args.no_xnnpack)
+    pose = mp.solutions.pose.Pose(static_image_mode=True, model_complexity=1, min_detection_confidence=0.5)
+    print(f"{len(images)} images, {args.threads} threads, xnnpack {'off' if args.no_xnnpack else 'on'}")
+
+    # Agreement
+    reference = [mediapipe_landmarks(pose, img) for img in images]
+    single = [engine.infer(img) for img in images]
+    both = [(r, s) for r, s in zip(reference, single) if r is not None and s is not None]
+    print(f"\nPoses found: mediapipe {sum(r is not None for r in reference)}, "
+          f"engine {sum(s is not None for s in single)}, both {len(both)}")
+    if both:
+        xy = np.concatenate([np.linalg.norm(r[:, :2] - s[:, :2], axis=1) for r, s in both])
+        per_image = np.array([np.linalg.norm(r[:, :2] - s[:, :2], axis=1).mean() for r, s in both])
+        visibility = np.concatenate([np.abs(r[:, 3] - s[:, 3]) for r, s in both])
+        print(f"|dxy| (image fraction)   mean {xy.mean():.4f}  p95 {np.percentile(xy, 95):.4f}  max {xy.max():.4f}")
+        print(f"per-image mean |dxy|     median {np.median(per_image):.4f}  max {per_image.max():.4f}")
+        print(f"|dvisibility|            mean {visibility.mean():.4f}  p95 {np.percentile(visibility, 95):.4f}  "
+              f"max {visibility.max():.4f}")
+
+    # Throughput
+    print(f"\n{'':<28}{'ms/image':>10}{'images/s':>10}")
+
+    def row(label, seconds):
+        per_image = seconds / len(images)
+        print(f"{label:<28}{per_image * 1000:>10.2f}{1 / per_image:>10.1f}")
+        return per_image
+
+    baseline = row("mediapipe graph", timed(lambda: [pose.process(img) for img in images]))
+    per_image = row("engine.infer", timed(lambda: [engine.infer(img) for img in images]))
+    print(f"Speedup: {baseline / per_image:.2f}x")
+    pose.close()
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import threading
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+
+from metrics import registry
+
+MIN_CLASS_BYTES = 64 * 1024
+
+
+def size_class(nbytes: int) -> int:
+    """
+    Round up to the next class boundary, at least MIN_CLASS_BYTES. Each power of
+    two is split into 8 classes, so at most 12.5% of a buffer is wasted.
+    """
+    nbytes = max(nbytes, MIN_CLASS_BYTES)
+    step = 1 << max(0, (nbytes - 1).bit_length() - 4)
+    return -(-nbytes // step) * step
+
+
+class BufferArena:
+    """
+    Pool of preallocated byte buffers in size classes.
+
+    Frames up to max_bytes are served as views into pooled buffers so the
+    resize / color conversion / annotation stages stop allocating fresh
+    arrays per request. Larger requests fall back to a plain allocation.
+    Idle buffers are kept up to max_per_class per class and max_pooled_bytes
+    in total; anything beyond that is freed on release.
+    """
+
+    def __init__(self, max_bytes: int, max_per_class: int, max_pooled_bytes: int, enabled: bool = True):
+        self.max_class = size_class(max_bytes)
+        self.max_per_class = max_per_class
+        self.max_pooled_bytes = max_pooled_bytes
+        self.enabled = enabled
+        self._free: Dict[int, List[np.ndarray]] = defaultdict(list)
+        self._lock = threading.Lock()
+        self.pooled_bytes = 0
+
+    def acquire(self, nbytes: int) -> np.ndarray:
+        cls = size_class(nbytes)
+        if not self.enabled or cls > self.max_class:
+            registry.inc("arena_oversize_total")
+            return np.empty(nbytes, dtype=np.uint8)
+        with self._lock:
+            free = self._free[cls]
+            if free:
+                self.pooled_bytes -= cls
+                registry.inc("arena_reuses_total", size_class=cls)
+                return free.pop()
+        registry.inc("arena_allocations_total", size_class=cls)
+        return np.empty(cls, dtype=np.uint8)
+
+    def release(self, buffer: np.ndarray) -> None:
+        cls = buffer.nbytes
+        if not self.enabled or cls != size_class(cls) or cls > self.max_class:
+            return
+        with self._lock:
+            free = self._free[cls]
+            if len(free) < self.max_per_class and self.pooled_bytes + cls <= self.max_pooled_bytes:
+                free.append(buffer)
+                self.pooled_bytes += cls
+            registry.set_gauge("arena_pooled_bytes", self.pooled_bytes)
+
+    def lease(self) -> "BufferLease":
+        return BufferLease(self)
+
+
+class BufferLease:
+    """Buffers held by one job; all are returned to the arena on release."""
+
+    def __init__(self, arena: BufferArena):
+        self._arena = arena
+        self._held: List[np.ndarray] = []
+
+    def take(self, shape, dtype=np.uint8) -> np.ndarray:
+        dtype = np.dtype(dtype)
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        buffer = self._arena.acquire(nbytes)
+        self._held.append(buffer)
+        return buffer[:nbytes].view(dtype).reshape(shape)
+
+    def release(self) -> None:
+        for buffer in self._held:
+            self._arena.release(buffer)
+        self._held.clear()
+
+    def __enter__(self) -> "BufferLease":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
@@ -0,0 +1,38 @@
+import threading
+from typing import Optional
+
+
+class CancellationToken:
+    """
+    Thread-safe flag shared between a request and the worker jobs it submitted.
+
+    A token created with a parent is also cancelled when the parent is, so one
+    job can be cancelled on its own without affecting the rest of the request.
+    """
+
+    def __init__(self, parent: Optional["CancellationToken"] = None):
+        self._event = threading.Event()
+        self._reason: Optional[str] = None
+        self.parent = parent
+
+    def cancel(self, reason: str) -> bool:
+        """Cancel with the given reason. Returns False if already cancelled."""
+        if self._event.is_set():
+            return False
+        self._reason = reason
+        self._event.set()
+        return True
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set() or (self.parent is not None and self.parent.cancelled)
+
+    @property
+    def reason(self) -> Optional[str]:
+        if self._event.is_set():
+            return self._reason
+        return self.parent.reason if self.parent is not None else None
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client went away before its results were ready."""
@@ -0,0 +1,147 @@
+import os
+import tempfile
+
+# Server settings, overridable through environment variables
+
+# Session store: uploaded images and their landmarks kept between requests
+SESSION_TTL_SECONDS = int(os.environ.get("SESSION_TTL_SECONDS", "1800"))
+SESSION_MAX_MEMORY_MB = int(os.environ.get("SESSION_MAX_MEMORY_MB", "256"))
+SESSION_SPILL_DIR = os.environ.get(
+    "SESSION_SPILL_DIR", os.path.join(tempfile.gettempdir(), "pose-sessions")
+)
+
+# Logging (see structured_logging.py): json or text lines written by a background
+# thread; LOG_SAMPLE_RATES keeps a share of requests' lines below WARNING, e.g. "INFO=0.1"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+LOG_SAMPLE_RATES = os.environ.get("LOG_SAMPLE_RATES", "")
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+
+# Admin endpoints (/admin/...) and per-request profiling require this token in
+# X-Admin-Token; they are disabled while it is empty
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# Always-on sampling profiler (see profiler.py); the interval is stretched to keep
+# the sampling overhead under PROFILER_MAX_OVERHEAD of wall time
+PROFILER_ENABLED = os.environ.get("PROFILER_ENABLED", "true").lower() == "true"
+PROFILER_INTERVAL_MS = float(os.environ.get("PROFILER_INTERVAL_MS", "10"))
+PROFILER_MAX_OVERHEAD = float(os.environ.get("PROFILER_MAX_OVERHEAD", "0.01"))
+PROFILER_WINDOW_SECONDS = float(os.environ.get("PROFILER_WINDOW_SECONDS", "300"))
+PROFILER_DIR = os.environ.get("PROFILER_DIR", os.path.join(tempfile.gettempdir(), "pose-profiles"))
+
+# Number of MediaPipe Pose instances (and inference threads)
+POSE_POOL_SIZE = int(os.environ.get("POSE_POOL_SIZE", "1"))
+
+# Pose landmark model: 0 lite, 1 full, 2 heavy (more accurate, slower, more memory)
+POSE_MODEL_COMPLEXITY = int(os.environ.get("POSE_MODEL_COMPLEXITY", "1"))
+
+# Pose engine (see pose_backends.py): "mediapipe" (the mp.solutions graph),
+# "tflite" (the same models run directly, see tflite_engine.py;
+# needs tflite-runtime) or "tasks" (the Tasks PoseLandmarker, which tracks the
+# pose through videos; needs MODEL_DIR)
+POSE_ENGINE = os.environ.get("POSE_ENGINE", "mediapipe")
+TFLITE_THREADS = int(os.environ.get("TFLITE_THREADS", "1"))
+TFLITE_XNNPACK = os.environ.get("TFLITE_XNNPACK", "true").lower() == "true"
+
+# Local model directory with a manifest.json of checksums (see model_registry.py).
+# When set, every pose model is verified at startup and nothing is downloaded;
+# when empty, MediaPipe loads its bundled models and fetches lite/heavy on first use
+MODEL_DIR = os.environ.get("MODEL_DIR", "")
+
+# Where pose inference runs: "process" (worker processes, see inference_workers.py)
+# or "thread" (in the server process). Process workers beyond POSE_POOL_SIZE are
+# spares, so a recycled worker is replaced without anyone waiting for a cold one
+INFERENCE_MODE = os.environ.get("INFERENCE_MODE", "process")
+INFERENCE_SPARE_WORKERS = int(os.environ.get("INFERENCE_SPARE_WORKERS", "1"))
+INFERENCE_TIMEOUT_SECONDS = float(os.environ.get("INFERENCE_TIMEOUT_SECONDS", "10"))
+INFERENCE_WORKER_MAX_JOBS = int(os.environ.get("INFERENCE_WORKER_MAX_JOBS", "1000"))
+INFERENCE_WORKER_MAX_RSS_MB = int(os.environ.get("INFERENCE_WORKER_MAX_RSS_MB", "1024"))
+
+# How often a running request checks whether its client is still connected
+DISCONNECT_POLL_SECONDS = float(os.environ.get("DISCONNECT_POLL_SECONDS", "0.1"))
+
+# Annotate the full skeleton instead of only the limb the metric measures
+ANNOTATE_FULL_SKELETON = os.environ.get("ANNOTATE_FULL_SKELETON", "false").lower() == "true"
+
+# Longest image side after preprocessing
+MAX_IMAGE_DIM = int(os.environ.get("MAX_IMAGE_DIM", "800"))
+
+# Pooled frame buffers (see buffer_arena.py). Off by default: in
+# benchmarks/bench_buffer_arena.py the pool raised peak RSS more than it saved
+BUFFER_ARENA_ENABLED = os.environ.get("BUFFER_ARENA_ENABLED", "false").lower() == "true"
+BUFFER_ARENA_MAX_PER_CLASS = int(os.environ.get("BUFFER_ARENA_MAX_PER_CLASS", "8"))
+BUFFER_ARENA_MAX_POOLED_MB = int(os.environ.get("BUFFER_ARENA_MAX_POOLED_MB", "32"))
+
+# Upper bound on encodes per image when searching quality for a byte target
+ENCODE_MAX_TRIALS = int(os.environ.get("ENCODE_MAX_TRIALS", "6"))
+
+# Response compression (see responses.py)
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+COMPRESS_MAX_IMAGE_FRACTION = float(os.environ.get("COMPRESS_MAX_IMAGE_FRACTION", "0.5"))
+GZIP_LEVEL = int(os.environ.get("GZIP_LEVEL", "5"))
+BROTLI_QUALITY = int(os.environ.get("BROTLI_QUALITY", "4"))
+
+# Background analysis jobs (see job_queue.py); use ":memory:" for a throwaway queue
+JOB_DB_PATH = os.environ.get("JOB_DB_PATH", os.path.join(tempfile.gettempdir(), "pose-jobs.sqlite3"))
+JOB_CONCURRENCY = int(os.environ.get("JOB_CONCURRENCY", "1"))
+JOB_POLL_SECONDS = float(os.environ.get("JOB_POLL_SECONDS", "1.0"))
+JOB_RESULT_TTL_SECONDS = int(os.environ.get("JOB_RESULT_TTL_SECONDS", "86400"))
+JOB_MAX_WAIT_SECONDS = float(os.environ.get("JOB_MAX_WAIT_SECONDS", "30"))
+# Running jobs are leased to the process that claimed them; other processes sharing
+# JOB_DB_PATH requeue a job only once its lease has gone this long without renewal
+JOB_LEASE_SECONDS = float(os.environ.get("JOB_LEASE_SECONDS", "60"))
+
+# Result cache (see result_cache.py): an in-process LRU in front of a shared tier.
+# RESULT_CACHE_BACKEND is "disk" (SQLite file shared by all workers on the host),
+# "redis" (RESULT_CACHE_REDIS_URL, shared across hosts), "memory" or "none".
+RESULT_CACHE_BACKEND = os.environ.get("RESULT_CACHE_BACKEND", "disk").lower()
+RESULT_CACHE_MEMORY_MB = int(os.environ.get("RESULT_CACHE_MEMORY_MB", "32"))
+RESULT_CACHE_PATH = os.environ.get(
+    "RESULT_CACHE_PATH", os.path.join(tempfile.gettempdir(), "pose-cache.sqlite3")
+)
+RESULT_CACHE_MAX_MB = int(os.environ.get("RESULT_CACHE_MAX_MB", "1024"))
+RESULT_CACHE_REDIS_URL = os.environ.get("RESULT_CACHE_REDIS_URL", "redis://localhost:6379/0")
+RESULT_CACHE_TTL_SECONDS = int(os.environ.get("RESULT_CACHE_TTL_SECONDS", "86400"))
+
+# Near-duplicate uploads (see phash.py): within a session, reuse landmarks of an
+# earlier image of the same metric and side whose perceptual hash is within
+# PHASH_MAX_DISTANCE bits, once the patches around the metric's joints differ by at
+# most PHASH_MAX_PATCH_DIFF gray levels (re-encodes stay below 3, a moved limb ~20)
+PHASH_ENABLED = os.environ.get("PHASH_ENABLED", "false").lower() == "true"
+PHASH_MAX_DISTANCE = int(os.environ.get("PHASH_MAX_DISTANCE", "4"))
+PHASH_MAX_PATCH_DIFF = float(os.environ.get("PHASH_MAX_PATCH_DIFF", "6"))
+PHASH_INDEX_SIZE = int(os.environ.get("PHASH_INDEX_SIZE", "4096"))
+
+# Pre-inference image quality gate (see quality_gate.py)
+QUALITY_GATE_ENABLED = os.environ.get("QUALITY_GATE_ENABLED", "true").lower() == "true"
+QUALITY_MIN_DIM = int(os.environ.get("QUALITY_MIN_DIM", "200"))
+QUALITY_MIN_SHARPNESS = float(os.environ.get("QUALITY_MIN_SHARPNESS", "10"))
+QUALITY_MIN_BRIGHTNESS = float(os.environ.get("QUALITY_MIN_BRIGHTNESS", "35"))
+QUALITY_MAX_BRIGHTNESS = float(os.environ.get("QUALITY_MAX_BRIGHTNESS", "225"))
+QUALITY_MIN_COVERAGE = float(os.environ.get("QUALITY_MIN_COVERAGE", "0.1"))
+
+# Bursts: several uploads for one metric. Stop at the first shot whose required
+# landmarks all have at least this visibility; extra shots beyond the limit are ignored
+BURST_MIN_VISIBILITY = float(os.environ.get("BURST_MIN_VISIBILITY", "0.8"))
+BURST_MAX_SHOTS = int(os.environ.get("BURST_MAX_SHOTS", "8"))
+
+# Video analysis (see keyframes.py): inference only on keyframes, Kalman-filtered in between
+KEYFRAME_MAX_SKIP = int(os.environ.get("KEYFRAME_MAX_SKIP", "10"))
+KEYFRAME_DIFF_THRESHOLD = float(os.environ.get("KEYFRAME_DIFF_THRESHOLD", "6.0"))
+KEYFRAME_MOTION_THRESHOLD = float(os.environ.get("KEYFRAME_MOTION_THRESHOLD", "0.02"))
+VIDEO_MAX_FRAMES = int(os.environ.get("VIDEO_MAX_FRAMES", "1800"))
+# Per-frame video landmarks are kept in quantized archives (see landmark_codec.py)
+LANDMARK_ARCHIVE_DIR = os.environ.get(
+    "LANDMARK_ARCHIVE_DIR", os.path.join(tempfile.gettempdir(), "pose-landmark-archives")
+)
+LANDMARK_KEYFRAME_INTERVAL = int(os.environ.get("LANDMARK_KEYFRAME_INTERVAL", "30"))
+
+# Longitudinal measurement store (see measurement_store.py), written behind the request path
+MEASUREMENT_DB_PATH = os.environ.get(
+    "MEASUREMENT_DB_PATH", os.path.join(tempfile.gettempdir(), "pose-measurements.sqlite3")
+)
+MEASUREMENT_BATCH_SIZE = int(os.environ.get("MEASUREMENT_BATCH_SIZE", "500"))
+MEASUREMENT_FLUSH_SECONDS = float(os.environ.get("MEASUREMENT_FLUSH_SECONDS", "0.5"))
+MEASUREMENT_QUEUE_SIZE = int(os.environ.get("MEASUREMENT_QUEUE_SIZE", "10000"))
+# Rows per Arrow batch / Parquet row group in exports (bounds export memory)
+EXPORT_BATCH_ROWS = int(os.environ.get("EXPORT_BATCH_ROWS", "10000"))
@@ -0,0 +1,56 @@
+import threading
+import time
+from typing import Dict, Optional
+
+# Per-request time budget passed through each pipeline stage
+
+
+class StageEstimator:
+    """Exponentially weighted moving average of recent stage durations."""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._estimates: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            previous = self._estimates.get(stage)
+            self._estimates[stage] = seconds if previous is None else previous + self.alpha * (seconds - previous)
+
+    def estimate(self, stage: str) -> float:
+        return self._estimates.get(stage, 0.0)
+
+
+stage_estimates = StageEstimator()
+
+
+class Deadline:
+    def __init__(self, budget_seconds: float):
+        self.budget_seconds = budget_seconds
+        self.expires_at = time.monotonic() + budget_seconds
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def can_start(self, stage: str) -> bool:
+        """A stage may start only if its typical duration still fits in the budget."""
+        return self.remaining() > stage_estimates.estimate(stage)
+
+    @classmethod
+    def from_request(cls, header_ms: Optional[str], form_ms: Optional[str]) -> Optional["Deadline"]:
+        """
+        Build a deadline from the X-Request-Deadline-Ms header or the deadline_ms
+        form field (header wins). Returns None when neither is set.
+        :raises ValueError: if the value is not a positive number of milliseconds
+        """
+        raw = header_ms if header_ms not in (None, "") else form_ms
+        if raw in (None, ""):
+            return None
+        budget_ms = float(raw)
+        if budget_ms <= 0:
+            raise ValueError("Deadline must be a positive number of milliseconds")
+        return cls(budget_ms / 1000.0)
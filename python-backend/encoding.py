@@ -0,0 +1,149 @@
+import base64
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+import cv2
+import numpy as np
+
+# Output image encoding: format negotiation, thumbnails and size-targeted quality search
+
+FORMATS = {
+    "jpeg": {"ext": ".jpg", "mime": "image/jpeg", "flag": cv2.IMWRITE_JPEG_QUALITY, "default_quality": 95},
+    "webp": {"ext": ".webp", "mime": "image/webp", "flag": cv2.IMWRITE_WEBP_QUALITY, "default_quality": 80},
+}
+MIN_QUALITY = 30
+MAX_QUALITY = 95
+
+
+@dataclass
+class EncodeOptions:
+    format: str = "jpeg"
+    quality: Optional[int] = None  # Fixed quality, or the search ceiling when target_bytes is set
+    target_bytes: Optional[int] = None  # Largest quality whose output fits this size
+    thumbnail: Optional[int] = None  # Longest side of the encoded image
+    max_trials: int = 6
+
+
+@dataclass
+class EncodedImage:
+    data: bytes
+    format: str
+    quality: int
+    width: int
+    height: int
+    trials: int
+    encode_seconds: float
+
+    def data_url(self) -> str:
+        return f"data:{FORMATS[self.format]['mime']};base64,{base64.b64encode(self.data).decode('utf-8')}"
+
+    def report(self) -> dict:
+        return {
+            "format": self.format,
+            "quality": self.quality,
+            "bytes": len(self.data),
+            "width": self.width,
+            "height": self.height,
+            "trials": self.trials,
+            "encode_ms": round(self.encode_seconds * 1000, 2),
+        }
+
+
+def negotiate_options(accept: Optional[str], image_format: Optional[str] = None, quality: Optional[int] = None,
+                      target_kb: Optional[int] = None, thumbnail: Optional[int] = None,
+                      max_trials: int = 6) -> EncodeOptions:
+    """
+    Build encode options from request parameters. An explicit image_format wins,
+    otherwise WebP is used when the Accept header lists image/webp.
+    :raises ValueError: on unsupported formats or out-of-range values
+    """
+    if image_format:
+        image_format = image_format.lower().replace("jpg", "jpeg")
+        if image_format not in FORMATS:
+            raise ValueError(f"image_format must be one of: {', '.join(FORMATS)}")
+    elif accept and "image/webp" in accept:
+        image_format = "webp"
+    else:
+        image_format = "jpeg"
+    if quality is not None and not 1 <= quality <= 100:
+        raise ValueError("quality must be between 1 and 100")
+    if target_kb is not None and target_kb <= 0:
+        raise ValueError("target_kb must be positive")
+    if thumbnail is not None and thumbnail < 16:
+        raise ValueError("thumbnail must be at least 16 pixels")
+    return EncodeOptions(
+        format=image_format,
+        quality=quality,
+        target_bytes=target_kb * 1024 if target_kb else None,
+        thumbnail=thumbnail,
+        max_trials=max_trials,
+    )
+
+
+def make_thumbnail(image: np.ndarray, max_dim: int) -> np.ndarray:
+    height, width = image.shape[:2]
+    scale = max_dim / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (max(1, int(width * scale)), max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+
+
+def _encode(image: np.ndarray, spec: dict, quality: int) -> bytes:
+    ok, buffer = cv2.imencode(spec["ext"], image, [spec["flag"], quality])
+    if not ok or buffer is None:
+        raise ValueError("Failed to encode image")
+    return buffer.tobytes()
+
+
+def encode_image(image: np.ndarray, options: Optional[EncodeOptions] = None) -> EncodedImage:
+    """
+    Encode an image, searching quality when a byte target is set.
+
+    Output size is close to log-linear in quality, so the search interpolates
+    log(size) between a bracket of [fits, too big] attempts instead of plain
+    bisection. It stops after max_trials encodes and keeps the highest quality
+    that fits; if even MIN_QUALITY is too big, that smallest attempt is used.
+    """
+    options = options or EncodeOptions()
+    spec = FORMATS[options.format]
+    started = time.perf_counter()
+    if options.thumbnail:
+        image = make_thumbnail(image, options.thumbnail)
+
+    if options.target_bytes is None:
+        quality = options.quality or spec["default_quality"]
+        data = _encode(image, spec, quality)
+        trials = 1
+    else:
+        quality, data, trials = _search_quality(image, spec, options)
+
+    height, width = image.shape[:2]
+    return EncodedImage(data, options.format, quality, width, height, trials, time.perf_counter() - started)
+
+
+def _search_quality(image: np.ndarray, spec: dict, options: EncodeOptions):
+    target = options.target_bytes
+    max_trials = max(1, options.max_trials)
+    high_q = min(options.quality or MAX_QUALITY, 100)
+    high = _encode(image, spec, high_q)
+    if len(high) <= target or max_trials == 1:
+        return high_q, high, 1
+    low_q = min(MIN_QUALITY, high_q)
+    low = _encode(image, spec, low_q)
+    trials = 2
+    if len(low) > target:
+        return low_q, low, trials
+
+    # Invariant: low fits the target, high does not
+    while trials < max_trials and high_q - low_q > 1:
+        t = (np.log(target) - np.log(len(low))) / (np.log(len(high)) - np.log(len(low)))
+        q = int(round(low_q + t * (high_q - low_q)))
+        q = min(max(q, low_q + 1), high_q - 1)
+        candidate = _encode(image, spec, q)
+        trials += 1
+        if len(candidate) <= target:
+            low_q, low = q, candidate
+        else:
+            high_q, high = q, candidate
+    return low_q, low, trials
@@ -0,0 +1,310 @@
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+import numpy as np
+
+from metrics import registry
+from pose_backends import PoseBackend, VideoSession, create_backend
+
+logger = logging.getLogger(__name__)
+
+# Pose inference in child processes, so a hung or leaking MediaPipe graph
+# costs one worker instead of the server.
+#
+# Each worker owns one Pose graph, warmed up before it takes jobs, and serves
+# one image at a time over a pipe. A video session keeps one worker for all of
+# its frames, so the worker's video landmarker can track the pose between them.
+# Workers are recycled after max_jobs inferences or when their RSS exceeds
+# max_rss_bytes. A worker that does not answer within timeout is killed
+# (the watchdog) and the job fails with InferenceTimeout; one that dies
+# fails it with WorkerCrashed. Either way only that image's metric fails.
+#
+# Replacements are started in the background while the remaining workers
+# keep serving. The pool keeps spares beyond the number of callers, so a
+# request never waits for a cold worker to load its model.
+
+
+class InferenceTimeout(RuntimeError):
+    pass
+
+
+class WorkerCrashed(RuntimeError):
+    pass
+
+
+def _worker_main(conn, pose_options: Dict, engine: str = "mediapipe") -> None:
+    """
+    Child process: load the model, then answer requests until told to stop:
+    ("image", img_rgb), ("video", (img_rgb, timestamp_ms)) for the frames of the
+    open video session (started by the first frame) and ("video_end", None).
+    """
+    backend = create_backend(engine, pose_options)  # Only the children load the model
+    # The first inference initializes the graph and is several times slower; pay it before taking jobs
+    backend.infer(np.zeros((256, 256, 3), dtype=np.uint8))
+    conn.send(("ready", os.getpid()))
+    video = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        kind, payload = message
+        try:
+            if kind == "image":
+                conn.send(("ok", backend.infer(payload)))
+            elif kind == "video":
+                if video is None:
+                    video = backend.video()
+                conn.send(("ok", video.infer(*payload)))
+            elif kind == "video_end":
+                if video is not None:
+                    video.close()
+                    video = None
+                conn.send(("ok", None))
+            else:
+                conn.send(("error", f"Unknown request: {kind}"))
+        except Exception as e:
+            conn.send(("error", str(e)))
+    if video is not None:
+        video.close()
+    backend.close()
+
+
+def process_rss(pid: int) -> Optional[int]:
+    """Resident set size in bytes, or None where /proc is not available."""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class Worker:
+    def __init__(self, context, pose_options: Dict, engine: str = "mediapipe"):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child_conn, pose_options, engine),
+                                       name="inference-worker", daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.jobs = 0
+        self.started_at = time.monotonic()
+
+    @property
+    def pid(self) -> int:
+        return self.process.pid
+
+    def wait_ready(self, timeout: float) -> bool:
+        try:
+            return self.conn.poll(timeout) and self.conn.recv()[0] == "ready"
+        except (EOFError, OSError):
+            return False
+
+    def stop(self) -> None:
+        """Ask the worker to exit after its current job; kill it if it does not."""
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(5)
+        if self.process.is_alive():
+            self.kill()
+        self.conn.close()
+
+    def kill(self) -> None:
+        self.process.kill()
+        self.process.join(5)
+        self.conn.close()
+
+
+class InferenceWorkerPool(PoseBackend):
+    def __init__(self, size: int, pose_options: Dict, timeout: float = 10.0, max_jobs: int = 500,
+                 max_rss_bytes: Optional[int] = None, startup_timeout: float = 60.0, engine: str = "mediapipe"):
+        self.size = size
+        self.pose_options = pose_options
+        self.engine = engine
+        self.timeout = timeout
+        self.max_jobs = max_jobs
+        self.max_rss_bytes = max_rss_bytes
+        self.startup_timeout = startup_timeout
+        # spawn, not fork: the server process has threads and native libraries loaded
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: "queue.Queue[Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._alive = 0  # Ready or starting
+        self._started = False
+        self._closed = False
+
+    def start(self) -> None:
+        """Start all workers in the background."""
+        with self._lock:
+            if self._started:
+                return
+            self._started = True
+        for _ in range(self.size):
+            self._replace(reason="start")
+
+    def ensure_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Start the workers if needed and wait until at least one has loaded its model.
+        Blocks for up to startup_timeout, so async callers run it in a thread.
+        """
+        self.start()
+        deadline = time.monotonic() + (self.startup_timeout if timeout is None else timeout)
+        while time.monotonic() < deadline:
+            if self._idle.qsize() > 0:
+                return True
+            with self._lock:
+                if self._alive == 0:
+                    return False
+            time.sleep(0.05)
+        return False
+
+    def _replace(self, reason: str) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._alive += 1
+        registry.inc("inference_worker_starts_total", reason=reason)
+        threading.Thread(target=self._spawn, name="inference-worker-spawn", daemon=True).start()
+
+    def _spawn(self) -> None:
+        try:
+            worker = Worker(self._context, self.pose_options, self.engine)
+        except Exception as e:
+            logger.error("Failed to start inference worker: %s", e)
+            with self._lock:
+                self._alive -= 1
+            return
+        if worker.wait_ready(self.startup_timeout) and not self._closed:
+            logger.info("Inference worker %d ready in %.1f s", worker.pid, time.monotonic() - worker.started_at)
+            self._idle.put(worker)
+            return
+        logger.error("Inference worker %d failed to start", worker.pid)
+        worker.kill()
+        with self._lock:
+            self._alive -= 1
+
+    def _retire(self, worker: Worker, reason: str, kill: bool = False) -> None:
+        with self._lock:
+            self._alive -= 1
+        registry.inc("inference_worker_exits_total", reason=reason)
+        self._replace(reason)
+        if kill:
+            worker.kill()
+        else:
+            # Let it finish exiting off the request thread
+            threading.Thread(target=worker.stop, name="inference-worker-stop", daemon=True).start()
+
+    def _checkout(self) -> Worker:
+        """:raises WorkerCrashed: if no worker became available"""
+        while True:
+            try:
+                worker = self._idle.get(timeout=self.startup_timeout)
+            except queue.Empty:
+                raise WorkerCrashed("No inference worker available")
+            if worker.process.is_alive():
+                return worker
+            logger.error("Idle inference worker %d died", worker.pid)
+            self._retire(worker, "crash", kill=True)
+
+    def _call(self, worker: Worker, message):
+        """
+        Send a request and wait for the (status, payload) answer.
+        :raises InferenceTimeout: if the worker did not answer within timeout (it is killed)
+        :raises WorkerCrashed: if the worker died
+        """
+        started = time.monotonic()
+        try:
+            worker.conn.send(message)
+            if not worker.conn.poll(self.timeout):
+                logger.error("Inference worker %d exceeded %.1f s, killing it", worker.pid, self.timeout)
+                self._retire(worker, "timeout", kill=True)
+                raise InferenceTimeout(f"Inference exceeded {self.timeout:g} s")
+            answer = worker.conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            logger.error("Inference worker %d died: %s", worker.pid, e)
+            self._retire(worker, "crash", kill=True)
+            raise WorkerCrashed("Inference worker died")
+        registry.observe("inference_worker_seconds", time.monotonic() - started)
+        return answer
+
+    def _checkin(self, worker: Worker) -> None:
+        """Return a worker to the idle queue, or recycle it if it is due."""
+        if self._closed:  # Held by a video session while the pool closed
+            worker.stop()
+            return
+        rss = process_rss(worker.pid) if self.max_rss_bytes else None
+        if rss is not None:
+            registry.set_gauge("inference_worker_rss_bytes", rss)
+        if worker.jobs >= self.max_jobs:
+            self._retire(worker, "max_jobs")
+        elif rss is not None and rss > self.max_rss_bytes:
+            logger.info("Recycling inference worker %d at %d MB RSS", worker.pid, rss // (1024 * 1024))
+            self._retire(worker, "rss")
+        else:
+            self._idle.put(worker)
+
+    def infer(self, img_rgb: np.ndarray) -> Optional[np.ndarray]:
+        """
+        (33, 4) landmarks of an RGB image, or None if no pose was found.
+        :raises InferenceTimeout: if the worker did not answer within timeout (it is killed)
+        :raises WorkerCrashed: if the worker died or no worker became available
+        """
+        worker = self._checkout()
+        status, payload = self._call(worker, ("image", img_rgb))
+        worker.jobs += 1
+        self._checkin(worker)
+        if status == "error":
+            raise RuntimeError(payload)
+        return payload
+
+    def video(self) -> VideoSession:
+        """
+        A session on one worker, held until it is closed, whose backend's own video
+        session sees every frame (the tasks engine tracks the pose between them).
+        Frames count as jobs for recycling, which waits for the session to end.
+        :raises WorkerCrashed: if no worker became available
+        """
+        worker = self._checkout()
+        lost = False
+
+        def infer(img_rgb: np.ndarray, timestamp_ms: int) -> Optional[np.ndarray]:
+            nonlocal lost
+            if lost:
+                raise WorkerCrashed("Inference worker of this video is gone")
+            try:
+                status, payload = self._call(worker, ("video", (img_rgb, timestamp_ms)))
+            except (InferenceTimeout, WorkerCrashed):
+                lost = True  # Retired by _call; the tracking state went with it
+                raise
+            worker.jobs += 1
+            if status == "error":
+                raise RuntimeError(payload)
+            return payload
+
+        def close() -> None:
+            if lost:
+                return
+            try:
+                self._call(worker, ("video_end", None))
+            except (InferenceTimeout, WorkerCrashed):
+                return
+            self._checkin(worker)
+
+        return VideoSession(infer, close)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                self._idle.get_nowait().stop()
+            except queue.Empty:
+                break
@@ -0,0 +1,300 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, Optional, Set
+
+import structured_logging
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    params TEXT NOT NULL,
+    result BLOB,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    owner TEXT,
+    lease_expires REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_files (
+    job_id TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    content BLOB NOT NULL,
+    PRIMARY KEY (job_id, metric)
+);
+"""
+# Columns added after the first release, for databases created before them
+MIGRATIONS = {"owner": "ALTER TABLE jobs ADD COLUMN owner TEXT",
+              "lease_expires": "ALTER TABLE jobs ADD COLUMN lease_expires REAL"}
+
+
+class JobQueue:
+    """
+    SQLite-backed queue of analysis jobs and their uploaded images.
+
+    Queued jobs survive restarts. Several processes (uvicorn workers) can share
+    one database: a claimed job records its owner and a lease that the owner
+    renews while it runs, and recover() only puts back jobs whose lease has
+    expired, i.e. whose owner stopped. Use ":memory:" as db_path for a
+    throwaway local stand-in.
+    """
+
+    def __init__(self, db_path: str, lease_seconds: float = 60.0):
+        self.lease_seconds = lease_seconds
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            if db_path != ":memory:":
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(SCHEMA)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    self._conn.execute(statement)
+
+    def enqueue(self, params: Dict, files: Dict[str, bytes]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.execute(
+                "INSERT INTO jobs (id, status, params, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(params), now, now),
+            )
+            self._conn.executemany(
+                "INSERT INTO job_files (job_id, metric, content) VALUES (?, ?, ?)",
+                [(job_id, metric, content) for metric, content in files.items()],
+            )
+            self._conn.execute("COMMIT")
+        return job_id
+
+    def claim_next(self) -> Optional[Dict]:
+        """Mark the oldest queued job as running under our lease and return it with its files."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            row = self._conn.execute(
+                "SELECT id, params FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is None:
+                self._conn.execute("COMMIT")
+                return None
+            job_id, params = row
+            now = time.time()
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, owner = ?, lease_expires = ? WHERE id = ?",
+                (RUNNING, now, self.owner, now + self.lease_seconds, job_id),
+            )
+            files = dict(self._conn.execute(
+                "SELECT metric, content FROM job_files WHERE job_id = ?", (job_id,)
+            ).fetchall())
+            self._conn.execute("COMMIT")
+        return {"id": job_id, "params": json.loads(params), "files": files}
+
+    def finish(self, job_id: str, result: Optional[bytes] = None, error: Optional[str] = None) -> bool:
+        """
+        Store the serialized result (or error) and drop the uploaded images.
+        :return: False if the job is no longer ours (its lease expired and it was requeued)
+        """
+        with self._lock:
+            self._conn.execute("BEGIN")
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, updated_at = ?, lease_expires = NULL "
+                "WHERE id = ? AND status = ? AND owner = ?",
+                (FAILED if error else DONE, result, error, time.time(), job_id, RUNNING, self.owner),
+            )
+            if cursor.rowcount:
+                self._conn.execute("DELETE FROM job_files WHERE job_id = ?", (job_id,))
+            self._conn.execute("COMMIT")
+        return cursor.rowcount > 0
+
+    def renew(self, job_ids) -> None:
+        """Extend our lease on running jobs."""
+        expires = time.time() + self.lease_seconds
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND status = ? AND owner = ?",
+                [(expires, job_id, RUNNING, self.owner) for job_id in job_ids],
+            )
+
+    def status(self, job_id: str) -> Optional[str]:
+        """Status of a job without reading its blobs, or None if there is no such job."""
+        with self._lock:
+            row = self._conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row[0] if row is not None else None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, result, error, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            position = None
+            if row[0] == QUEUED:
+                position = self._conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE status = ? AND created_at < ?", (QUEUED, row[3])
+                ).fetchone()[0]
+        status, result, error, created_at, updated_at = row
+        return {"status": status, "result": result, "error": error, "created_at": created_at,
+                "updated_at": updated_at, "queue_position": position}
+
+    def recover(self) -> int:
+        """Requeue running jobs whose lease has expired, left behind by a process that stopped."""
+        now = time.time()
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ?, owner = NULL, lease_expires = NULL "
+                "WHERE status = ? AND (lease_expires IS NULL OR lease_expires < ?)",
+                (QUEUED, now, RUNNING, now),
+            )
+            return cursor.rowcount
+
+    def purge(self, older_than_seconds: float) -> int:
+        """Delete finished jobs whose results are older than the retention period."""
+        cutoff = time.time() - older_than_seconds
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (DONE, FAILED, cutoff)
+            )
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+
+
+class JobScheduler:
+    """
+    Background task that drains the JobQueue with up to `concurrency` jobs in flight.
+
+    runner(params, files) returns the serialized result. Waiters for a job
+    (long-polling GET requests) are woken as soon as it finishes here, and
+    check the shared database every poll_seconds for jobs run by another
+    process. Leases of
+    running jobs are renewed every third of the lease, and jobs of other
+    processes whose lease expired are recovered as often. Queue calls that
+    move image or result blobs run in a worker thread.
+    """
+
+    def __init__(self, queue: JobQueue, runner: Callable[[Dict, Dict[str, bytes]], Awaitable[bytes]],
+                 concurrency: int, poll_seconds: float, retention_seconds: float):
+        self.queue = queue
+        self._runner = runner
+        self._concurrency = concurrency
+        self._poll_seconds = poll_seconds
+        self._retention_seconds = retention_seconds
+        self._wakeup: Optional[asyncio.Event] = None
+        self._waiters: Dict[str, Set[asyncio.Event]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self._recover()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def notify(self) -> None:
+        """Wake the scheduler after a job was enqueued."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def wait_for(self, job_id: str, timeout: float) -> None:
+        """Return once the job has finished or timeout seconds have passed."""
+        deadline = time.monotonic() + timeout
+        event = asyncio.Event()
+        # Registered before checking, so a job finishing in between still wakes us
+        self._waiters.setdefault(job_id, set()).add(event)
+        try:
+            while True:
+                status = await asyncio.to_thread(self.queue.status, job_id)
+                remaining = deadline - time.monotonic()
+                if status is None or status in (DONE, FAILED) or remaining <= 0:
+                    return
+                # Only jobs run by this process set the event; others are seen on the next check
+                try:
+                    await asyncio.wait_for(event.wait(), min(self._poll_seconds, remaining))
+                    return
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            waiters = self._waiters.get(job_id)
+            if waiters is not None:
+                waiters.discard(event)
+                if not waiters:
+                    del self._waiters[job_id]
+
+    def _recover(self) -> None:
+        recovered = self.queue.recover()
+        if recovered:
+            logger.info("Requeued %d interrupted jobs", recovered)
+
+    async def _loop(self) -> None:
+        running: Dict[asyncio.Task, str] = {}
+        last_purge = 0.0
+        last_renew = time.time()
+        while True:
+            try:
+                while len(running) < self._concurrency:
+                    job = await asyncio.to_thread(self.queue.claim_next)
+                    if job is None:
+                        break
+                    running[asyncio.create_task(self._run(job))] = job["id"]
+                if time.time() - last_renew > self.queue.lease_seconds / 3:
+                    self.queue.renew(list(running.values()))
+                    self._recover()
+                    last_renew = time.time()
+                if time.time() - last_purge > 60:
+                    self.queue.purge(self._retention_seconds)
+                    last_purge = time.time()
+            except sqlite3.Error as e:
+                # A locked or unavailable database must not end the scheduler; retry on the next poll
+                logger.error("Job queue error: %s", e)
+
+            self._wakeup.clear()
+            wakeup = asyncio.create_task(self._wakeup.wait())
+            done, _ = await asyncio.wait(set(running) | {wakeup}, timeout=self._poll_seconds,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            wakeup.cancel()
+            for task in done:
+                running.pop(task, None)
+
+    async def _run(self, job: Dict) -> None:
+        job_id = job["id"]
+        # Each job runs in its own task, so its log lines get the job id as request id
+        structured_logging.bind_request(f"job-{job_id}")
+        try:
+            result = await self._runner(job["params"], job["files"])
+            finished = await asyncio.to_thread(self.queue.finish, job_id, result=result)
+        except Exception as e:
+            logger.error("Job %s failed: %s", job_id, e)
+            try:
+                finished = await asyncio.to_thread(self.queue.finish, job_id, error=str(e))
+            except sqlite3.Error as e:
+                logger.error("Could not record the failure of job %s: %s", job_id, e)
+                finished = False
+        if not finished:
+            logger.warning("Job %s was taken over by another worker after its lease expired", job_id)
+        for event in self._waiters.pop(job_id, ()):
+            event.set()
@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Adaptive keyframe scheduling for video and live streams. Full pose
+# inference runs only on keyframes; frames in between get landmarks from a
+# constant-velocity Kalman filter. A frame becomes a keyframe when it differs
+# visibly from the last keyframe, when the tracked landmarks are predicted to
+# have moved too far, or after max_skip interpolated frames.
+
+DIFF_DIM = 64  # Longest side of the grayscale thumbnail used for frame differences
+
+
+@dataclass
+class KeyframeSettings:
+    max_skip: int = 10  # Interpolated frames allowed between keyframes
+    diff_threshold: float = 6.0  # Mean absolute gray-level difference to the last keyframe (0-255)
+    motion_threshold: float = 0.02  # Predicted landmark displacement since the keyframe (normalized units)
+    process_noise: float = 1e-4
+    measurement_noise: float = 1e-5
+
+
+class LandmarkTracker:
+    """
+    Constant-velocity Kalman filter over the x, y, z of every landmark.
+
+    Coordinates are filtered independently, so the 2x2 covariance of each one
+    is kept as three arrays (p00, p01, p11) and updated in a vectorized way.
+    Visibility is carried over from the last measurement.
+    """
+
+    def __init__(self, process_noise: float, measurement_noise: float):
+        self.q = process_noise
+        self.r = measurement_noise
+        self.position: Optional[np.ndarray] = None
+        self.velocity: Optional[np.ndarray] = None
+        self.visibility: Optional[np.ndarray] = None
+
+    def reset(self) -> None:
+        self.position = None
+
+    @property
+    def active(self) -> bool:
+        return self.position is not None
+
+    def predict(self) -> np.ndarray:
+        """Advance one frame and return the estimated (N, 4) landmarks."""
+        self.position = self.position + self.velocity
+        self.p00 = self.p00 + 2 * self.p01 + self.p11 + self.q
+        self.p01 = self.p01 + self.p11
+        self.p11 = self.p11 + self.q
+        return self.landmarks()
+
+    def update(self, landmarks: np.ndarray) -> None:
+        measured = landmarks[:, :3].astype(np.float64)
+        self.visibility = landmarks[:, 3].copy()
+        if self.position is None:
+            self.position = measured
+            self.velocity = np.zeros_like(measured)
+            self.p00 = np.full_like(measured, self.r)
+            self.p01 = np.zeros_like(measured)
+            self.p11 = np.full_like(measured, self.q * 10)
+            return
+        residual = measured - self.position
+        s = self.p00 + self.r
+        k0 = self.p00 / s
+        k1 = self.p01 / s
+        self.position = self.position + k0 * residual
+        self.velocity = self.velocity + k1 * residual
+        self.p11 = self.p11 - k1 * self.p01
+        self.p01 = (1 - k0) * self.p01
+        self.p00 = (1 - k0) * self.p00
+
+    def speed(self, indices: Optional[np.ndarray] = None, min_visibility: float = 0.5) -> float:
+        """
+        Largest per-frame image-plane speed among the given landmarks. Occluded
+        landmarks jitter without moving, so only visible ones are considered.
+        """
+        velocity = self.velocity if indices is None else self.velocity[indices]
+        visibility = self.visibility if indices is None else self.visibility[indices]
+        velocity = velocity[visibility >= min_visibility]
+        if len(velocity) == 0:
+            return 0.0
+        return float(np.linalg.norm(velocity[:, :2], axis=1).max())
+
+    def landmarks(self) -> np.ndarray:
+        return np.column_stack([self.position, self.visibility]).astype(np.float32)
+
+
+class KeyframeScheduler:
+    """
+    Decides per frame whether to run inference and returns landmarks either way.
+
+    infer(frame) -> (N, 4) landmarks or None. watch is the set of landmark
+    indices whose predicted motion can trigger a keyframe (e.g. the metric's
+    limb); all landmarks are used when it is None.
+    """
+
+    def __init__(self, infer: Callable[[np.ndarray], Optional[np.ndarray]], settings: KeyframeSettings,
+                 watch: Optional[np.ndarray] = None):
+        self._infer = infer
+        self.settings = settings
+        self.watch = watch
+        self.tracker = LandmarkTracker(settings.process_noise, settings.measurement_noise)
+        self._key_thumbnail: Optional[np.ndarray] = None
+        self._since_key = 0
+        self.frames = 0
+        self.keyframes = 0
+
+    @staticmethod
+    def thumbnail(frame: np.ndarray) -> np.ndarray:
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        scale = DIFF_DIM / max(gray.shape[:2])
+        return cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def needs_keyframe(self, thumbnail: np.ndarray) -> Tuple[bool, str]:
+        if not self.tracker.active or self._key_thumbnail is None:
+            return True, "no_track"
+        if self._since_key >= self.settings.max_skip:
+            return True, "max_skip"
+        if float(np.abs(thumbnail - self._key_thumbnail).mean()) > self.settings.diff_threshold:
+            return True, "frame_diff"
+        if self.tracker.speed(self.watch) * (self._since_key + 1) > self.settings.motion_threshold:
+            return True, "motion"
+        return False, ""
+
+    def process(self, frame: np.ndarray) -> Tuple[Optional[np.ndarray], bool, str]:
+        """Landmarks for the frame, whether it was a keyframe, and why."""
+        self.frames += 1
+        thumbnail = self.thumbnail(frame)
+        keyframe, reason = self.needs_keyframe(thumbnail)
+        if not keyframe:
+            self._since_key += 1
+            return self.tracker.predict(), False, ""
+
+        self.keyframes += 1
+        self._since_key = 0
+        self._key_thumbnail = thumbnail
+        landmarks = self._infer(frame)
+        if landmarks is None:
+            # Lost the pose: keep running inference until it is found again
+            self.tracker.reset()
+            return None, True, reason
+        if self.tracker.active:
+            self.tracker.predict()
+        self.tracker.update(landmarks)
+        return landmarks, True, reason
+
+    @property
+    def inference_rate(self) -> float:
+        """Share of frames that ran full inference."""
+        return self.keyframes / self.frames if self.frames else 0.0
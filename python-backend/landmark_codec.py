@@ -0,0 +1,204 @@
+import mmap
+import os
+import struct
+from typing import Iterator, List, Optional
+
+import numpy as np
+
+# Compact storage for per-frame landmarks (video sessions).
+#
+# x, y, z are quantized to int16 in normalized image space with SCALE steps
+# per unit, so values within +-2 (landmarks up to one frame outside the
+# image) round-trip with an error of at most 0.5 / SCALE (~3e-5, or 0.03 px
+# on an 800 px frame). Larger values are clipped. Visibility is stored as
+# uint8, error at most 0.5 / 255.
+#
+# Frames are delta-encoded against the previous frame: as int8 when every
+# delta fits (a still or slowly moving subject), otherwise int16. Every
+# keyframe_interval frames, after a frame without a pose, and whenever a
+# delta overflows int16, a full keyframe is written. Decoding any frame thus
+# touches at most keyframe_interval frames.
+
+SCALE = 16384
+LIMIT = 32767 / SCALE
+NUM_LANDMARKS = 33
+
+FRAME_NONE = 0
+FRAME_KEY = 1
+FRAME_DELTA8 = 2
+FRAME_DELTA16 = 3
+
+MAGIC = b"LMK1"
+HEADER = struct.Struct("<4sHH")  # magic, landmark count, keyframe interval
+
+
+def quantize(landmarks: np.ndarray):
+    coords = np.rint(np.clip(landmarks[:, :3], -LIMIT, LIMIT) * SCALE).astype(np.int16)
+    visibility = np.rint(np.clip(landmarks[:, 3], 0.0, 1.0) * 255).astype(np.uint8)
+    return coords, visibility
+
+
+def dequantize(coords: np.ndarray, visibility: np.ndarray) -> np.ndarray:
+    out = np.empty((len(coords), 4), dtype=np.float32)
+    out[:, :3] = coords.astype(np.float32) / SCALE
+    out[:, 3] = visibility.astype(np.float32) / 255
+    return out
+
+
+class LandmarkEncoder:
+    """Turns a sequence of landmark arrays (or None) into frame records."""
+
+    def __init__(self, keyframe_interval: int = 30):
+        self.keyframe_interval = keyframe_interval
+        self._previous: Optional[np.ndarray] = None
+        self._since_key = 0
+
+    def encode(self, landmarks: Optional[np.ndarray]) -> bytes:
+        if landmarks is None:
+            self._previous = None
+            return bytes([FRAME_NONE])
+        coords, visibility = quantize(landmarks)
+        record = None
+        if self._previous is not None and self._since_key < self.keyframe_interval:
+            delta = coords.astype(np.int32) - self._previous
+            if np.abs(delta).max() <= 127:
+                record = bytes([FRAME_DELTA8]) + delta.astype(np.int8).tobytes()
+            elif np.abs(delta).max() <= 32767:
+                record = bytes([FRAME_DELTA16]) + delta.astype(np.int16).tobytes()
+        if record is None:
+            record = bytes([FRAME_KEY]) + coords.tobytes()
+            self._since_key = 0
+        self._since_key += 1
+        self._previous = coords.astype(np.int32)
+        return record + visibility.tobytes()
+
+
+def decode_record(record, previous: Optional[np.ndarray], num_landmarks: int = NUM_LANDMARKS):
+    """Decode one frame record given the previous frame's int32 coordinates. Returns (landmarks, coords)."""
+    kind = record[0]
+    if kind == FRAME_NONE:
+        return None, None
+    count = num_landmarks * 3
+    if kind == FRAME_KEY:
+        coords = np.frombuffer(record, dtype=np.int16, count=count, offset=1).reshape(-1, 3).astype(np.int32)
+        vis_offset = 1 + count * 2
+    elif kind == FRAME_DELTA8:
+        coords = previous + np.frombuffer(record, dtype=np.int8, count=count, offset=1).reshape(-1, 3)
+        vis_offset = 1 + count
+    elif kind == FRAME_DELTA16:
+        coords = previous + np.frombuffer(record, dtype=np.int16, count=count, offset=1).reshape(-1, 3)
+        vis_offset = 1 + count * 2
+    else:
+        raise ValueError(f"Unknown frame type {kind}")
+    visibility = np.frombuffer(record, dtype=np.uint8, count=num_landmarks, offset=vis_offset)
+    return dequantize(coords, visibility), coords
+
+
+class LandmarkArchiveWriter:
+    """
+    Append-only archive: <path> holds a header and the frame records,
+    <path>.idx one uint64 record offset per frame.
+    """
+
+    def __init__(self, path: str, keyframe_interval: int = 30, num_landmarks: int = NUM_LANDMARKS):
+        self.path = path
+        self._encoder = LandmarkEncoder(keyframe_interval)
+        exists = os.path.exists(path)
+        self._data = open(path, "ab")
+        self._index = open(path + ".idx", "ab")
+        if not exists:
+            self._data.write(HEADER.pack(MAGIC, num_landmarks, keyframe_interval))
+        # When appending to an existing archive the encoder starts with a keyframe
+        self.frames = os.path.getsize(path + ".idx") // 8
+
+    def append(self, landmarks: Optional[np.ndarray]) -> int:
+        """Append one frame; returns its index."""
+        offset = self._data.tell()
+        self._data.write(self._encoder.encode(landmarks))
+        self._index.write(struct.pack("<Q", offset))
+        self.frames += 1
+        return self.frames - 1
+
+    def close(self) -> None:
+        self._data.close()
+        self._index.close()
+
+    def __enter__(self) -> "LandmarkArchiveWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class LandmarkArchive:
+    """Memory-mapped reader with random access by frame index."""
+
+    def __init__(self, path: str):
+        self._data_file = open(path, "rb")
+        self._index_file = open(path + ".idx", "rb")
+        self._data = mmap.mmap(self._data_file.fileno(), 0, access=mmap.ACCESS_READ)
+        index_size = os.path.getsize(path + ".idx")
+        self._index_map = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ) if index_size else None
+        self.offsets = (np.frombuffer(self._index_map, dtype=np.uint64)
+                        if self._index_map is not None else np.empty(0, dtype=np.uint64))
+        magic, self.num_landmarks, self.keyframe_interval = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a landmark archive: {path}")
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _record(self, index: int) -> memoryview:
+        start = int(self.offsets[index])
+        end = int(self.offsets[index + 1]) if index + 1 < len(self.offsets) else len(self._data)
+        return memoryview(self._data)[start:end]
+
+    def _kind(self, index: int) -> int:
+        return self._data[int(self.offsets[index])]
+
+    def _decode(self, index: int):
+        # Walk back to the nearest keyframe (or pose-less frame), at most keyframe_interval records
+        start = index
+        while self._kind(start) not in (FRAME_KEY, FRAME_NONE):
+            start -= 1
+        landmarks, coords = None, None
+        for i in range(start, index + 1):
+            landmarks, coords = decode_record(self._record(i), coords, self.num_landmarks)
+        return landmarks, coords
+
+    def __getitem__(self, index: int) -> Optional[np.ndarray]:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self._decode(index)[0]
+
+    def frames(self, start: int = 0, stop: Optional[int] = None) -> Iterator[Optional[np.ndarray]]:
+        """Decode a range of frames sequentially."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        if start >= stop:
+            return
+        landmarks, coords = self._decode(start)
+        yield landmarks
+        for i in range(start + 1, stop):
+            landmarks, coords = decode_record(self._record(i), coords, self.num_landmarks)
+            yield landmarks
+
+    def close(self) -> None:
+        self.offsets = np.empty(0, dtype=np.uint64)
+        if self._index_map is not None:
+            self._index_map.close()
+        self._data.close()
+        self._data_file.close()
+        self._index_file.close()
+
+    def __enter__(self) -> "LandmarkArchive":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def read_all(path: str) -> List[Optional[np.ndarray]]:
+    with LandmarkArchive(path) as archive:
+        return list(archive.frames())
@@ -1,17 +1,61 @@
 import cv2
 import numpy as np
-import mediapipe as mp
 import base64
-from fastapi import FastAPI, File, UploadFile, Form, HTTPException
+import io
+from PIL import Image
+from fastapi import FastAPI, File, UploadFile, Form, Header, HTTPException, Request, Depends
 from fastapi.middleware.cors import CORSMiddleware
-import uvicorn
-from typing import Dict, Optional
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from typing import Dict, List, Optional, Union
+import asyncio
+import hmac
 import logging
+import tempfile
+import threading
+import time
 import traceback
 import os
+import uuid
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+import config
+from buffer_arena import BufferArena, BufferLease
+from cancellation import CancellationToken, ClientDisconnected
+from deadline import Deadline, stage_estimates
+from dataclasses import asdict
+from encoding import EncodeOptions, encode_image, negotiate_options
+from metrics import registry
+from phash import PerceptualIndex, dhash, joint_patches, patch_difference
+from pose_pool import PosePool
+import quality_gate
+from renderer import LANDMARK_NAMES, METRIC_CHAIN_INDICES, build_overlay, landmarks_to_pixels, render_annotations
+from responses import FastJSONResponse
+from result_cache import TieredCache, build_tiers, content_key, pack_landmarks, unpack_landmarks
+from session_store import SessionStore
+from job_queue import DONE, FAILED, JobQueue, JobScheduler
+from measurement_store import Measurement, MeasurementStore
+from keyframes import KeyframeScheduler, KeyframeSettings
+from landmark_codec import LandmarkArchive, LandmarkArchiveWriter
+from inference_workers import InferenceWorkerPool
+from model_registry import (ModelError, ModelRegistry, mediapipe_model_path, pose_landmarker_model, pose_models,
+                            sha256_file)
+from pose_backends import create_backend
+import measurement_export
+import profiler
+import responses
+import structured_logging
+
+# Quiet TensorFlow Lite and keep it on the CPU. Set before mediapipe is first
+# imported, here or in the inference workers, which inherit the environment.
+os.environ.setdefault("TF_CPP_MIN_LOG_LEVEL", "2")
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")
+
+# Configure logging: records are formatted and written by a background thread
+log_listener = structured_logging.configure(
+    level=config.LOG_LEVEL,
+    format=config.LOG_FORMAT,
+    sample_rates=structured_logging.parse_sample_rates(config.LOG_SAMPLE_RATES),
+    queue_size=config.LOG_QUEUE_SIZE,
+)
 logger = logging.getLogger(__name__)
 
 # Initialize FastAPI app
@@ -26,16 +70,61 @@ app.add_middleware(
     allow_headers=["*"],
     expose_headers=["*"],
 )
+# Request ids for log lines, echoed as X-Request-ID
+app.add_middleware(structured_logging.RequestContextMiddleware)
 
-# Initialize Mediapipe Pose in a more robust way
-try:
-    mp_pose = mp.solutions.pose
-    mp_drawing = mp.solutions.drawing_utils
-    # Initialize pose estimation once and reuse it
-    pose = None  # We'll initialize it lazily to avoid startup errors
-except Exception as e:
-    logger.error(f"Error initializing MediaPipe: {e}")
-    traceback.print_exc()
+# mediapipe is imported only where a model or the reference drawing is needed:
+# it takes longer to import than the rest of the server, and in process mode
+# only the inference workers load it
+METRICS = ["ankle", "knee", "hipFlexion", "R1", "popliteal", "R2"]
+
+# How results are annotated: not at all, as vector overlay primitives for the
+# client to draw over its local image, or as a server-rendered JPEG
+RENDER_NONE = "none"
+RENDER_VECTOR = "vector"
+RENDER_RASTER = "raster"
+RENDER_MODES = (RENDER_NONE, RENDER_VECTOR, RENDER_RASTER)
+
+# Pooled frame buffers for resize / color conversion / annotation, sized for MAX_IMAGE_DIM frames
+buffer_arena = BufferArena(
+    max_bytes=config.MAX_IMAGE_DIM * config.MAX_IMAGE_DIM * 3,
+    max_per_class=config.BUFFER_ARENA_MAX_PER_CLASS,
+    max_pooled_bytes=config.BUFFER_ARENA_MAX_POOLED_MB * 1024 * 1024,
+    enabled=config.BUFFER_ARENA_ENABLED,
+)
+
+# Uploaded images and landmarks kept between requests for recomputation
+session_store = SessionStore(
+    ttl_seconds=config.SESSION_TTL_SECONDS,
+    max_memory_bytes=config.SESSION_MAX_MEMORY_MB * 1024 * 1024,
+    spill_dir=config.SESSION_SPILL_DIR,
+)
+
+# Every measurement taken for a known patient, for history queries
+measurement_store = MeasurementStore(
+    config.MEASUREMENT_DB_PATH,
+    batch_size=config.MEASUREMENT_BATCH_SIZE,
+    flush_seconds=config.MEASUREMENT_FLUSH_SECONDS,
+    max_queue=config.MEASUREMENT_QUEUE_SIZE,
+)
+
+# Per-frame landmarks of analyzed videos, served by /videos/{video_id}/landmarks
+os.makedirs(config.LANDMARK_ARCHIVE_DIR, exist_ok=True)
+
+# Landmarks and finished results by image content, shared with other workers
+# through the disk (or Redis) tier so retries and redeploys still hit
+result_cache = TieredCache(build_tiers())
+
+quality_thresholds = quality_gate.QualityThresholds(
+    min_dim=config.QUALITY_MIN_DIM,
+    min_sharpness=config.QUALITY_MIN_SHARPNESS,
+    min_brightness=config.QUALITY_MIN_BRIGHTNESS,
+    max_brightness=config.QUALITY_MAX_BRIGHTNESS,
+    min_coverage=config.QUALITY_MIN_COVERAGE,
+)
+
+# Perceptual hashes of recent uploads, for reusing landmarks of re-encoded copies
+phash_index = PerceptualIndex(max_distance=config.PHASH_MAX_DISTANCE, max_entries=config.PHASH_INDEX_SIZE)
 
 # Angle Calculator
 class ClinicalAngleCalculator:
@@ -46,9 +135,31 @@ class ClinicalAngleCalculator:
             angle = np.abs(angle * 180.0 / np.pi)
             return 360 - angle if angle > 180 else angle
         except Exception as e:
-            logger.error(f"Error calculating angle: {e}")
+            logger.error("Error calculating angle: %s", e)
             return None
 
+    @staticmethod
+    def metric_points(metric, key_dict, side="right"):
+        """Return the (p1, vertex, p3) points whose angle defines the metric, or None for unknown metrics."""
+        def point(name):
+            return key_dict[("RIGHT_" if side == "right" else "LEFT_") + name]
+
+        if metric == "ankle":
+            return (point("KNEE"), point("ANKLE"), point("FOOT_INDEX"))
+        elif metric == "knee":
+            return (point("HIP"), point("KNEE"), point("ANKLE"))
+        elif metric == "hipFlexion":
+            hip = point("HIP")
+            imaginary_point = (hip[0] - (100 if side == "right" else -100), hip[1])
+            return (point("KNEE"), hip, imaginary_point)
+        elif metric in ("R1", "R2"):
+            return (point("ANKLE"), point("KNEE"), point("HIP"))
+        elif metric == "popliteal":
+            knee = point("KNEE")
+            imaginary_vertical = (knee[0], knee[1] - 100)
+            return (point("ANKLE"), knee, imaginary_vertical)
+        return None
+
     @staticmethod
     def calculate_metric_angles(metric, keypoints, side="right"):
         # Create dictionary of keypoints
@@ -56,61 +167,49 @@ class ClinicalAngleCalculator:
         for kp in keypoints:
             key_dict[kp["name"]] = (kp["x"], kp["y"])
         
-        logger.info(f"Calculating angle for {metric} ({side} side)")
+        logger.debug("Calculating angle for %s (%s side)", metric, side)
         
         try:
-            if metric == "ankle":
-                return ClinicalAngleCalculator.calculate_angle(
-                    key_dict["RIGHT_KNEE" if side == "right" else "LEFT_KNEE"], 
-                    key_dict["RIGHT_ANKLE" if side == "right" else "LEFT_ANKLE"], 
-                    key_dict["RIGHT_FOOT_INDEX" if side == "right" else "LEFT_FOOT_INDEX"]
-                )
-            elif metric == "knee":
-                return ClinicalAngleCalculator.calculate_angle(
-                    key_dict["RIGHT_HIP" if side == "right" else "LEFT_HIP"], 
-                    key_dict["RIGHT_KNEE" if side == "right" else "LEFT_KNEE"], 
-                    key_dict["RIGHT_ANKLE" if side == "right" else "LEFT_ANKLE"]
-                )
-            elif metric == "hipFlexion":
-                hip_key = "RIGHT_HIP" if side == "right" else "LEFT_HIP"
-                knee_key = "RIGHT_KNEE" if side == "right" else "LEFT_KNEE"
-                imaginary_point = (key_dict[hip_key][0] - (100 if side == "right" else -100), key_dict[hip_key][1])
-                return ClinicalAngleCalculator.calculate_angle(key_dict[knee_key], key_dict[hip_key], imaginary_point)
-            elif metric == "R1":
-                return ClinicalAngleCalculator.calculate_angle(
-                    key_dict["RIGHT_ANKLE" if side == "right" else "LEFT_ANKLE"], 
-                    key_dict["RIGHT_KNEE" if side == "right" else "LEFT_KNEE"], 
-                    key_dict["RIGHT_HIP" if side == "right" else "LEFT_HIP"]
-                )
-            elif metric == "popliteal":
-                knee_key = "RIGHT_KNEE" if side == "right" else "LEFT_KNEE"
-                ankle_key = "RIGHT_ANKLE" if side == "right" else "LEFT_ANKLE"
-                imaginary_vertical = (key_dict[knee_key][0], key_dict[knee_key][1] - 100)
-                return ClinicalAngleCalculator.calculate_angle(key_dict[ankle_key], key_dict[knee_key], imaginary_vertical)
-            elif metric == "R2":
-                return ClinicalAngleCalculator.calculate_angle(
-                    key_dict["RIGHT_ANKLE" if side == "right" else "LEFT_ANKLE"], 
-                    key_dict["RIGHT_KNEE" if side == "right" else "LEFT_KNEE"], 
-                    key_dict["RIGHT_HIP" if side == "right" else "LEFT_HIP"]
-                )
+            points = ClinicalAngleCalculator.metric_points(metric, key_dict, side)
+            if points is None:
+                return None
+            return ClinicalAngleCalculator.calculate_angle(*points)
         except KeyError as e:
-            logger.error(f"KeyError in {metric}: {e}, available keys: {list(key_dict.keys())}")
+            logger.error("Missing landmark %s for %s (%d available)", e, metric, len(key_dict))
             return None
         except Exception as e:
-            logger.error(f"Unexpected error in calculate_metric_angles: {e}")
+            logger.error("Unexpected error in calculate_metric_angles: %s", e)
             return None
 
 # Preprocess Image
-def preprocess_image(file_content: bytes) -> np.ndarray:
+def decode_flags(file_content: bytes, max_dim: int) -> int:
+    """
+    Pick the largest JPEG DCT-domain reduction that still leaves the long side at
+    least max_dim, so large photos are never decoded at full resolution.
+    """
     try:
+        with Image.open(io.BytesIO(file_content)) as header:
+            if header.format != "JPEG":
+                return cv2.IMREAD_COLOR
+            long_side = max(header.size)
+    except Exception:
+        return cv2.IMREAD_COLOR
+    for factor, flag in ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4),
+                         (2, cv2.IMREAD_REDUCED_COLOR_2)):
+        if long_side // factor >= max_dim:
+            return flag
+    return cv2.IMREAD_COLOR
+
+def preprocess_image(file_content: bytes, buffers: Optional[BufferLease] = None) -> np.ndarray:
+    try:
+        max_dim = config.MAX_IMAGE_DIM
         image = np.frombuffer(file_content, np.uint8)
-        img = cv2.imdecode(image, cv2.IMREAD_COLOR)
+        img = cv2.imdecode(image, decode_flags(file_content, max_dim))
         if img is None:
             raise ValueError("Could not decode image")
         
         # Preserve aspect ratio while resizing
         height, width = img.shape[:2]
-        max_dim = 800  # Reduced from 1024 to save memory
         if height > max_dim or width > max_dim:
             if height > width:
                 new_height = max_dim
@@ -118,11 +217,12 @@ def preprocess_image(file_content: bytes) -> np.ndarray:
             else:
                 new_width = max_dim
                 new_height = int(height * (max_dim / width))
-            img = cv2.resize(img, (new_width, new_height))
+            dst = buffers.take((new_height, new_width, 3)) if buffers is not None else None
+            img = cv2.resize(img, (new_width, new_height), dst=dst)
         
         return img
     except Exception as e:
-        logger.error(f"Error preprocessing image: {e}")
+        logger.error("Error preprocessing image: %s", e)
         raise
 
 # Convert Image to Base64
@@ -133,15 +233,27 @@ def encode_image_to_base64(image: np.ndarray) -> str:
             raise ValueError("Failed to encode image")
         return base64.b64encode(buffer).decode("utf-8")
     except Exception as e:
-        logger.error(f"Error encoding image to base64: {e}")
+        logger.error("Error encoding image to base64: %s", e)
         # Return a simple error image if encoding fails
         error_img = np.zeros((100, 300, 3), dtype=np.uint8)
         cv2.putText(error_img, "Encoding error", (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2)
         _, buffer = cv2.imencode(".jpg", error_img)
         return base64.b64encode(buffer).decode("utf-8")
 
-# Draw landmarks and angles on image
+# Encode a result image with the request's encode options and report the cost
+def encode_result_image(result: Dict, image: np.ndarray, encode: Optional[EncodeOptions] = None) -> None:
+    encoded = encode_image(image, encode)
+    registry.observe("encode_seconds", encoded.encode_seconds, format=encoded.format)
+    registry.observe("encoded_bytes", len(encoded.data), format=encoded.format)
+    result["image"] = encoded.data_url()
+    result["encoding"] = encoded.report()
+
+# Draw landmarks and angles on image with mp_drawing.
+# Kept as the reference for renderer.render_annotations (see benchmarks/bench_annotation.py).
 def draw_landmarks_and_angles(image, landmarks, angle, metric, side):
+    import mediapipe as mp
+    mp_pose = mp.solutions.pose
+    mp_drawing = mp.solutions.drawing_utils
     try:
         # Create a copy to avoid modifying the original
         annotated_img = image.copy()
@@ -179,7 +291,7 @@ def draw_landmarks_and_angles(image, landmarks, angle, metric, side):
         
         return annotated_img
     except Exception as e:
-        logger.error(f"Error drawing landmarks: {e}")
+        logger.error("Error drawing landmarks: %s", e)
         # Return original image if drawing fails
         return image
 
@@ -188,133 +300,1243 @@ def draw_landmarks_and_angles(image, landmarks, angle, metric, side):
 async def read_root():
     return {"status": "API is running", "cors": "enabled"}
 
-# Initialize pose model on first API call
-def get_pose_model():
-    global pose
-    if pose is None:
+# Metrics endpoint
+@app.get("/metrics")
+async def read_metrics():
+    return PlainTextResponse(registry.render_prometheus())
+
+POSE_OPTIONS = {
+    "static_image_mode": True,
+    "model_complexity": config.POSE_MODEL_COMPLEXITY,
+    "min_detection_confidence": 0.5,
+    "enable_segmentation": False,
+}
+
+# Pose models from a local, checksummed directory instead of downloads (see model_registry.py)
+model_registry = ModelRegistry(config.MODEL_DIR) if config.MODEL_DIR else None
+
+def model_path(name: str) -> str:
+    return model_registry.path(name) if model_registry is not None else mediapipe_model_path(name)
+
+if config.POSE_ENGINE == "tflite":
+    detector_model, landmark_model = pose_models(config.POSE_MODEL_COMPLEXITY)
+    ENGINE_OPTIONS = {
+        "detector_path": model_path(detector_model),
+        "landmark_path": model_path(landmark_model),
+        "num_threads": config.TFLITE_THREADS,
+        "use_xnnpack": config.TFLITE_XNNPACK,
+        "min_detection_confidence": POSE_OPTIONS["min_detection_confidence"],
+    }
+elif config.POSE_ENGINE == "tasks":
+    ENGINE_OPTIONS = {
+        "model_path": model_path(pose_landmarker_model(config.POSE_MODEL_COMPLEXITY)),
+        "min_detection_confidence": POSE_OPTIONS["min_detection_confidence"],
+    }
+elif config.POSE_ENGINE == "mediapipe":
+    ENGINE_OPTIONS = POSE_OPTIONS
+else:
+    raise ValueError(f"Unknown POSE_ENGINE: {config.POSE_ENGINE}")
+
+# Inference in worker processes, recycled and watched (see inference_workers.py)
+inference_workers = None
+if config.INFERENCE_MODE == "process":
+    inference_workers = InferenceWorkerPool(
+        size=config.POSE_POOL_SIZE + config.INFERENCE_SPARE_WORKERS,
+        pose_options=ENGINE_OPTIONS,
+        engine=config.POSE_ENGINE,
+        timeout=config.INFERENCE_TIMEOUT_SECONDS,
+        max_jobs=config.INFERENCE_WORKER_MAX_JOBS,
+        max_rss_bytes=config.INFERENCE_WORKER_MAX_RSS_MB * 1024 * 1024,
+    )
+elif config.INFERENCE_MODE != "thread":
+    raise ValueError(f"Unknown INFERENCE_MODE: {config.INFERENCE_MODE}")
+
+# Pose models are created lazily (on first API call) to avoid startup errors
+def create_pose_model():
+    if inference_workers is not None:
+        # Pool slots then only bound concurrency; the graphs live in the workers
+        return inference_workers if inference_workers.ensure_ready() else None
+    try:
+        pose = create_backend(config.POSE_ENGINE, ENGINE_OPTIONS)
+        logger.info("Pose model initialized successfully (%s)", config.POSE_ENGINE)
+        return pose
+    except Exception as e:
+        logger.error("Failed to initialize pose model: %s", e)
+        traceback.print_exc()
+        return None
+
+pose_pool = PosePool(size=config.POSE_POOL_SIZE, factory=create_pose_model)
+
+# Landmark helpers
+def landmarks_to_keypoints(landmarks: np.ndarray, image_shape) -> List[Dict]:
+    pixels = landmarks_to_pixels(landmarks, image_shape).tolist()
+    return [
+        {
+            "name": name,
+            "x": x,
+            "y": y
+        }
+        for name, (x, y) in zip(LANDMARK_NAMES, pixels)
+    ]
+
+def landmarks_to_proto(landmarks: np.ndarray):
+    from mediapipe.framework.formats import landmark_pb2
+    return landmark_pb2.NormalizedLandmarkList(
+        landmark=[
+            landmark_pb2.NormalizedLandmark(x=float(x), y=float(y), z=float(z), visibility=float(v))
+            for x, y, z, v in landmarks
+        ]
+    )
+
+def error_image_result(error: str, render: str = RENDER_RASTER) -> Dict:
+    if render != RENDER_RASTER:
+        return {"error": error, "angle": None, "image": None}
+    error_img = np.zeros((300, 400, 3), dtype=np.uint8)
+    cv2.putText(error_img, f"Error: {error[:30]}...", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
+    encoded_error_img = encode_image_to_base64(error_img)
+    return {
+        "error": error,
+        "angle": None,
+        "image": f"data:image/jpeg;base64,{encoded_error_img}"
+    }
+
+# Run pose estimation on a preprocessed BGR image
+def infer_landmarks(pose_model, img: np.ndarray, buffers: Optional[BufferLease] = None) -> Optional[np.ndarray]:
+    dst = buffers.take(img.shape) if buffers is not None else None
+    img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=dst)
+    return pose_model.infer(img_rgb)
+
+# Lowest visibility among the landmarks the metric's angle is measured from
+def metric_confidence(landmarks: Optional[np.ndarray], metric: str, side: str) -> float:
+    if landmarks is None:
+        return 0.0
+    return float(landmarks[METRIC_CHAIN_INDICES[(metric, side)], 3].min())
+
+# Build the response entry for one metric from an image and its landmarks
+def build_metric_result(img: np.ndarray, landmarks: Optional[np.ndarray], metric: str, side: str,
+                        render: str = RENDER_RASTER, buffers: Optional[BufferLease] = None,
+                        encode: Optional[EncodeOptions] = None) -> Dict:
+    if landmarks is None:
+        logger.warning("No pose detected for %s", metric)
+        result = {"error": "No pose detected", "angle": None, "image": None}
+        if render == RENDER_RASTER:
+            # Draw on a copy so a stored session image stays clean
+            error_img = img.copy()
+            cv2.putText(error_img, "No pose detected", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 255), 2)
+            encode_result_image(result, error_img, encode)
+        return result
+
+    keypoints = landmarks_to_keypoints(landmarks, img.shape)
+
+    # Calculate angle
+    angle = ClinicalAngleCalculator.calculate_metric_angles(metric, keypoints, side)
+    logger.debug("Calculated angle for %s: %s", metric, angle)
+
+    result = {"angle": angle, "confidence": round(metric_confidence(landmarks, metric, side), 3),
+              "keypoints": keypoints, "image": None}
+    if render == RENDER_VECTOR:
+        key_dict = {kp["name"]: (kp["x"], kp["y"]) for kp in keypoints}
         try:
-            pose = mp_pose.Pose(
-                static_image_mode=True,
-                model_complexity=1,  # Using 1 instead of 2 to reduce memory usage
-                min_detection_confidence=0.5,
-                enable_segmentation=False
-            )
-            logger.info("Pose model initialized successfully")
+            angle_points = ClinicalAngleCalculator.metric_points(metric, key_dict, side)
+        except KeyError:
+            angle_points = None
+        result["overlay"] = build_overlay(angle_points, angle, metric, img.shape)
+    elif render == RENDER_RASTER:
+        # Renders into a pooled or per-thread reusable buffer, so encode before it is reused
+        out = buffers.take(img.shape) if buffers is not None else None
+        annotated_img = render_annotations(img, landmarks, angle, metric, side, out=out,
+                                           full_skeleton=config.ANNOTATE_FULL_SKELETON)
+        encode_result_image(result, annotated_img, encode)
+    return result
+
+# Cache keys: landmarks depend on the image and model settings, results also on how they are rendered
+def landmark_model_name(engine: str, model_complexity: int) -> str:
+    if engine == "tasks":
+        return pose_landmarker_model(model_complexity)
+    return pose_models(model_complexity)[1]
+
+def model_checksum(name: str) -> str:
+    if model_registry is not None:
+        return model_registry.sha256(name)
+    try:
+        return sha256_file(mediapipe_model_path(name))
+    except (ModelError, OSError):
+        # Not downloaded yet; mediapipe fetches the version pinned to the installed package
+        return "unknown"
+
+def pose_model_tag(engine: str, model_complexity: int, landmark_sha256: str) -> str:
+    """Changes whenever the landmarks could: another engine, model or model file."""
+    return f"{engine}-c{model_complexity}-{landmark_sha256[:16]}"
+
+POSE_MODEL_TAG = pose_model_tag(
+    config.POSE_ENGINE, config.POSE_MODEL_COMPLEXITY,
+    model_checksum(landmark_model_name(config.POSE_ENGINE, config.POSE_MODEL_COMPLEXITY)),
+)
+
+def landmarks_cache_key(content_hash: str) -> str:
+    return f"landmarks:{POSE_MODEL_TAG}:{config.MAX_IMAGE_DIM}:{content_hash}"
+
+def result_cache_key(content_hash: str, metric: str, side: str, render: str,
+                     encode: Optional[EncodeOptions]) -> str:
+    key = f"result:{POSE_MODEL_TAG}:{config.MAX_IMAGE_DIM}:{content_hash}:{metric}:{side}:{render}"
+    if render == RENDER_RASTER:
+        options = asdict(encode or EncodeOptions())
+        key += ":" + ",".join(f"{k}={v}" for k, v in options.items())
+        key += f":full_skeleton={config.ANNOTATE_FULL_SKELETON}"
+    return key
+
+def collect_files(uploads) -> Dict[str, UploadFile]:
+    return {m: f for m, f in zip(METRICS, uploads) if f is not None}
+
+def collect_shots(uploads) -> Dict[str, List[UploadFile]]:
+    return {m: files for m, files in zip(METRICS, uploads) if files}
+
+def timed_out_result(stage: str, budget: str) -> Dict:
+    return {
+        "error": "Deadline exceeded",
+        "status": "timed_out",
+        "stage": stage,
+        "budget": budget,
+        "angle": None,
+        "image": None
+    }
+
+# Returned by MetricJob.run_stage when a stage is skipped
+SKIPPED = object()
+
+STAGES = ("decode", "quality", "inference", "annotate")
+
+# Reject frames that cannot yield a pose; returns the failed checks
+def check_image_quality(img: np.ndarray) -> List[Dict]:
+    failures = quality_gate.check(quality_gate.measure(img), quality_thresholds)
+    registry.inc("quality_gate_total", outcome="fail" if failures else "pass")
+    for failure in failures:
+        registry.inc("quality_gate_failures_total", check=failure["check"])
+    return failures
+
+def rejected_result(failures: List[Dict]) -> Dict:
+    return {
+        "error": "Image quality too low",
+        "status": "rejected",
+        "reasons": failures,
+        "angle": None,
+        "image": None
+    }
+
+class Burst:
+    """
+    Several shots uploaded for one metric. The first shot whose required
+    landmarks are all at least BURST_MIN_VISIBILITY visible wins and the
+    remaining shots are cancelled; otherwise the best-scoring shot is used.
+    """
+
+    def __init__(self, metric: str, side: str):
+        self.metric = metric
+        self.side = side
+        self.jobs: List["MetricJob"] = []
+        self.winner: Optional["MetricJob"] = None
+        self.selected: Optional["MetricJob"] = None
+        self._lock = threading.Lock()
+
+    def offer(self, job: "MetricJob", landmarks: Optional[np.ndarray]) -> bool:
+        """Score a shot; returns True if it is good enough and the first to be, stopping the others."""
+        job.score = metric_confidence(landmarks, self.metric, self.side)
+        if job.score < config.BURST_MIN_VISIBILITY:
+            return False
+        with self._lock:
+            if self.winner is not None:
+                return False
+            self.winner = job
+        for other in self.jobs:
+            if other is not job:
+                other.token.cancel("burst")
+        registry.inc("burst_early_stops_total", metric=self.metric)
+        return True
+
+    def report(self, selected: "MetricJob") -> Dict:
+        return {
+            "shots": len(self.jobs),
+            "used": sum(job.score is not None for job in self.jobs),
+            "selected": selected.shot,
+            "score": round(selected.score, 3) if selected.score is not None else None,
+            "early_stop": self.winner is not None,
+        }
+
+class MetricJob:
+    """State of one metric moving through the decode / inference / annotate stages."""
+
+    def __init__(self, metric: str, content: bytes, side: str, deadline: Optional[Deadline],
+                 token: CancellationToken, on_landmarks=None, render: str = RENDER_RASTER,
+                 encode: Optional[EncodeOptions] = None, burst: Optional[Burst] = None, shot: int = 0,
+                 phash_scope: Optional[str] = None):
+        self.metric = metric
+        self.content = content
+        self.side = side
+        self.render = render
+        self.encode = encode
+        self.deadline = deadline
+        self.token = token
+        self.on_landmarks = on_landmarks
+        self.burst = burst
+        self.shot = shot
+        self.phash_scope = phash_scope  # Session whose earlier frames may be near-duplicates of this one
+        self.score: Optional[float] = None  # Set once a burst shot has landmarks
+        self.candidate = None  # (img, landmarks, near_duplicate) of a burst shot awaiting selection
+        self.landmarks: Optional[np.ndarray] = None  # Set once known, for on_result
+        self.submitted_at = time.monotonic()
+        self.stage: Optional[str] = None  # None while still queued
+        self.completed_stages: List[str] = []
+        self.cpu_seconds = 0.0
+        self._reported = False  # timeout counted and returned
+        self._accounted = False  # cancelled CPU time counted
+        self._lock = threading.Lock()
+
+    def run_stage(self, stage: str, fn, *args):
+        """Run one stage, or return SKIPPED if cancelled or the deadline leaves no room for it."""
+        if self.token.cancelled or (self.deadline is not None and not self.deadline.can_start(stage)):
+            return SKIPPED
+        self.stage = stage
+        started = time.perf_counter()
+        cpu_started = time.thread_time()
+        result = fn(*args)
+        elapsed = time.perf_counter() - started
+        self.cpu_seconds += time.thread_time() - cpu_started
+        self.completed_stages.append(stage)
+        stage_estimates.record(stage, elapsed)
+        registry.observe("pipeline_stage_seconds", elapsed, stage=stage)
+        structured_logging.record_stage(stage, elapsed)
+        return result
+
+    def _once(self, flag: str) -> bool:
+        with self._lock:
+            if getattr(self, flag):
+                return False
+            setattr(self, flag, True)
+            return True
+
+    def timed_out(self, stage: str) -> Optional[Dict]:
+        if not self._once("_reported"):
+            return None
+        budget = "queue" if self.stage is None else "compute"
+        registry.inc("deadline_exceeded_total", budget=budget, stage=stage)
+        logger.warning("Deadline exceeded for %s before %s (%s budget)", self.metric, stage, budget)
+        return timed_out_result(stage, budget)
+
+    def cancelled(self) -> None:
+        """Account CPU already spent (wasted) and the estimated CPU of skipped stages (saved)."""
+        if not self._once("_accounted"):
+            return
+        saved = sum(stage_estimates.estimate(s) for s in STAGES if s not in self.completed_stages)
+        registry.inc("cancelled_jobs_total", reason=self.token.reason)
+        registry.inc("cancelled_cpu_seconds_total", self.cpu_seconds, kind="wasted", reason=self.token.reason)
+        registry.inc("cancelled_cpu_seconds_total", saved, kind="saved", reason=self.token.reason)
+
+    def stop(self, stage: str) -> Optional[Dict]:
+        if self.token.cancelled:
+            self.cancelled()
+            return None
+        return self.timed_out(stage)
+
+    def _infer(self, img, buffers):
+        with pose_pool.acquire() as pose_model:
+            return infer_landmarks(pose_model, img, buffers)
+
+    def _near_duplicate(self, img, frame_hash: int):
+        """
+        Landmarks of an earlier frame of the session that this one nearly duplicates, and the match info,
+        or (None, None). A hash match is only reused if the patches around the metric's joints match too.
+        """
+        chain = METRIC_CHAIN_INDICES.get((self.metric, self.side))
+        match = phash_index.find(self.phash_scope, self.metric, self.side, frame_hash, img.shape)
+        if chain is None or match is None:
+            return None, None
+        match_hash, distance, patches = match
+        cached = result_cache.get(landmarks_cache_key(match_hash), "landmarks")
+        landmarks = unpack_landmarks(cached) if cached is not None else None
+        if landmarks is None:
+            return None, None
+        difference = patch_difference(patches, joint_patches(img, landmarks, chain))
+        if difference > config.PHASH_MAX_PATCH_DIFF:
+            registry.inc("near_duplicate_rejected_total", metric=self.metric)
+            return None, None
+        registry.inc("near_duplicate_hits_total", metric=self.metric)
+        return landmarks, {"content_hash": match_hash, "distance": distance, "joint_difference": round(difference, 2)}
+
+    def run(self) -> Optional[Dict]:
+        """Executed on an inference worker thread."""
+        registry.observe("queue_wait_seconds", time.monotonic() - self.submitted_at)
+        # Frame buffers go back to the arena once the result is encoded
+        with buffer_arena.lease() as buffers:
+            return self._run_stages(buffers)
+
+    def _run_stages(self, buffers: BufferLease) -> Optional[Dict]:
+        content_hash = content_key(self.content)
+        result_key = None
+        if self.on_landmarks is None and self.burst is None:
+            # Sessions need the decoded image and bursts the landmarks,
+            # so only plain analyses can skip the whole pipeline
+            result_key = result_cache_key(content_hash, self.metric, self.side, self.render, self.encode)
+            cached = result_cache.get(result_key, "result")
+            if cached is not None:
+                cached_landmarks = result_cache.get(landmarks_cache_key(content_hash), "landmarks")
+                if cached_landmarks is not None:
+                    self.landmarks = unpack_landmarks(cached_landmarks)
+                return responses.orjson.loads(cached)
+
+        img = self.run_stage("decode", preprocess_image, self.content, buffers)
+        if img is SKIPPED:
+            return self.stop("decode")
+        self.content = None
+
+        landmarks_key = landmarks_cache_key(content_hash)
+        cached = result_cache.get(landmarks_key, "landmarks")
+        near_duplicate = None
+        if cached is not None:
+            landmarks = unpack_landmarks(cached)
+        else:
+            if config.QUALITY_GATE_ENABLED:
+                failures = self.run_stage("quality", check_image_quality, img)
+                if failures is SKIPPED:
+                    return self.stop("quality")
+                if failures:
+                    logger.warning("Rejected %s: %s", self.metric, [f["check"] for f in failures])
+                    return rejected_result(failures)
+
+            frame_hash = None
+            landmarks = None
+            if config.PHASH_ENABLED and self.phash_scope is not None:
+                frame_hash = dhash(img)
+                landmarks, near_duplicate = self._near_duplicate(img, frame_hash)
+            if near_duplicate is None:
+                # Run Pose Estimation - each worker holds its own pose model
+                landmarks = self.run_stage("inference", self._infer, img, buffers)
+                if landmarks is SKIPPED:
+                    return self.stop("inference")
+                result_cache.set(landmarks_key, pack_landmarks(landmarks))
+                chain = METRIC_CHAIN_INDICES.get((self.metric, self.side))
+                if frame_hash is not None and landmarks is not None and chain is not None:
+                    phash_index.add(self.phash_scope, self.metric, self.side, frame_hash, img.shape, content_hash,
+                                    joint_patches(img, landmarks, chain))
+        self.landmarks = landmarks
+        if self.burst is not None and not self.burst.offer(self, landmarks):
+            # Only the selected shot is annotated and stored, see select_burst_result
+            self.candidate = (img.copy(), landmarks, near_duplicate)
+            return None
+        if self.on_landmarks is not None and not self.token.cancelled:
+            # img may live in a pooled buffer, so keep a private copy
+            self.on_landmarks(self.metric, img.copy(), landmarks)
+
+        result = self.run_stage("annotate", build_metric_result, img, landmarks, self.metric, self.side,
+                                self.render, buffers, self.encode)
+        if result is SKIPPED:
+            return self.stop("annotate")
+        if near_duplicate is not None:
+            result["near_duplicate"] = near_duplicate
+        if self.token.cancelled:
+            # Finished, but nobody is waiting for the result any more
+            self.cancelled()
+            return None
+        if result_key is not None:
+            result_cache.set(result_key, responses.dumps(result))
+        logger.info("Processed %s", self.metric)
+        return result
+
+async def watch_disconnect(request: Request, token: CancellationToken, futures) -> None:
+    """Poll the connection while jobs run; on disconnect cancel the token and queued jobs."""
+    while not token.cancelled:
+        if await request.is_disconnected():
+            if token.cancel("disconnect"):
+                logger.warning("Client disconnected, cancelling remaining work")
+                for future in futures:
+                    # Frees the pool slot of queued jobs; running jobs stop at the next stage
+                    future.cancel()
+            return
+        await asyncio.sleep(config.DISCONNECT_POLL_SECONDS)
+
+# Read the uploaded images and run them through the pipeline.
+# A metric may have several uploads (a burst of shots), see Burst.
+async def process_uploads(files: Dict[str, List[UploadFile]], side: str, deadline: Optional[Deadline] = None,
+                          on_landmarks=None, request: Optional[Request] = None,
+                          render: str = RENDER_RASTER, encode: Optional[EncodeOptions] = None,
+                          on_result=None, phash_scope: Optional[str] = None) -> Dict[str, Dict]:
+    contents = {}
+    for metric, uploads in files.items():
+        shots = [await file.read() for file in uploads]
+        contents[metric] = shots if len(shots) > 1 else shots[0]
+    return await process_contents(contents, side, deadline, on_landmarks, request, render, encode, on_result,
+                                  phash_scope)
+
+# Annotate (and store) the best shot of a burst that had no early winner
+async def select_burst_result(burst: Burst, outcomes: Dict[MetricJob, Optional[Dict]], side: str,
+                              on_landmarks=None, render: str = RENDER_RASTER,
+                              encode: Optional[EncodeOptions] = None) -> Dict:
+    if burst.winner is not None and outcomes.get(burst.winner) is not None:
+        selected, result = burst.winner, outcomes[burst.winner]
+    else:
+        candidates = [job for job in burst.jobs if job.candidate is not None]
+        if candidates:
+            selected = max(candidates, key=lambda job: job.score)
+            img, landmarks, near_duplicate = selected.candidate
+            if on_landmarks is not None:
+                await asyncio.to_thread(on_landmarks, burst.metric, img, landmarks)
+            result = await pose_pool.submit(profiler.profiled(build_metric_result), img, landmarks, burst.metric,
+                                            side, render, None, encode)
+            if near_duplicate is not None:
+                result["near_duplicate"] = near_duplicate
+        else:
+            # Every shot was rejected, failed or timed out; report the first of them
+            selected = next((job for job in burst.jobs if outcomes.get(job) is not None), burst.jobs[0])
+            result = outcomes.get(selected) or timed_out_result("decode", "compute")
+    burst.selected = selected
+    result["burst"] = burst.report(selected)
+    return result
+
+# Preprocess and run inference for each metric image (or list of shots).
+# on_landmarks(metric, img, landmarks) is called for every image that reached inference;
+# for bursts only for the selected shot.
+# on_result(metric, result, landmarks) is called for every final result.
+# With a phash_scope (a session id), near-duplicates of the session's earlier frames reuse their landmarks.
+# Raises ClientDisconnected if request is given and the client goes away.
+async def process_contents(contents: Dict[str, Union[bytes, List[bytes]]], side: str,
+                           deadline: Optional[Deadline] = None, on_landmarks=None,
+                           request: Optional[Request] = None, render: str = RENDER_RASTER,
+                           encode: Optional[EncodeOptions] = None, on_result=None,
+                           phash_scope: Optional[str] = None) -> Dict[str, Dict]:
+    results: Dict[str, Dict] = {}
+    jobs: List[MetricJob] = []
+    bursts: Dict[str, Burst] = {}
+    token = CancellationToken()
+    logger.info("Processing %d images for side: %s", len(contents), side)
+
+    for metric, file_content in contents.items():
+        if isinstance(file_content, list):
+            shots = [shot for shot in file_content[:config.BURST_MAX_SHOTS] if shot]
+            if not shots:
+                results[metric] = {"error": "Empty file", "angle": None, "image": None}
+                continue
+            burst = bursts[metric] = Burst(metric, side)
+            for index, shot in enumerate(shots):
+                # Each shot gets its own token so a winning shot can stop its siblings
+                job = MetricJob(metric, shot, side, deadline, CancellationToken(token), on_landmarks,
+                                render, encode, burst=burst, shot=index, phash_scope=phash_scope)
+                burst.jobs.append(job)
+                jobs.append(job)
+            registry.inc("burst_shots_total", len(shots), metric=metric)
+            continue
+        if not file_content:
+            logger.warning("Empty file for %s", metric)
+            results[metric] = {"error": "Empty file", "angle": None, "image": None}
+            continue
+        jobs.append(MetricJob(metric, file_content, side, deadline, token, on_landmarks, render, encode,
+                              phash_scope=phash_scope))
+
+    if request is not None and await request.is_disconnected():
+        raise ClientDisconnected()
+
+    futures = {job: pose_pool.submit(profiler.profiled(job.run)) for job in jobs}
+    watcher = None
+    if request is not None and futures:
+        watcher = asyncio.create_task(watch_disconnect(request, token, list(futures.values())))
+    try:
+        timeout = deadline.remaining() if deadline is not None else None
+        if futures:
+            await asyncio.wait(futures.values(), timeout=timeout)
+    except asyncio.CancelledError:
+        # The caller gave up (e.g. a retake replaced this capture); stop the running jobs too
+        token.cancel("superseded")
+        raise
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+    if token.reason == "disconnect":
+        for job, future in futures.items():
+            if job.stage is None or future.done():
+                job.cancelled()
+        raise ClientDisconnected()
+
+    pending = [job for job, future in futures.items() if not future.done()]
+    if pending:
+        token.cancel("deadline")
+    outcomes: Dict[MetricJob, Optional[Dict]] = {}
+    for job, future in futures.items():
+        if job in pending:
+            # Queued jobs give up their pool slot; running jobs skip their remaining stages
+            future.cancel()
+            stage = job.stage or "decode"
+            outcomes[job] = job.timed_out(stage) or timed_out_result(stage, "compute")
+            if job.stage is None:
+                job.cancelled()
+            continue
+        try:
+            outcomes[job] = future.result()
         except Exception as e:
-            logger.error(f"Failed to initialize pose model: {e}")
+            logger.error("Error processing %s: %s", job.metric, e)
             traceback.print_exc()
-    return pose
+            outcomes[job] = error_image_result(str(e), render)
+
+    for job in jobs:
+        if job.burst is None:
+            results[job.metric] = outcomes[job]
+    for metric, burst in bursts.items():
+        try:
+            results[metric] = await select_burst_result(burst, outcomes, side, on_landmarks, render, encode)
+        except Exception as e:
+            logger.error("Error processing %s: %s", metric, e)
+            results[metric] = error_image_result(str(e), render)
+
+    if on_result is not None:
+        for job in jobs:
+            if job.burst is None:
+                on_result(job.metric, results[job.metric], job.landmarks)
+        for metric, burst in bursts.items():
+            on_result(metric, results[metric], burst.selected.landmarks if burst.selected else None)
+
+    return {m: results[m] for m in contents}
+
+# on_result callback that queues successful measurements of a patient, or None without a patient
+def measurement_recorder(patient_id: Optional[str], side: str, session_id: Optional[str] = None):
+    if not patient_id:
+        return None
+
+    def record(metric, result, landmarks):
+        if result.get("angle") is None:
+            return
+        measurement_store.record(Measurement(
+            patient_id=patient_id,
+            metric=metric,
+            side=side,
+            angle=float(result["angle"]),
+            confidence=result.get("confidence"),
+            landmarks=landmarks,
+            session_id=session_id,
+        ))
+    return record
+
+# Serialize with orjson, skipping FastAPI's jsonable_encoder walk
+def json_response(content, request: Request) -> FastJSONResponse:
+    return FastJSONResponse(content, accept_encoding=request.headers.get("accept-encoding"))
+
+def check_render_mode(render: str) -> str:
+    if render not in RENDER_MODES:
+        raise HTTPException(status_code=400, detail=f"render must be one of: {', '.join(RENDER_MODES)}")
+    return render
+
+# Output encoding: form fields, with the format negotiated from Accept when not given
+def get_encode_options(
+    accept: Optional[str] = Header(None),
+    image_format: Optional[str] = Form(None),
+    quality: Optional[int] = Form(None),
+    target_kb: Optional[int] = Form(None),
+    thumbnail: Optional[int] = Form(None)
+) -> EncodeOptions:
+    try:
+        return negotiate_options(accept, image_format, quality, target_kb, thumbnail,
+                                 max_trials=config.ENCODE_MAX_TRIALS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def parse_deadline(header_ms: Optional[str], form_ms: Optional[str]) -> Optional[Deadline]:
+    try:
+        return Deadline.from_request(header_ms, form_ms)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid deadline: {e}")
 
 # Pose Estimation API
 @app.post("/analyze-metrics")
 async def analyze_metrics(
-    ankle: Optional[UploadFile] = File(None),
-    knee: Optional[UploadFile] = File(None),
-    hipFlexion: Optional[UploadFile] = File(None),
-    R1: Optional[UploadFile] = File(None),
-    popliteal: Optional[UploadFile] = File(None),
-    R2: Optional[UploadFile] = File(None),
-    side: str = Form("right")
+    request: Request,
+    ankle: Optional[List[UploadFile]] = File(None),
+    knee: Optional[List[UploadFile]] = File(None),
+    hipFlexion: Optional[List[UploadFile]] = File(None),
+    R1: Optional[List[UploadFile]] = File(None),
+    popliteal: Optional[List[UploadFile]] = File(None),
+    R2: Optional[List[UploadFile]] = File(None),
+    side: str = Form("right"),
+    render: str = Form(RENDER_RASTER),
+    encode: EncodeOptions = Depends(get_encode_options),
+    deadline_ms: Optional[str] = Form(None),
+    x_request_deadline_ms: Optional[str] = Header(None),
+    patient_id: Optional[str] = Form(None),
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None)
 ):
     try:
+        check_render_mode(render)
+        deadline = parse_deadline(x_request_deadline_ms, deadline_ms)
+        profile = None
+        if x_profile:
+            # cProfile slows the request down a lot, so only admins may ask for it
+            require_admin(x_admin_token)
+            profile = profiler.RequestProfile()
+            profiler.active_profile.set(profile)
+
         # Initialize pose model if not already done
-        pose_model = get_pose_model()
-        if pose_model is None:
+        if not await asyncio.to_thread(pose_pool.ensure_ready):
             raise HTTPException(status_code=500, detail="Failed to initialize pose model")
-        
-        metrics = ["ankle", "knee", "hipFlexion", "R1", "popliteal", "R2"]
-        files = {m: locals()[m] for m in metrics if locals()[m] is not None}
 
+        files = collect_shots([ankle, knee, hipFlexion, R1, popliteal, R2])
+        if not files:
+            raise HTTPException(status_code=400, detail="No images provided")
+
+        results = await process_uploads(files, side, deadline, request=request, render=render, encode=encode,
+                                        on_result=measurement_recorder(patient_id, side))
+        if profile is not None:
+            results["profile"] = profile.report()
+        return json_response(results, request)
+    except ClientDisconnected:
+        # Nobody is listening; 499 is only visible in access logs
+        return Response(status_code=499)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Global error in analyze_metrics: %s", e)
+        traceback.print_exc()
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Video analysis: per-frame angles, running inference only on keyframes
+def analyze_video_file(path: str, metric: str, side: str, settings: KeyframeSettings) -> Dict:
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError("Could not read video")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 30.0
+    frames = []
+    started = time.perf_counter()
+    video_id = uuid.uuid4().hex
+    archive = LandmarkArchiveWriter(landmark_archive_path(video_id), config.LANDMARK_KEYFRAME_INTERVAL)
+    try:
+        with pose_pool.acquire() as pose_model, pose_model.video() as video:
+            # With the tasks engine the pose is tracked from one keyframe to the next
+            def infer_frame(frame):
+                timestamp_ms = round((scheduler.frames - 1) * 1000 / fps)
+                return video.infer(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), timestamp_ms)
+
+            scheduler = KeyframeScheduler(infer_frame, settings, watch=METRIC_CHAIN_INDICES[(metric, side)])
+            while scheduler.frames < config.VIDEO_MAX_FRAMES:
+                ok, frame = capture.read()
+                if not ok:
+                    break
+                scale = config.MAX_IMAGE_DIM / max(frame.shape[:2])
+                if scale < 1:
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+                landmarks, keyframe, reason = scheduler.process(frame)
+                archive.append(landmarks)
+                angle = None
+                if landmarks is not None:
+                    keypoints = landmarks_to_keypoints(landmarks, frame.shape)
+                    angle = ClinicalAngleCalculator.calculate_metric_angles(metric, keypoints, side)
+                index = len(frames)
+                frames.append({"index": index, "time": round(index / fps, 3), "angle": angle,
+                               "keyframe": keyframe, "reason": reason or None})
+    finally:
+        capture.release()
+        archive.close()
+
+    registry.inc("video_frames_total", scheduler.keyframes, kind="keyframe")
+    registry.inc("video_frames_total", scheduler.frames - scheduler.keyframes, kind="interpolated")
+    angles = [f["angle"] for f in frames if f["angle"] is not None]
+    return {
+        "video_id": video_id,
+        "metric": metric,
+        "side": side,
+        "frames": frames,
+        "summary": {
+            "fps": fps,
+            "frames": scheduler.frames,
+            "keyframes": scheduler.keyframes,
+            "effective_inference_rate": round(scheduler.inference_rate, 4),
+            "inference_fps": round(scheduler.inference_rate * fps, 2),
+            "processing_seconds": round(time.perf_counter() - started, 3),
+            "min_angle": min(angles) if angles else None,
+            "max_angle": max(angles) if angles else None,
+        }
+    }
+
+@app.post("/analyze-video")
+async def analyze_video(
+    request: Request,
+    file: UploadFile = File(...),
+    metric: str = Form(...),
+    side: str = Form("right"),
+    max_skip: Optional[int] = Form(None)
+):
+    if metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    if side not in ("left", "right"):
+        raise HTTPException(status_code=400, detail="side must be left or right")
+    if max_skip is not None and max_skip < 0:
+        raise HTTPException(status_code=400, detail="max_skip must not be negative")
+    if not await asyncio.to_thread(pose_pool.ensure_ready):
+        raise HTTPException(status_code=500, detail="Failed to initialize pose model")
+
+    settings = KeyframeSettings(
+        max_skip=config.KEYFRAME_MAX_SKIP if max_skip is None else max_skip,
+        diff_threshold=config.KEYFRAME_DIFF_THRESHOLD,
+        motion_threshold=config.KEYFRAME_MOTION_THRESHOLD,
+    )
+    # OpenCV reads video from a path, so spool the upload to a temporary file
+    suffix = os.path.splitext(file.filename or "")[1] or ".mp4"
+    with tempfile.NamedTemporaryFile(suffix=suffix) as spool:
+        while chunk := await file.read(1024 * 1024):
+            spool.write(chunk)
+        spool.flush()
+        try:
+            result = await pose_pool.submit(analyze_video_file, spool.name, metric, side, settings)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error("Error analyzing video: %s", e)
+            traceback.print_exc()
+            raise HTTPException(status_code=500, detail=str(e))
+    return json_response(result, request)
+
+def landmark_archive_path(video_id: str) -> str:
+    return os.path.join(config.LANDMARK_ARCHIVE_DIR, f"{video_id}.lmk")
+
+def existing_archive_path(video_id: str) -> str:
+    path = landmark_archive_path(video_id)
+    # video_id ends up in a path, so only accept ids we generated
+    if len(video_id) != 32 or any(c not in "0123456789abcdef" for c in video_id) or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Video not found")
+    return path
+
+def export_response(batches, batch_schema, format: str, filename: str) -> StreamingResponse:
+    extension = {"parquet": "parquet", "arrow": "arrows"}[format]
+    # A sync iterator, so Starlette encodes the batches in its thread pool
+    return StreamingResponse(
+        measurement_export.stream(batches, batch_schema, format),
+        media_type=measurement_export.FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{extension}"'},
+    )
+
+@app.get("/videos/{video_id}/landmarks")
+async def get_video_landmarks(request: Request, video_id: str, start: int = 0, count: int = 100):
+    if start < 0 or not 1 <= count <= 1000:
+        raise HTTPException(status_code=400, detail="start must be >= 0 and count between 1 and 1000")
+    path = existing_archive_path(video_id)
+    with LandmarkArchive(path) as archive:
+        total = len(archive)
+        frames = [
+            {"index": start + i, "landmarks": landmarks.round(5).tolist() if landmarks is not None else None}
+            for i, landmarks in enumerate(archive.frames(start, start + count))
+        ]
+    return json_response({"video_id": video_id, "total_frames": total, "frames": frames}, request)
+
+@app.get("/videos/{video_id}/export")
+async def export_video_landmarks(video_id: str, format: str = "parquet"):
+    """Per-frame landmarks of an analyzed video as Parquet or an Arrow IPC stream."""
+    if format not in measurement_export.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be parquet or arrow")
+    path = existing_archive_path(video_id)
+    try:
+        batch_schema = measurement_export.schema(("frame", "landmarks"))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    batches = measurement_export.video_batches(path, config.EXPORT_BATCH_ROWS)
+    return export_response(batches, batch_schema, format, f"video-{video_id}")
+
+# Session API: upload once, then recompute from stored landmarks
+@app.post("/sessions")
+async def create_session(
+    request: Request,
+    ankle: Optional[List[UploadFile]] = File(None),
+    knee: Optional[List[UploadFile]] = File(None),
+    hipFlexion: Optional[List[UploadFile]] = File(None),
+    R1: Optional[List[UploadFile]] = File(None),
+    popliteal: Optional[List[UploadFile]] = File(None),
+    R2: Optional[List[UploadFile]] = File(None),
+    side: str = Form("right"),
+    render: str = Form(RENDER_RASTER),
+    encode: EncodeOptions = Depends(get_encode_options),
+    deadline_ms: Optional[str] = Form(None),
+    x_request_deadline_ms: Optional[str] = Header(None),
+    patient_id: Optional[str] = Form(None)
+):
+    try:
+        check_render_mode(render)
+        deadline = parse_deadline(x_request_deadline_ms, deadline_ms)
+        if not await asyncio.to_thread(pose_pool.ensure_ready):
+            raise HTTPException(status_code=500, detail="Failed to initialize pose model")
+
+        files = collect_shots([ankle, knee, hipFlexion, R1, popliteal, R2])
         if not files:
             raise HTTPException(status_code=400, detail="No images provided")
 
-        results: Dict[str, Dict] = {}
-        logger.info(f"Processing {len(files)} images for side: {side}")
-
-        for metric, file in files.items():
-            try:
-                logger.info(f"Processing {metric} image")
-                # Read the file content
-                file_content = await file.read()
-                if not file_content:
-                    logger.warning(f"Empty file for {metric}")
-                    results[metric] = {"error": "Empty file", "angle": None, "image": None}
-                    continue
-                
-                img = preprocess_image(file_content)
-                img_rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-
-                # Run Pose Estimation - processing one image at a time to avoid memory issues
-                results_pose = pose_model.process(img_rgb)
-                
-                if not results_pose.pose_landmarks:
-                    logger.warning(f"No pose detected for {metric}")
-                    # Create a basic image with error text
-                    cv2.putText(img, "No pose detected", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0, 0, 255), 2)
-                    encoded_image = encode_image_to_base64(img)
-                    results[metric] = {
-                        "error": "No pose detected", 
-                        "angle": None, 
-                        "image": f"data:image/jpeg;base64,{encoded_image}"
-                    }
-                    continue
-
-                # Extract keypoints with proper names
-                keypoints = [
-                    {
-                        "name": mp_pose.PoseLandmark(i).name,
-                        "x": int(lm.x * img.shape[1]),
-                        "y": int(lm.y * img.shape[0])
-                    }
-                    for i, lm in enumerate(results_pose.pose_landmarks.landmark)
-                ]
-
-                # Calculate angle
-                angle = ClinicalAngleCalculator.calculate_metric_angles(metric, keypoints, side)
-                logger.info(f"Calculated angle for {metric}: {angle}")
-                
-                # Draw landmarks and angle
-                annotated_img = draw_landmarks_and_angles(img, results_pose.pose_landmarks, angle, metric, side)
-                
-                # Encode image
-                encoded_image = encode_image_to_base64(annotated_img)
-
-                # Store results
-                results[metric] = {
-                    "angle": angle,
-                    "keypoints": keypoints,
-                    "image": f"data:image/jpeg;base64,{encoded_image}"
-                }
-                logger.info(f"Successfully processed {metric}")
-                
-                # Explicitly release memory
-                del img, img_rgb, annotated_img
-                
-            except Exception as e:
-                logger.error(f"Error processing {metric}: {str(e)}")
-                traceback.print_exc()
-                
-                # Create an error image
-                error_img = np.zeros((300, 400, 3), dtype=np.uint8)
-                cv2.putText(error_img, f"Error: {str(e)[:30]}...", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 1)
-                encoded_error_img = encode_image_to_base64(error_img)
-                
-                results[metric] = {
-                    "error": str(e), 
-                    "angle": None, 
-                    "image": f"data:image/jpeg;base64,{encoded_error_img}"
-                }
-
-        return results
+        session = await asyncio.to_thread(session_store.create, side, patient_id)
+
+        def store(metric, img, landmarks):
+            session_store.put_metric(session.session_id, metric, img, landmarks)
+
+        try:
+            results = await process_uploads(files, side, deadline, on_landmarks=store, request=request,
+                                            render=render, encode=encode,
+                                            on_result=measurement_recorder(patient_id, side, session.session_id),
+                                            phash_scope=session.session_id)
+        except ClientDisconnected:
+            await asyncio.to_thread(session_store.delete, session.session_id)
+            phash_index.discard(session.session_id)
+            return Response(status_code=499)
+        return json_response({
+            "session_id": session.session_id,
+            "expires_in": session_store.ttl_seconds,
+            "results": results
+        }, request)
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Global error in analyze_metrics: {str(e)}")
+        logger.error("Global error in create_session: %s", e)
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
-# Run Server
+@app.post("/sessions/{session_id}/recompute")
+async def recompute_session(
+    request: Request,
+    session_id: str,
+    side: Optional[str] = Form(None),
+    metrics: Optional[str] = Form(None),
+    render: str = Form(RENDER_NONE),
+    encode: EncodeOptions = Depends(get_encode_options)
+):
+    check_render_mode(render)
+    session = await asyncio.to_thread(session_store.get, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    side = side or session.side
+    requested = [m.strip() for m in metrics.split(",") if m.strip()] if metrics else list(session.metrics)
+    unknown = [m for m in requested if m not in METRICS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown metrics: {', '.join(unknown)}")
+
+    # Drawing and encoding run on the pose pool, as for fresh uploads
+    futures = {}
+    for metric in requested:
+        record = session.metrics.get(metric)
+        if record is not None:
+            futures[metric] = pose_pool.submit(profiler.profiled(build_metric_result), record.image,
+                                               record.landmarks, metric, side, render, None, encode)
+    results: Dict[str, Dict] = {}
+    for metric in requested:
+        if metric not in futures:
+            results[metric] = {"error": "No image uploaded for this metric", "angle": None, "image": None}
+            continue
+        try:
+            results[metric] = await futures[metric]
+        except Exception as e:
+            logger.error("Error recomputing %s: %s", metric, e)
+            results[metric] = error_image_result(str(e), render)
+
+    return json_response({"session_id": session_id, "side": side, "results": results}, request)
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    for task in session_tasks.pop(session_id, {}).values():
+        task.cancel()
+    phash_index.discard(session_id)
+    if not await asyncio.to_thread(session_store.delete, session_id):
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+    return {"deleted": session_id}
+
+# Incremental submission: each metric is analyzed as soon as it is captured,
+# while the next one is being set up. In-flight analyses per session and metric:
+session_tasks: Dict[str, Dict[str, asyncio.Task]] = {}
+
+async def analyze_into_session(session_id: str, metric: str, content: Union[bytes, List[bytes]], side: str,
+                               render: str, encode: EncodeOptions, patient_id: Optional[str] = None) -> None:
+    def store(metric, img, landmarks):
+        session_store.put_metric(session_id, metric, img, landmarks)
+
+    try:
+        results = await process_contents({metric: content}, side, on_landmarks=store, render=render, encode=encode,
+                                         on_result=measurement_recorder(patient_id, side, session_id),
+                                         phash_scope=session_id)
+        await asyncio.to_thread(session_store.put_result, session_id, metric, results[metric])
+    except KeyError:
+        logger.warning("Session %s expired while analyzing %s", session_id, metric)
+    except Exception as e:
+        logger.error("Error analyzing %s for session %s: %s", metric, session_id, e)
+        traceback.print_exc()
+        await asyncio.to_thread(session_store.put_result, session_id, metric, error_image_result(str(e), render))
+
+def track_session_task(session_id: str, metric: str, task: asyncio.Task) -> None:
+    tasks = session_tasks.setdefault(session_id, {})
+    previous = tasks.get(metric)
+    if previous is not None:
+        # A retake replaces the earlier capture
+        previous.cancel()
+    tasks[metric] = task
+
+    def untrack(_):
+        if tasks.get(metric) is task:
+            del tasks[metric]
+            if not tasks:
+                session_tasks.pop(session_id, None)
+    task.add_done_callback(untrack)
+
+@app.post("/analyze-metric/{metric}", status_code=202)
+async def analyze_metric(
+    metric: str,
+    file: List[UploadFile] = File(...),
+    session_id: Optional[str] = Form(None),
+    side: Optional[str] = Form(None),
+    render: str = Form(RENDER_RASTER),
+    encode: EncodeOptions = Depends(get_encode_options),
+    patient_id: Optional[str] = Form(None)
+):
+    """Start analyzing one captured metric (or a burst of shots) in an assessment session, creating it if needed."""
+    if metric not in METRICS:
+        raise HTTPException(status_code=404, detail=f"Unknown metric: {metric}")
+    check_render_mode(render)
+    if not await asyncio.to_thread(pose_pool.ensure_ready):
+        raise HTTPException(status_code=500, detail="Failed to initialize pose model")
+
+    if session_id is None:
+        session = await asyncio.to_thread(session_store.create, side or "right", patient_id)
+    else:
+        session = await asyncio.to_thread(session_store.get, session_id)
+        if session is None:
+            raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    shots = [await upload.read() for upload in file]
+    content = shots if len(shots) > 1 else shots[0]
+    task = asyncio.create_task(
+        analyze_into_session(session.session_id, metric, content, side or session.side, render, encode,
+                             patient_id or session.patient_id)
+    )
+    track_session_task(session.session_id, metric, task)
+    return {
+        "session_id": session.session_id,
+        "metric": metric,
+        "status": "processing",
+        "results_url": f"/sessions/{session.session_id}/results"
+    }
+
+@app.get("/sessions/{session_id}/results")
+async def get_session_results(request: Request, session_id: str, wait: float = config.JOB_MAX_WAIT_SECONDS):
+    """Results of incremental submissions, waiting up to `wait` seconds for analyses still running."""
+    pending = list(session_tasks.get(session_id, {}).values())
+    if pending and wait > 0:
+        await asyncio.wait(pending, timeout=min(wait, config.JOB_MAX_WAIT_SECONDS))
+    session = await asyncio.to_thread(session_store.get, session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found or expired")
+
+    return json_response({
+        "session_id": session_id,
+        "side": session.side,
+        "results": {m: session.results[m] for m in METRICS if m in session.results},
+        "pending": [m for m in METRICS if m in session_tasks.get(session_id, {})]
+    }, request)
+
+# Job API: queue an analysis and poll for its result instead of holding the request open
+async def run_analysis_job(params: Dict, files: Dict[str, bytes]) -> bytes:
+    encode = EncodeOptions(**params["encode"])
+    contents = {metric: files[metric] for metric in METRICS if metric in files}
+    results = await process_contents(contents, params["side"], render=params["render"], encode=encode,
+                                     on_result=measurement_recorder(params.get("patient_id"), params["side"]))
+    return responses.dumps(results)
+
+job_scheduler = JobScheduler(
+    JobQueue(config.JOB_DB_PATH, lease_seconds=config.JOB_LEASE_SECONDS),
+    run_analysis_job,
+    concurrency=config.JOB_CONCURRENCY,
+    poll_seconds=config.JOB_POLL_SECONDS,
+    retention_seconds=config.JOB_RESULT_TTL_SECONDS,
+)
+
+@app.on_event("startup")
+async def start_job_scheduler():
+    job_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_job_scheduler():
+    await job_scheduler.stop()
+
+@app.post("/jobs", status_code=202)
+async def create_job(
+    ankle: Optional[UploadFile] = File(None),
+    knee: Optional[UploadFile] = File(None),
+    hipFlexion: Optional[UploadFile] = File(None),
+    R1: Optional[UploadFile] = File(None),
+    popliteal: Optional[UploadFile] = File(None),
+    R2: Optional[UploadFile] = File(None),
+    side: str = Form("right"),
+    render: str = Form(RENDER_RASTER),
+    encode: EncodeOptions = Depends(get_encode_options),
+    patient_id: Optional[str] = Form(None)
+):
+    check_render_mode(render)
+    files = collect_files([ankle, knee, hipFlexion, R1, popliteal, R2])
+    if not files:
+        raise HTTPException(status_code=400, detail="No images provided")
+
+    contents = {metric: await file.read() for metric, file in files.items()}
+    params = {"side": side, "render": render, "encode": asdict(encode), "patient_id": patient_id}
+    job_id = await asyncio.to_thread(job_scheduler.queue.enqueue, params, contents)
+    job_scheduler.notify()
+    logger.info("Queued job %s with %d images", job_id, len(contents))
+    return {"job_id": job_id, "status": "queued", "status_url": f"/jobs/{job_id}"}
+
+@app.get("/jobs/{job_id}")
+async def get_job(request: Request, job_id: str, wait: float = 0):
+    """Job status and, once done, its results. wait > 0 long-polls until the job finishes."""
+    if wait > 0:
+        await job_scheduler.wait_for(job_id, min(wait, config.JOB_MAX_WAIT_SECONDS))
+    job = await asyncio.to_thread(job_scheduler.queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+
+    body = {
+        "job_id": job_id,
+        "status": job["status"],
+        "queue_position": job["queue_position"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+    if job["status"] == DONE:
+        body["results"] = responses.orjson.loads(job["result"])
+    elif job["status"] == FAILED:
+        body["error"] = job["error"]
+    return json_response(body, request)
+
+# Measurement history: every successful measurement taken with a patient_id
+@app.on_event("startup")
+async def start_measurement_writer():
+    measurement_store.start()
+
+@app.on_event("shutdown")
+async def stop_measurement_writer():
+    measurement_store.stop()
+
+# Admin API
+def require_admin(token: Optional[str]) -> None:
+    if not config.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled")
+    if token is None or not hmac.compare_digest(token.encode(), config.ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+stack_sampler = profiler.StackSampler(
+    interval=config.PROFILER_INTERVAL_MS / 1000,
+    max_overhead=config.PROFILER_MAX_OVERHEAD,
+    window_seconds=config.PROFILER_WINDOW_SECONDS,
+    snapshot_dir=config.PROFILER_DIR,
+)
+
+@app.on_event("startup")
+async def verify_models():
+    # Before any model is loaded: fail startup rather than stall or fetch on the first request
+    if model_registry is not None:
+        model_registry.verify()
+        if config.POSE_ENGINE == "mediapipe":  # The tflite engine loads them from the directory
+            model_registry.install_mediapipe(pose_models(config.POSE_MODEL_COMPLEXITY))
+
+@app.on_event("shutdown")
+async def close_model_registry():
+    if model_registry is not None:
+        model_registry.close()
+
+@app.on_event("startup")
+async def start_inference_workers():
+    # Spawn workers now so the first request does not wait for models to load
+    if inference_workers is not None:
+        inference_workers.start()
+
+@app.on_event("shutdown")
+async def stop_inference_workers():
+    if inference_workers is not None:
+        inference_workers.close()
+
+@app.on_event("startup")
+async def start_stack_sampler():
+    if config.PROFILER_ENABLED:
+        stack_sampler.start()
+
+@app.on_event("shutdown")
+async def stop_stack_sampler():
+    stack_sampler.stop()
+
+@app.get("/admin/profile", response_class=PlainTextResponse)
+async def get_profile(x_admin_token: Optional[str] = Header(None), workers: str = "all"):
+    """
+    Folded stacks (flamegraph.pl / speedscope input) sampled over the last one
+    to two profiler windows, for all workers or only the one answering.
+    """
+    require_admin(x_admin_token)
+    if workers not in ("all", "self"):
+        raise HTTPException(status_code=400, detail="workers must be all or self")
+    counts = stack_sampler.all_workers() if workers == "all" else stack_sampler.counts()
+    return PlainTextResponse(profiler.format_folded(counts))
+
+@app.get("/admin/models")
+async def get_models(x_admin_token: Optional[str] = Header(None)):
+    """Local pose models with their checksums, load times and resident size in this process."""
+    require_admin(x_admin_token)
+    if model_registry is None:
+        raise HTTPException(status_code=404, detail="No MODEL_DIR configured")
+    try:
+        return {"model_dir": config.MODEL_DIR, "models": model_registry.report()}
+    except ModelError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/patients/{patient_id}/measurements")
+async def get_measurement_history(
+    request: Request,
+    patient_id: str,
+    metric: Optional[str] = None,
+    side: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    include_landmarks: bool = False
+):
+    """Newest-first page of a patient's measurements; pass next_cursor back as cursor for the next page."""
+    if metric is not None and metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    if not 1 <= limit <= 1000:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 1000")
+    try:
+        page = await asyncio.get_running_loop().run_in_executor(
+            None, lambda: measurement_store.history(patient_id, metric, side, since, until, limit, cursor,
+                                                    include_landmarks)
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return json_response({"patient_id": patient_id, **page}, request)
+
+@app.get("/exports/measurements")
+async def export_measurements(
+    format: str = "parquet",
+    columns: Optional[str] = None,
+    patient_id: Optional[str] = None,
+    metric: Optional[str] = None,
+    side: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None
+):
+    """
+    Stream measurements (optionally filtered) as Parquet or an Arrow IPC stream, oldest first.
+    columns is a comma-separated subset of the store's columns; landmarks are only read when listed.
+    """
+    if format not in measurement_export.FORMATS:
+        raise HTTPException(status_code=400, detail="format must be parquet or arrow")
+    if metric is not None and metric not in METRICS:
+        raise HTTPException(status_code=400, detail=f"Unknown metric: {metric}")
+    try:
+        selected = (measurement_export.parse_columns(columns) if columns is not None
+                    else list(measurement_export.DEFAULT_COLUMNS))
+        batch_schema = measurement_export.schema(selected)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    batches = measurement_export.measurement_batches(
+        measurement_store, selected, config.EXPORT_BATCH_ROWS,
+        patient_id=patient_id, metric=metric, side=side, since=since, until=until,
+    )
+    return export_response(batches, batch_schema, format, "measurements")
+
+# Run Server (server.py starts listening before this module is loaded)
 if __name__ == "__main__":
-    # Set environment variables to suppress TensorFlow warnings
-    os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
-    os.environ['CUDA_VISIBLE_DEVICES'] = '-1'  # Force CPU usage
-    
+    import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=5000)
\ No newline at end of file
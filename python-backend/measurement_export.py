@@ -0,0 +1,230 @@
+import argparse
+import sys
+from typing import Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from landmark_codec import LandmarkArchive
+from measurement_store import COLUMNS, MeasurementStore
+
+# Columnar exports of the measurement store and of video landmark archives,
+# as Arrow IPC streams or Parquet files. Rows are read and converted in
+# chunks of batch_size (one Parquet row group each), so memory stays bounded
+# by the chunk size however large the export is. Only the requested columns
+# are selected and the filters run in SQL, so e.g. landmark blobs are never
+# read unless asked for.
+#
+# Landmarks are exported as list<float32> of 132 values: 33 landmarks of
+# x, y, z, visibility in normalized image coordinates. (Not a fixed-size
+# list, which Parquet cannot store with nulls.)
+#
+# pyarrow is an optional dependency, only needed here.
+
+FORMATS = {"parquet": "application/vnd.apache.parquet", "arrow": "application/vnd.apache.arrow.stream"}
+DEFAULT_COLUMNS = ("id", "patient_id", "session_id", "metric", "side", "angle", "confidence", "created_at")
+LANDMARK_VALUES = 33 * 4
+
+
+def _pyarrow():
+    """:raises RuntimeError: if pyarrow is not installed"""
+    try:
+        import pyarrow
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        raise RuntimeError("Exports require pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def _arrow_type(pa, column: str):
+    return {
+        "id": pa.int64(),
+        "patient_id": pa.string(),
+        "session_id": pa.string(),
+        "metric": pa.dictionary(pa.int8(), pa.string()),
+        "side": pa.dictionary(pa.int8(), pa.string()),
+        "angle": pa.float64(),
+        "confidence": pa.float64(),
+        "landmarks": pa.list_(pa.float32()),
+        "created_at": pa.timestamp("ms", tz="UTC"),
+        "frame": pa.int32(),
+    }[column]
+
+
+def _landmark_array(pa, arrays: Sequence[Optional[np.ndarray]]):
+    """List array from (33, 4) arrays, null where there are no landmarks."""
+    valid = np.array([a is not None for a in arrays], dtype=bool)
+    present = [a.reshape(-1)[:LANDMARK_VALUES] for a in arrays if a is not None]
+    values = np.concatenate(present).astype(np.float32) if present else np.empty(0, dtype=np.float32)
+    offsets = np.zeros(len(arrays) + 1, dtype=np.int32)
+    np.cumsum(valid * LANDMARK_VALUES, out=offsets[1:])
+    validity = None if valid.all() else pa.py_buffer(np.packbits(valid, bitorder="little"))
+    return pa.Array.from_buffers(_arrow_type(pa, "landmarks"), len(arrays), [validity, pa.py_buffer(offsets)],
+                                 children=[pa.array(values)])
+
+
+def _column_array(pa, column: str, values: List):
+    if column == "landmarks":
+        return _landmark_array(pa, [
+            None if blob is None else np.frombuffer(blob, dtype=np.float16).astype(np.float32) for blob in values
+        ])
+    if column == "created_at":
+        return pa.array(np.round(np.array(values, dtype=np.float64) * 1000).astype(np.int64),
+                        type=_arrow_type(pa, column))
+    if column in ("metric", "side"):
+        return pa.array(values, type=pa.string()).dictionary_encode().cast(_arrow_type(pa, column))
+    return pa.array(values, type=_arrow_type(pa, column))
+
+
+def parse_columns(value: str) -> List[str]:
+    """
+    Comma-separated measurement columns.
+    :raises ValueError: on an unknown or missing column
+    """
+    columns = [c.strip() for c in value.split(",") if c.strip()]
+    unknown = [c for c in columns if c not in COLUMNS]
+    if unknown or not columns:
+        raise ValueError(f"Unknown columns: {', '.join(unknown)}; choose from {', '.join(COLUMNS)}")
+    return columns
+
+
+def schema(columns: Sequence[str]):
+    pa = _pyarrow()
+    return pa.schema([pa.field(c, _arrow_type(pa, c)) for c in columns])
+
+
+def measurement_batches(store: MeasurementStore, columns: Sequence[str] = DEFAULT_COLUMNS,
+                        batch_size: int = 10000, **filters) -> Iterator:
+    """
+    RecordBatches of the store's measurements, oldest first.
+    filters: patient_id, metric, side, since, until (see MeasurementStore.iter_rows).
+    :raises ValueError: on an unknown column
+    """
+    pa = _pyarrow()
+    batch_schema = schema(columns)
+    for rows in store.iter_rows(columns, batch_size=batch_size, **filters):
+        arrays = [_column_array(pa, column, list(values)) for column, values in zip(columns, zip(*rows))]
+        yield pa.RecordBatch.from_arrays(arrays, schema=batch_schema)
+
+
+def video_batches(archive_path: str, batch_size: int = 10000) -> Iterator:
+    """RecordBatches of (frame, landmarks) from a landmark archive."""
+    pa = _pyarrow()
+    batch_schema = schema(("frame", "landmarks"))
+    with LandmarkArchive(archive_path) as archive:
+        for start in range(0, len(archive), batch_size):
+            frames = list(archive.frames(start, start + batch_size))
+            yield pa.RecordBatch.from_arrays([
+                pa.array(np.arange(start, start + len(frames), dtype=np.int32)),
+                _landmark_array(pa, frames),
+            ], schema=batch_schema)
+
+
+class _ChunkSink:
+    """Write-only file object that keeps written bytes until they are taken."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _open_writer(pa, sink, batch_schema, format: str):
+    if format == "parquet":
+        return pa.parquet.ParquetWriter(sink, batch_schema, compression="zstd")
+    if format == "arrow":
+        return pa.ipc.new_stream(sink, batch_schema)
+    raise ValueError(f"Unknown export format: {format}")
+
+
+def stream(batches: Iterator, batch_schema, format: str) -> Iterator[bytes]:
+    """
+    Encode batches as they arrive, yielding the bytes written so far after each one.
+    :raises ValueError: on an unknown format
+    """
+    pa = _pyarrow()
+    sink = _ChunkSink()
+    writer = _open_writer(pa, sink, batch_schema, format)
+    try:
+        for batch in batches:
+            writer.write_batch(batch)
+            chunk = sink.take()
+            if chunk:
+                yield chunk
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def write(batches: Iterator, batch_schema, format: str, path: str) -> int:
+    """Write batches to a file; returns the number of rows."""
+    pa = _pyarrow()
+    rows = 0
+    with _open_writer(pa, path if format == "parquet" else pa.OSFile(path, "wb"), batch_schema, format) as writer:
+        for batch in batches:
+            writer.write_batch(batch)
+            rows += batch.num_rows
+    return rows
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Export measurements or video landmarks to Parquet or Arrow IPC.")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="parquet")
+    parser.add_argument("--batch-size", type=int, default=10000, help="rows per batch / row group")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    measurements = commands.add_parser("measurements", help="export the measurement store")
+    measurements.add_argument("db", help="measurement database (MEASUREMENT_DB_PATH)")
+    measurements.add_argument("output")
+    measurements.add_argument("--columns", default=",".join(DEFAULT_COLUMNS),
+                              help=f"comma-separated subset of {','.join(COLUMNS)}")
+    measurements.add_argument("--patient-id")
+    measurements.add_argument("--metric")
+    measurements.add_argument("--side", choices=("left", "right"))
+    measurements.add_argument("--since", type=float, help="unix time, inclusive")
+    measurements.add_argument("--until", type=float, help="unix time, exclusive")
+
+    video = commands.add_parser("video", help="export a landmark archive")
+    video.add_argument("archive", help="path of the .lmk archive")
+    video.add_argument("output")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "measurements":
+            columns = parse_columns(args.columns)
+            batches = measurement_batches(
+                MeasurementStore(args.db), columns, args.batch_size, patient_id=args.patient_id,
+                metric=args.metric, side=args.side, since=args.since, until=args.until,
+            )
+        else:
+            columns = ["frame", "landmarks"]
+            batches = video_batches(args.archive, args.batch_size)
+        rows = write(batches, schema(columns), args.format, args.output)
+    except (RuntimeError, ValueError, OSError) as e:
+        print(f"Export failed: {e}", file=sys.stderr)
+        return 1
+    print(f"Exported {rows} rows to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
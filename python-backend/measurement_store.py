@@ -0,0 +1,257 @@
+import base64
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS measurements (
+    id INTEGER PRIMARY KEY,
+    patient_id TEXT NOT NULL,
+    session_id TEXT,
+    metric TEXT NOT NULL,
+    side TEXT NOT NULL,
+    angle REAL,
+    confidence REAL,
+    landmarks BLOB,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS measurements_patient_metric_time
+    ON measurements (patient_id, metric, created_at, id);
+CREATE INDEX IF NOT EXISTS measurements_patient_time
+    ON measurements (patient_id, created_at, id);
+CREATE INDEX IF NOT EXISTS measurements_session
+    ON measurements (session_id) WHERE session_id IS NOT NULL;
+"""
+
+
+def pack_landmarks(landmarks: Optional[np.ndarray]) -> Optional[bytes]:
+    """(33, 4) landmarks as float16, 264 bytes per measurement."""
+    return None if landmarks is None else landmarks.astype(np.float16).tobytes()
+
+
+def unpack_landmarks(data: Optional[bytes]) -> Optional[np.ndarray]:
+    return None if data is None else np.frombuffer(data, dtype=np.float16).astype(np.float32).reshape(-1, 4)
+
+
+@dataclass
+class Measurement:
+    patient_id: str
+    metric: str
+    side: str
+    angle: Optional[float]
+    confidence: Optional[float] = None
+    landmarks: Optional[np.ndarray] = None
+    session_id: Optional[str] = None
+    created_at: float = 0.0
+
+
+# Columns that can be read through iter_rows, in table order
+COLUMNS = ("id", "patient_id", "session_id", "metric", "side", "angle", "confidence", "landmarks", "created_at")
+
+
+def encode_cursor(created_at: float, row_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at!r}:{row_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[float, int]:
+    """:raises ValueError: if the cursor was not produced by encode_cursor"""
+    created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(":")
+    return float(created_at), int(row_id)
+
+
+class MeasurementStore:
+    """
+    SQLite store of every measurement, queried per patient over time.
+
+    Writes go through a write-behind queue drained by one background thread
+    in batches of up to batch_size rows per transaction, so requests never
+    wait on the disk. When the queue is full new measurements are dropped
+    and counted rather than blocking. History is paginated with a keyset
+    cursor on (created_at, id), which stays fast at any depth.
+    """
+
+    def __init__(self, db_path: str, batch_size: int = 500, flush_seconds: float = 0.5,
+                 max_queue: int = 10000):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self._queue: "queue.Queue[Optional[Measurement]]" = queue.Queue(maxsize=max_queue)
+        self._read_conn = self._connect()
+        self._read_lock = threading.Lock()
+        self._read_conn.executescript(SCHEMA)
+        self._writer: Optional[threading.Thread] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        if self.db_path != ":memory:":
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def start(self) -> None:
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._drain, name="measurement-writer", daemon=True)
+            self._writer.start()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Flush queued measurements and stop the writer."""
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(timeout)
+            self._writer = None
+
+    def record(self, measurement: Measurement) -> bool:
+        """Queue a measurement for writing. Returns False if it was dropped."""
+        if not measurement.created_at:
+            measurement.created_at = time.time()
+        try:
+            self._queue.put_nowait(measurement)
+        except queue.Full:
+            registry.inc("measurements_dropped_total")
+            return False
+        return True
+
+    def _drain(self) -> None:
+        # The in-memory database is per connection, so writes must share the reader's
+        conn = self._read_conn if self.db_path == ":memory:" else self._connect()
+        stopping = False
+        while not stopping:
+            batch: List[Measurement] = []
+            try:
+                item = self._queue.get(timeout=self.flush_seconds)
+                deadline = time.monotonic() + self.flush_seconds
+                while item is not None:
+                    batch.append(item)
+                    if len(batch) >= self.batch_size:
+                        break
+                    remaining = deadline - time.monotonic()
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                stopping = item is None
+            except queue.Empty:
+                pass
+            if batch:
+                self._write(conn, batch)
+            registry.set_gauge("measurement_queue_depth", self._queue.qsize())
+
+    def _write(self, conn: sqlite3.Connection, batch: List[Measurement]) -> None:
+        rows = [
+            (m.patient_id, m.session_id, m.metric, m.side, m.angle, m.confidence,
+             pack_landmarks(m.landmarks), m.created_at)
+            for m in batch
+        ]
+        try:
+            with self._read_lock if conn is self._read_conn else nullcontext():
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO measurements (patient_id, session_id, metric, side, angle, confidence, "
+                    "landmarks, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                conn.execute("COMMIT")
+            registry.inc("measurements_written_total", len(rows))
+        except sqlite3.Error as e:
+            logger.error("Failed to write %d measurements: %s", len(rows), e)
+            registry.inc("measurements_dropped_total", len(rows))
+            try:
+                conn.execute("ROLLBACK")
+            except sqlite3.Error:
+                pass
+
+    def history(self, patient_id: str, metric: Optional[str] = None, side: Optional[str] = None,
+                since: Optional[float] = None, until: Optional[float] = None, limit: int = 50,
+                cursor: Optional[str] = None, include_landmarks: bool = False) -> Dict:
+        """
+        Newest-first page of a patient's measurements and the cursor of the next page (None at the end).
+        :raises ValueError: on an invalid cursor
+        """
+        clauses, params = self._filters(patient_id, metric, side, since, until)
+        if cursor is not None:
+            created_at, row_id = decode_cursor(cursor)
+            clauses.append("(created_at, id) < (?, ?)")
+            params.extend([created_at, row_id])
+        columns = "id, session_id, metric, side, angle, confidence, created_at"
+        if include_landmarks:
+            columns += ", landmarks"
+        sql = (f"SELECT {columns} FROM measurements WHERE {' AND '.join(clauses)} "
+               f"ORDER BY created_at DESC, id DESC LIMIT ?")
+        params.append(limit + 1)
+        with self._read_lock:
+            rows = self._read_conn.execute(sql, params).fetchall()
+
+        items = []
+        for row in rows[:limit]:
+            item = {
+                "id": row[0],
+                "session_id": row[1],
+                "metric": row[2],
+                "side": row[3],
+                "angle": row[4],
+                "confidence": row[5],
+                "created_at": row[6],
+            }
+            if include_landmarks:
+                landmarks = unpack_landmarks(row[7])
+                item["landmarks"] = landmarks.round(4).tolist() if landmarks is not None else None
+            items.append(item)
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last[6], last[0])
+        return {"items": items, "next_cursor": next_cursor}
+
+    def iter_rows(self, columns: Sequence[str], patient_id: Optional[str] = None, metric: Optional[str] = None,
+                  side: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+                  batch_size: int = 10000) -> Iterator[List[Tuple]]:
+        """
+        Oldest-first chunks of at most batch_size rows with only the given columns, for exports.
+        Filters are applied in SQL; landmarks stay packed (see unpack_landmarks).
+        :raises ValueError: on an unknown column
+        """
+        unknown = [c for c in columns if c not in COLUMNS]
+        if unknown or not columns:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+        clauses, params = self._filters(patient_id, metric, side, since, until)
+        sql = f"SELECT {', '.join(columns)} FROM measurements"
+        if clauses:
+            sql += f" WHERE {' AND '.join(clauses)}"
+        sql += " ORDER BY created_at, id"
+        # A long export gets its own connection instead of holding the reader lock (WAL readers don't block)
+        memory = self.db_path == ":memory:"
+        conn = self._read_conn if memory else self._connect()
+        lock = self._read_lock if memory else nullcontext()
+        try:
+            with lock:
+                rows = conn.execute(sql, params)
+            while True:
+                with lock:
+                    chunk = rows.fetchmany(batch_size)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            if not memory:
+                conn.close()
+
+    @staticmethod
+    def _filters(patient_id: Optional[str], metric: Optional[str], side: Optional[str],
+                 since: Optional[float], until: Optional[float]) -> Tuple[List[str], List]:
+        clauses: List[str] = []
+        params: List = []
+        for clause, value in (("patient_id = ?", patient_id), ("metric = ?", metric), ("side = ?", side),
+                              ("created_at >= ?", since), ("created_at < ?", until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        return clauses, params
+
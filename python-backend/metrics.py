@@ -0,0 +1,79 @@
+import threading
+from typing import Dict, Tuple
+
+# In-process metrics registry exposed at /metrics in Prometheus text format
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in key) + "}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._gauges: Dict[str, Dict[LabelKey, float]] = {}
+        # name -> labels -> [count, sum, max]
+        self._summaries: Dict[str, Dict[LabelKey, list]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        with self._lock:
+            self._gauges.setdefault(name, {})[_label_key(labels)] = value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = _label_key(labels)
+        with self._lock:
+            series = self._summaries.setdefault(name, {})
+            stats = series.get(key)
+            if stats is None:
+                series[key] = [1, value, value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = max(stats[2], value)
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "counters": {n: {_format_labels(k): v for k, v in s.items()} for n, s in self._counters.items()},
+                "gauges": {n: {_format_labels(k): v for k, v in s.items()} for n, s in self._gauges.items()},
+                "summaries": {
+                    n: {_format_labels(k): {"count": c, "sum": total, "max": peak} for k, (c, total, peak) in s.items()}
+                    for n, s in self._summaries.items()
+                },
+            }
+
+    def render_prometheus(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                lines.extend(f"{name}{_format_labels(k)} {v}" for k, v in series.items())
+            for name, series in sorted(self._gauges.items()):
+                lines.append(f"# TYPE {name} gauge")
+                lines.extend(f"{name}{_format_labels(k)} {v}" for k, v in series.items())
+            for name, series in sorted(self._summaries.items()):
+                lines.append(f"# TYPE {name} summary")
+                for k, (count, total, peak) in series.items():
+                    labels = _format_labels(k)
+                    lines.append(f"{name}_count{labels} {count}")
+                    lines.append(f"{name}_sum{labels} {total}")
+                    lines.append(f"{name}_max{labels} {peak}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
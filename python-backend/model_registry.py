@@ -0,0 +1,389 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import logging
+import mmap
+import os
+import shutil
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Pose model files served from a local directory instead of being fetched.
+#
+# MediaPipe ships the detector and the "full" landmark model, and downloads
+# the lite and heavy ones from Google Cloud Storage the first time they are
+# asked for. That stalls the first request and fails on servers without
+# internet access. Here every model comes from MODEL_DIR, whose manifest.json
+# pins each file's SHA-256; verify() checks them all at startup, so a missing
+# or corrupt model stops the server before it takes requests.
+#
+# Files are read through read-only shared memory maps, so the pages live in
+# the page cache once, however many worker processes map them. Engines that
+# load models by path (the TFLite interpreter, MediaPipe Tasks) map them the
+# same way. The legacy mp.solutions graph only loads models from its package
+# directory, so install_mediapipe() links verified files there, where
+# MediaPipe's downloader finds them and never goes to the network.
+#
+# The tasks engine loads pose_landmarker_*.task bundles. collect builds them
+# from the legacy models; the published bundles can be put in their place
+# (then run manifest).
+#
+# Provision a directory on a machine with internet access and copy it over:
+#
+#     python model_registry.py collect models/    # models of the installed mediapipe, and Tasks bundles of them
+#     python model_registry.py manifest models/   # after adding files by hand
+#     python model_registry.py verify models/
+
+MANIFEST = "manifest.json"
+CHUNK = 1 << 20
+
+
+class ModelError(RuntimeError):
+    pass
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    name: str
+    filename: str
+    mediapipe_path: Optional[str] = None  # Where the mp.solutions graph looks for it, relative to the package
+
+
+POSE_MODELS = {
+    spec.name: spec for spec in (
+        ModelSpec("pose_detection", "pose_detection.tflite", "modules/pose_detection/pose_detection.tflite"),
+        ModelSpec("pose_landmark_lite", "pose_landmark_lite.tflite", "modules/pose_landmark/pose_landmark_lite.tflite"),
+        ModelSpec("pose_landmark_full", "pose_landmark_full.tflite", "modules/pose_landmark/pose_landmark_full.tflite"),
+        ModelSpec("pose_landmark_heavy", "pose_landmark_heavy.tflite",
+                  "modules/pose_landmark/pose_landmark_heavy.tflite"),
+        # MediaPipe Tasks bundles (detector and landmark model in one file) for the tasks engine
+        ModelSpec("pose_landmarker_lite", "pose_landmarker_lite.task"),
+        ModelSpec("pose_landmarker_full", "pose_landmarker_full.task"),
+        ModelSpec("pose_landmarker_heavy", "pose_landmarker_heavy.task"),
+    )
+}
+
+# model_complexity of mp.solutions.pose.Pose -> landmark model
+LANDMARK_MODELS = {0: "pose_landmark_lite", 1: "pose_landmark_full", 2: "pose_landmark_heavy"}
+# ... and the Tasks bundle with the same models
+LANDMARKER_MODELS = {0: "pose_landmarker_lite", 1: "pose_landmarker_full", 2: "pose_landmarker_heavy"}
+
+# Input normalization (mean, std) the Tasks graph reads from each model's metadata
+DETECTOR_NORMALIZATION = (127.5, 127.5)  # [-1, 1]
+LANDMARK_NORMALIZATION = (0.0, 255.0)  # [0, 1]
+
+
+def pose_models(model_complexity: int) -> List[str]:
+    """Models the legacy Pose graph loads for a model_complexity."""
+    if model_complexity not in LANDMARK_MODELS:
+        raise ValueError(f"Unknown model_complexity: {model_complexity}")
+    return ["pose_detection", LANDMARK_MODELS[model_complexity]]
+
+
+def pose_landmarker_model(model_complexity: int) -> str:
+    """Tasks bundle for a model_complexity."""
+    if model_complexity not in LANDMARKER_MODELS:
+        raise ValueError(f"Unknown model_complexity: {model_complexity}")
+    return LANDMARKER_MODELS[model_complexity]
+
+
+def sha256_file(path: str) -> str:
+    """SHA-256 of a file, read through a memory map."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, len(mapped), CHUNK):
+                digest.update(mapped[offset:offset + CHUNK])
+    return digest.hexdigest()
+
+
+def mapped_resident_bytes(path: str, pid: str = "self") -> int:
+    """Resident bytes of all mappings of path in a process (0 where /proc is not available)."""
+    path = os.path.realpath(path)
+    total = 0
+    current = False
+    try:
+        with open(f"/proc/{pid}/smaps") as f:
+            for line in f:
+                fields = line.split()
+                if not fields:
+                    continue
+                if not fields[0].endswith(":"):  # Mapping header: address perms offset dev inode [path]
+                    current = len(fields) >= 6 and fields[5] == path
+                elif current and fields[0] == "Rss:":
+                    total += int(fields[1]) * 1024
+    except (OSError, ValueError):
+        return 0
+    return total
+
+
+def _mediapipe_root() -> str:
+    """:raises ModelError: if mediapipe is not installed"""
+    # Located without importing it, which takes longer than loading the models
+    spec = importlib.util.find_spec("mediapipe")
+    if spec is None or not spec.submodule_search_locations:
+        raise ModelError("mediapipe is not installed")
+    return spec.submodule_search_locations[0]
+
+
+def mediapipe_model_path(name: str) -> str:
+    """
+    Where the installed mediapipe package keeps (or would download) a model.
+    :raises ModelError: for models mediapipe does not ship (the Tasks bundles)
+    """
+    spec = POSE_MODELS[name]
+    if spec.mediapipe_path is None:
+        raise ModelError(f"Model {name} does not come with mediapipe; set MODEL_DIR "
+                         f"(python model_registry.py collect)")
+    return os.path.join(_mediapipe_root(), spec.mediapipe_path)
+
+
+def write_task_bundle(detector_path: str, landmark_path: str, bundle_path: str) -> None:
+    """
+    Pack a detector and a landmark model into a Tasks PoseLandmarker bundle. The
+    legacy models lack the input metadata the Tasks graph needs, so it is added
+    here; the result gives the same landmarks as the legacy graph.
+    """
+    from mediapipe.tasks.python.metadata.metadata_writers import metadata_writer, model_asset_bundle_utils
+
+    def with_metadata(path, normalization, outputs):
+        with open(path, "rb") as f:
+            writer = metadata_writer.MetadataWriter.create(bytearray(f.read()))
+        writer.add_general_info(os.path.splitext(os.path.basename(path))[0])
+        writer.add_image_input(norm_mean=[normalization[0]], norm_std=[normalization[1]])
+        for _ in range(outputs):
+            writer.add_feature_output()
+        return bytes(writer.populate()[0])
+
+    model_asset_bundle_utils.create_model_asset_bundle({
+        "pose_detector.tflite": with_metadata(detector_path, DETECTOR_NORMALIZATION, 2),
+        "pose_landmarks_detector.tflite": with_metadata(landmark_path, LANDMARK_NORMALIZATION, 5),
+    }, bundle_path)
+
+
+class ModelRegistry:
+    def __init__(self, model_dir: str, models: Optional[Dict[str, ModelSpec]] = None):
+        self.model_dir = model_dir
+        self.models = dict(POSE_MODELS if models is None else models)
+        self._manifest: Optional[Dict] = None
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._loads: Dict[str, Dict] = {}  # name -> verification / load report
+        self._lock = threading.Lock()
+
+    def manifest(self) -> Dict:
+        """:raises ModelError: if the manifest is missing or unreadable"""
+        if self._manifest is None:
+            path = os.path.join(self.model_dir, MANIFEST)
+            try:
+                with open(path) as f:
+                    self._manifest = json.load(f)["models"]
+            except (OSError, ValueError, KeyError) as e:
+                raise ModelError(f"Cannot read model manifest {path}: {e}")
+        return self._manifest
+
+    def available(self) -> List[str]:
+        return sorted(self.manifest())
+
+    def _entry(self, name: str) -> Dict:
+        entry = self.manifest().get(name)
+        if entry is None:
+            raise ModelError(f"Model {name} is not in {os.path.join(self.model_dir, MANIFEST)}")
+        return entry
+
+    def path(self, name: str) -> str:
+        """:raises ModelError: if the model is not in the manifest"""
+        return os.path.join(self.model_dir, self._entry(name)["file"])
+
+    def sha256(self, name: str) -> str:
+        """:raises ModelError: if the model is not in the manifest"""
+        return self._entry(name)["sha256"]
+
+    def load(self, name: str) -> mmap.mmap:
+        """
+        Read-only shared map of a model file, checked against its manifest checksum
+        the first time; later calls return the same map.
+        :raises ModelError: if the file is missing or its checksum does not match
+        """
+        with self._lock:
+            mapped = self._maps.get(name)
+            if mapped is not None:
+                return mapped
+            entry = self._entry(name)
+            path = self.path(name)
+            started = time.perf_counter()
+            try:
+                with open(path, "rb") as f:
+                    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError) as e:
+                raise ModelError(f"Cannot map model {name} ({path}): {e}")
+            # Hashing reads every page, which also leaves the file resident for the engines
+            digest = hashlib.sha256()
+            for offset in range(0, len(mapped), CHUNK):
+                digest.update(mapped[offset:offset + CHUNK])
+            if digest.hexdigest() != entry["sha256"]:
+                mapped.close()
+                raise ModelError(f"Checksum mismatch for model {name} ({path})")
+            seconds = time.perf_counter() - started
+            self._maps[name] = mapped
+            self._loads[name] = {"bytes": len(mapped), "load_seconds": seconds}
+        registry.set_gauge("model_load_seconds", round(seconds, 4), model=name)
+        registry.set_gauge("model_file_bytes", len(mapped), model=name)
+        logger.info("Model %s verified and mapped in %.1f ms (%d KB)", name, seconds * 1000, len(mapped) // 1024)
+        return mapped
+
+    def verify(self, names: Optional[Iterable[str]] = None) -> None:
+        """
+        Load every named model (all in the manifest by default).
+        :raises ModelError: listing every model that is missing or corrupt
+        """
+        errors = []
+        for name in (self.available() if names is None else names):
+            try:
+                self.load(name)
+            except ModelError as e:
+                errors.append(str(e))
+        if errors:
+            raise ModelError("; ".join(errors))
+
+    def install_mediapipe(self, names: Iterable[str]) -> None:
+        """
+        Make verified models visible to the mp.solutions graph by linking them into
+        its package directory (a copy where links are not possible). A file already
+        there with the right checksum is left alone.
+        :raises ModelError: if a model is not verified or cannot be placed
+        """
+        root = _mediapipe_root()
+        for name in names:
+            spec = self.models[name]
+            self.load(name)
+            target = os.path.join(root, spec.mediapipe_path)
+            if os.path.exists(target) and sha256_file(target) == self._entry(name)["sha256"]:
+                continue
+            try:
+                if os.path.lexists(target):
+                    os.remove(target)
+                try:
+                    os.symlink(os.path.abspath(self.path(name)), target)
+                except OSError:
+                    shutil.copyfile(self.path(name), target)
+            except OSError as e:
+                raise ModelError(f"Cannot place model {name} at {target}: {e}")
+            logger.info("Linked model %s into %s", name, target)
+
+    def report(self) -> List[Dict]:
+        """Per-model file size, checksum, load time and resident size in this process."""
+        rows = []
+        with self._lock:
+            loads = dict(self._loads)
+        for name in self.available():
+            entry = self.manifest()[name]
+            load = loads.get(name)
+            resident = mapped_resident_bytes(self.path(name))
+            registry.set_gauge("model_resident_bytes", resident, model=name)
+            rows.append({
+                "model": name,
+                "file": entry["file"],
+                "sha256": entry["sha256"],
+                "bytes": entry.get("bytes"),
+                "verified": load is not None,
+                "load_ms": round(load["load_seconds"] * 1000, 2) if load else None,
+                "resident_bytes": resident,
+            })
+        return rows
+
+    def close(self) -> None:
+        with self._lock:
+            for mapped in self._maps.values():
+                mapped.close()
+            self._maps.clear()
+
+
+def write_manifest(model_dir: str) -> Dict:
+    """Hash every model file in model_dir into its manifest; known files keep their registry names."""
+    by_filename = {spec.filename: spec.name for spec in POSE_MODELS.values()}
+    models = {}
+    for filename in sorted(os.listdir(model_dir)):
+        if not filename.endswith((".tflite", ".task")):
+            continue
+        path = os.path.join(model_dir, filename)
+        name = by_filename.get(filename, os.path.splitext(filename)[0])
+        models[name] = {"file": filename, "sha256": sha256_file(path), "bytes": os.path.getsize(path)}
+    with open(os.path.join(model_dir, MANIFEST + ".tmp"), "w") as f:
+        json.dump({"models": models}, f, indent=2, sort_keys=True)
+    os.replace(os.path.join(model_dir, MANIFEST + ".tmp"), os.path.join(model_dir, MANIFEST))
+    return models
+
+
+def collect(model_dir: str, download: bool = False) -> List[str]:
+    """
+    Copy the pose models of the installed mediapipe package into model_dir, optionally
+    letting mediapipe download the ones it does not ship, and bundle them for the tasks
+    engine where no bundle is there yet; returns the models still missing.
+    """
+    os.makedirs(model_dir, exist_ok=True)
+    root = _mediapipe_root()
+    missing = []
+    for spec in POSE_MODELS.values():
+        if spec.mediapipe_path is None:
+            continue
+        source = os.path.join(root, spec.mediapipe_path)
+        if not os.path.exists(source) and download:
+            from mediapipe.python.solutions import download_utils
+            download_utils.download_oss_model("mediapipe/" + spec.mediapipe_path)
+        if os.path.exists(source):
+            shutil.copyfile(source, os.path.join(model_dir, spec.filename))
+        else:
+            missing.append(spec.name)
+    detector = os.path.join(model_dir, POSE_MODELS["pose_detection"].filename)
+    for complexity, name in LANDMARKER_MODELS.items():
+        bundle = os.path.join(model_dir, POSE_MODELS[name].filename)
+        landmark = os.path.join(model_dir, POSE_MODELS[LANDMARK_MODELS[complexity]].filename)
+        if not os.path.exists(bundle) and os.path.exists(detector) and os.path.exists(landmark):
+            write_task_bundle(detector, landmark, bundle)
+        if not os.path.exists(bundle):
+            missing.append(name)
+    write_manifest(model_dir)
+    return missing
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Provision and check the local pose model directory.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    collect_parser = commands.add_parser("collect", help="copy the installed mediapipe's models, bundle them for "
+                                                        "the tasks engine and write the manifest")
+    collect_parser.add_argument("model_dir")
+    collect_parser.add_argument("--download", action="store_true",
+                                help="fetch models mediapipe does not ship (lite, heavy) first")
+    commands.add_parser("manifest", help="(re)write the manifest from the files present").add_argument("model_dir")
+    commands.add_parser("verify", help="check every file against the manifest").add_argument("model_dir")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "collect":
+            missing = collect(args.model_dir, args.download)
+            if missing:
+                print(f"Not available (use --download on a connected machine): {', '.join(missing)}")
+        elif args.command == "manifest":
+            write_manifest(args.model_dir)
+        model_registry = ModelRegistry(args.model_dir)
+        model_registry.verify()
+    except (ModelError, OSError) as e:
+        print(f"Model check failed: {e}", file=sys.stderr)
+        return 1
+    for row in model_registry.report():
+        print(f"{row['model']:<22}{row['bytes'] or 0:>12,} B  {row['load_ms']:>8.1f} ms  {row['sha256'][:16]}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Perceptual hashes for spotting re-encoded or re-uploaded copies of an image.
+# A 64-bit difference hash survives JPEG re-encoding, EXIF stripping and
+# rescaling, which all change the bytes (and the content hash) of an upload.
+# It also barely notices a limb moving by a few percent of the frame, so a
+# hash match only nominates a candidate: the patches around the joints the
+# metric is measured from must match too before its landmarks are reused.
+
+PATCH_GRID = 256  # Long side of the grayscale frame joint patches are cut from
+PATCH_RADIUS = 8
+
+_BIT_WEIGHTS = (1 << np.arange(64, dtype=np.uint64)).astype(np.uint64)
+
+
+def dhash(img: np.ndarray) -> int:
+    """Difference hash of a BGR frame: 1 bit per horizontally adjacent pixel pair of a 9x8 thumbnail."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA).astype(np.int16)
+    bits = (small[:, 1:] > small[:, :-1]).ravel().astype(np.uint64)
+    return int((bits * _BIT_WEIGHTS).sum())
+
+
+def joint_patches(img: np.ndarray, landmarks: np.ndarray, indices: np.ndarray) -> np.ndarray:
+    """(len(indices), 17, 17) float32 grayscale patches around the given landmarks, at PATCH_GRID scale."""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    height, width = gray.shape
+    scale = PATCH_GRID / max(height, width)
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    small = cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+    padded = cv2.copyMakeBorder(small, PATCH_RADIUS, PATCH_RADIUS, PATCH_RADIUS, PATCH_RADIUS, cv2.BORDER_REPLICATE)
+    points = np.round(landmarks[indices, :2] * np.array(size, dtype=np.float32)).astype(np.int32)
+    points = np.clip(points, 0, np.array(size) - 1)
+    side = 2 * PATCH_RADIUS + 1
+    return np.stack([padded[y:y + side, x:x + side] for x, y in points]).astype(np.float32)
+
+
+def patch_difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Largest mean absolute gray-level difference of any joint's patches."""
+    return float(np.abs(a - b).mean(axis=(1, 2)).max())
+
+
+def _popcount(values: np.ndarray) -> np.ndarray:
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class _Bucket:
+    """Hashes of one (scope, metric, side) in insertion order, as parallel numpy arrays for a vectorized scan."""
+
+    def __init__(self):
+        self.entries: "OrderedDict[str, Tuple[int, float, np.ndarray]]" = OrderedDict()
+        self.hashes: Optional[np.ndarray] = None
+        self.aspects: Optional[np.ndarray] = None
+        self.keys = []
+
+    def rebuild(self) -> None:
+        self.keys = list(self.entries)
+        values = list(self.entries.values())
+        self.hashes = np.array([h for h, _, _ in values], dtype=np.uint64)
+        self.aspects = np.array([a for _, a, _ in values], dtype=np.float32)
+
+
+class PerceptualIndex:
+    """
+    Hamming-distance index from perceptual hash to the content hash whose landmarks are cached.
+
+    Entries are grouped by (scope, metric, side), the scope being a session,
+    so frames are only ever matched against earlier frames of the same
+    patient; the oldest entries are dropped beyond max_entries. Matches must
+    also agree on aspect ratio, since the hash itself is computed on a
+    fixed-size thumbnail. Each entry keeps the joint_patches of its frame for
+    the caller to verify a match with.
+    """
+
+    def __init__(self, max_distance: int, max_entries: int, max_aspect_delta: float = 0.02):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.max_aspect_delta = max_aspect_delta
+        self._buckets: Dict[Tuple[str, str, str], _Bucket] = {}
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def add(self, scope: str, metric: str, side: str, frame_hash: int, shape, content_hash: str,
+            patches: np.ndarray) -> None:
+        aspect = shape[1] / shape[0]
+        with self._lock:
+            bucket = self._buckets.setdefault((scope, metric, side), _Bucket())
+            if content_hash not in bucket.entries:
+                self._size += 1
+            bucket.entries[content_hash] = (frame_hash, aspect, patches)
+            bucket.entries.move_to_end(content_hash)
+            while self._size > self.max_entries:
+                self._evict_oldest()
+            bucket.hashes = None
+
+    def _evict_oldest(self) -> None:
+        # Sessions hold a handful of frames each, so trimming the largest bucket keeps this cheap
+        key, largest = max(self._buckets.items(), key=lambda item: len(item[1].entries))
+        largest.entries.popitem(last=False)
+        largest.hashes = None
+        if not largest.entries:
+            del self._buckets[key]
+        self._size -= 1
+
+    def discard(self, scope: str) -> None:
+        """Drop every entry of a scope, e.g. of a deleted session."""
+        with self._lock:
+            for key in [key for key in self._buckets if key[0] == scope]:
+                self._size -= len(self._buckets.pop(key).entries)
+
+    def find(self, scope: str, metric: str, side: str, frame_hash: int,
+             shape) -> Optional[Tuple[str, int, np.ndarray]]:
+        """Closest indexed frame of the scope within max_distance, as (content_hash, distance, patches)."""
+        aspect = shape[1] / shape[0]
+        with self._lock:
+            bucket = self._buckets.get((scope, metric, side))
+            if bucket is None or not bucket.entries:
+                return None
+            if bucket.hashes is None:
+                bucket.rebuild()
+            distances = _popcount(bucket.hashes ^ np.uint64(frame_hash))
+            distances[np.abs(bucket.aspects - aspect) > self.max_aspect_delta * aspect] = 65
+            best = int(np.argmin(distances))
+            distance = int(distances[best])
+            if distance > self.max_distance:
+                return None
+            content_hash = bucket.keys[best]
+            return content_hash, distance, bucket.entries[content_hash][2]
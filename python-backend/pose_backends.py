@@ -0,0 +1,243 @@
+import logging
+import threading
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Pose backends: what main.py runs pose inference through, so the model
+# behind it is chosen by config (POSE_ENGINE) rather than by the call sites.
+#
+#   mediapipe  the legacy mp.solutions.pose graph
+#   tflite     the same models through the TFLite interpreter (tflite_engine.py)
+#   tasks      the MediaPipe Tasks PoseLandmarker
+#
+# infer() takes a single image. A video goes through a session from
+# video(), which is also given each frame's timestamp. The tasks backend runs
+# a PoseLandmarker in VIDEO mode there, which tracks the pose from the last
+# frame's landmarks instead of detecting it again; the others run infer() on
+# every frame. live_stream() takes frames as they arrive and reports
+# landmarks through a callback, skipping frames that arrive while one is in
+# flight: on the Tasks graph's own threads in LIVE_STREAM mode, or on a
+# background thread for the other backends.
+#
+# Like Pose graphs, backends are not thread-safe; the PosePool hands each one
+# to one thread at a time.
+
+ENGINES = ("mediapipe", "tflite", "tasks")
+
+ResultCallback = Callable[[int, Optional[np.ndarray]], None]  # (timestamp_ms, landmarks or None)
+
+
+class VideoSession:
+    """Landmarks of one video's frames, given in order with their timestamps."""
+
+    def __init__(self, infer: Callable[[np.ndarray, int], Optional[np.ndarray]],
+                 close: Optional[Callable[[], None]] = None):
+        self._infer = infer
+        self._close = close
+        self._last_timestamp = -1
+
+    def infer(self, img_rgb: np.ndarray, timestamp_ms: int) -> Optional[np.ndarray]:
+        # Tracking needs strictly increasing timestamps; rounding can repeat one at high frame rates
+        timestamp_ms = max(int(timestamp_ms), self._last_timestamp + 1)
+        self._last_timestamp = timestamp_ms
+        return self._infer(img_rgb, timestamp_ms)
+
+    def close(self) -> None:
+        if self._close is not None:
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LiveStream:
+    """
+    Runs infer() on a background thread for frames sent as they arrive. A frame
+    sent while another is in flight replaces any frame still waiting, so results
+    follow the stream instead of falling behind it.
+    """
+
+    def __init__(self, infer: Callable[[np.ndarray], Optional[np.ndarray]], on_result: ResultCallback):
+        self._infer = infer
+        self._on_result = on_result
+        self._pending = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name="pose-live-stream", daemon=True)
+        self._thread.start()
+
+    def send(self, img_rgb: np.ndarray, timestamp_ms: int) -> None:
+        with self._condition:
+            if self._pending is not None:
+                self.dropped += 1
+            self._pending = (img_rgb, timestamp_ms)
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                img_rgb, timestamp_ms = self._pending
+                self._pending = None
+            try:
+                landmarks = self._infer(img_rgb)
+            except Exception as e:
+                logger.error("Live stream inference failed: %s", e)
+                landmarks = None
+            self._on_result(timestamp_ms, landmarks)
+
+    def close(self) -> None:
+        """Finish the frame in flight and the one waiting, then stop."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PoseBackend:
+    def infer(self, img_rgb: np.ndarray) -> Optional[np.ndarray]:
+        """(33, 4) float32 x, y, z, visibility landmarks of an RGB image, or None if no pose was found."""
+        raise NotImplementedError
+
+    def video(self) -> VideoSession:
+        return VideoSession(lambda img_rgb, timestamp_ms: self.infer(img_rgb))
+
+    def live_stream(self, on_result: ResultCallback) -> LiveStream:
+        return LiveStream(self.infer, on_result)
+
+    def close(self) -> None:
+        pass
+
+
+def _landmarks_array(landmarks) -> np.ndarray:
+    return np.array([(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks], dtype=np.float32)
+
+
+class SolutionsBackend(PoseBackend):
+    """The legacy mp.solutions.pose graph; options are those of mp.solutions.pose.Pose."""
+
+    def __init__(self, **pose_options):
+        import mediapipe as mp
+
+        self._pose = mp.solutions.pose.Pose(**pose_options)
+
+    def infer(self, img_rgb: np.ndarray) -> Optional[np.ndarray]:
+        results = self._pose.process(img_rgb)
+        if not results.pose_landmarks:
+            return None
+        return _landmarks_array(results.pose_landmarks.landmark)
+
+    def close(self) -> None:
+        self._pose.close()
+
+
+class _TasksLiveStream:
+    def __init__(self, backend: "TasksBackend", on_result: ResultCallback):
+        self._backend = backend
+        self._on_result = on_result
+        self._landmarker = backend.landmarker("LIVE_STREAM", self._callback)
+        self._last_timestamp = -1
+
+    def _callback(self, result, image, timestamp_ms: int) -> None:
+        self._on_result(timestamp_ms, self._backend.first_pose(result))
+
+    def send(self, img_rgb: np.ndarray, timestamp_ms: int) -> None:
+        timestamp_ms = max(int(timestamp_ms), self._last_timestamp + 1)
+        self._last_timestamp = timestamp_ms
+        # The graph skips frames that arrive while it is busy
+        self._landmarker.detect_async(self._backend.image(img_rgb), timestamp_ms)
+
+    def close(self) -> None:
+        self._landmarker.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class TasksBackend(PoseBackend):
+    """
+    MediaPipe Tasks PoseLandmarker from a .task bundle (see model_registry.py).
+    Single images go through one landmarker in IMAGE mode; each video session
+    and live stream gets its own, as a landmarker's running mode is fixed.
+    """
+
+    def __init__(self, model_path: str, min_detection_confidence: float = 0.5,
+                 min_presence_confidence: float = 0.5, min_tracking_confidence: float = 0.5):
+        import mediapipe as mp
+        from mediapipe.tasks.python import BaseOptions, vision
+
+        self._mp = mp
+        self._vision = vision
+        self._base_options = BaseOptions(model_asset_path=model_path)
+        self.min_detection_confidence = min_detection_confidence
+        self.min_presence_confidence = min_presence_confidence
+        self.min_tracking_confidence = min_tracking_confidence
+        self._image_landmarker = self.landmarker("IMAGE")
+
+    def landmarker(self, mode: str, result_callback=None):
+        options = self._vision.PoseLandmarkerOptions(
+            base_options=self._base_options,
+            running_mode=getattr(self._vision.RunningMode, mode),
+            num_poses=1,
+            min_pose_detection_confidence=self.min_detection_confidence,
+            min_pose_presence_confidence=self.min_presence_confidence,
+            min_tracking_confidence=self.min_tracking_confidence,
+            output_segmentation_masks=False,
+            result_callback=result_callback,
+        )
+        return self._vision.PoseLandmarker.create_from_options(options)
+
+    def image(self, img_rgb: np.ndarray):
+        return self._mp.Image(image_format=self._mp.ImageFormat.SRGB, data=np.ascontiguousarray(img_rgb))
+
+    @staticmethod
+    def first_pose(result) -> Optional[np.ndarray]:
+        return _landmarks_array(result.pose_landmarks[0]) if result.pose_landmarks else None
+
+    def infer(self, img_rgb: np.ndarray) -> Optional[np.ndarray]:
+        return self.first_pose(self._image_landmarker.detect(self.image(img_rgb)))
+
+    def video(self) -> VideoSession:
+        landmarker = self.landmarker("VIDEO")
+
+        def infer(img_rgb, timestamp_ms):
+            return self.first_pose(landmarker.detect_for_video(self.image(img_rgb), timestamp_ms))
+
+        return VideoSession(infer, landmarker.close)
+
+    def live_stream(self, on_result: ResultCallback) -> _TasksLiveStream:
+        return _TasksLiveStream(self, on_result)
+
+    def close(self) -> None:
+        self._image_landmarker.close()
+
+
+def create_backend(engine: str, options: Dict) -> PoseBackend:
+    """:raises ValueError: for an engine not in ENGINES"""
+    if engine == "mediapipe":
+        return SolutionsBackend(**options)
+    if engine == "tflite":
+        from tflite_engine import TFLiteLandmarkEngine
+        return TFLiteLandmarkEngine(**options)
+    if engine == "tasks":
+        return TasksBackend(**options)
+    raise ValueError(f"Unknown pose engine: {engine}")
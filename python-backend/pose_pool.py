@@ -0,0 +1,62 @@
+import asyncio
+import contextvars
+import logging
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+
+class PosePool:
+    """
+    Fixed set of pose backends (pose_backends.py) served by a matching thread pool.
+
+    A backend is not thread-safe, so each instance is checked out by one
+    worker thread at a time. Instances are created lazily by factory.
+    """
+
+    def __init__(self, size: int, factory):
+        self.size = size
+        self._factory = factory
+        self._models = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="pose")
+
+    def ensure_ready(self) -> bool:
+        """Create the first model up front so startup failures surface as a request error."""
+        with self._lock:
+            if self._created > 0:
+                return True
+            model = self._factory()
+            if model is None:
+                return False
+            self._created += 1
+        self._models.put(model)
+        return True
+
+    @contextmanager
+    def acquire(self):
+        model = None
+        try:
+            model = self._models.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._created < self.size:
+                    model = self._factory()
+                    if model is None:
+                        raise RuntimeError("Failed to initialize pose model")
+                    self._created += 1
+            if model is None:
+                model = self._models.get()
+        try:
+            yield model
+        finally:
+            self._models.put(model)
+
+    def submit(self, fn, *args) -> "asyncio.Future":
+        # Run in a copy of the caller's context so log lines keep the request id
+        context = contextvars.copy_context()
+        return asyncio.get_running_loop().run_in_executor(self.executor, context.run, fn, *args)
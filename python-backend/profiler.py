@@ -0,0 +1,228 @@
+import contextvars
+import cProfile
+import functools
+import glob
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Optional
+
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Always-on statistical profiler. A daemon thread wakes every interval,
+# snapshots the Python stack of every other thread (sys._current_frames) and
+# counts them as folded stacks ("thread;file:func;file:func count"), the
+# input format of flamegraph.pl and speedscope. Threads waiting on a lock,
+# queue or selector are skipped, so the counts show where CPU goes.
+#
+# The CPU time spent sampling is measured; when it exceeds max_overhead of wall
+# time the interval is stretched (and relaxed back once it drops), so the
+# overhead stays capped whatever the thread count or stack depth.
+#
+# Counts are kept for the current and previous window_seconds. Every worker
+# process writes its counts to snapshot_dir, so one worker can serve the
+# stacks of all of them.
+
+# Leaf frames of threads that are blocked rather than running
+IDLE_LEAVES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),  # Idle ThreadPoolExecutor worker blocked in SimpleQueue.get
+}
+
+
+class StackSampler:
+    def __init__(self, interval: float = 0.01, max_overhead: float = 0.01, window_seconds: float = 300,
+                 max_depth: int = 64, snapshot_dir: Optional[str] = None, flush_seconds: float = 15):
+        self.base_interval = interval
+        self.interval = interval
+        self.max_overhead = max_overhead
+        self.window_seconds = window_seconds
+        self.max_depth = max_depth
+        self.snapshot_dir = snapshot_dir
+        self.flush_seconds = flush_seconds
+        self.overhead = 0.0  # Sampler CPU time as a share of wall time (EWMA)
+        self.samples = 0
+        self._current: Counter = Counter()
+        self._previous: Counter = Counter()
+        self._window_started = time.monotonic()
+        self._labels: Dict = {}  # code object -> "file:qualname"
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        if snapshot_dir:
+            os.makedirs(snapshot_dir, exist_ok=True)
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self.flush()
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            # co_qualname (Class.method) is Python 3.11+; 3.10 code objects only have the bare name
+            name = getattr(code, "co_qualname", code.co_name)
+            label = self._labels[code] = f"{os.path.basename(code.co_filename)}:{name}"
+        return label
+
+    def sample(self) -> None:
+        """Record the current stack of every thread but this one."""
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        own = threading.get_ident()
+        stacks = []
+        for ident, frame in sys._current_frames().items():
+            if ident == own:
+                continue
+            code = frame.f_code
+            if (os.path.basename(code.co_filename), code.co_name) in IDLE_LEAVES:
+                continue
+            labels = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(self._label(frame.f_code))
+                frame = frame.f_back
+            # pose_0, pose_1 ... share one root
+            thread = names.get(ident, "unknown").rstrip("0123456789").rstrip("_-") or "thread"
+            labels.append(thread)
+            stacks.append(";".join(reversed(labels)))
+        with self._lock:
+            self._current.update(stacks)
+            self.samples += 1
+
+    def _run(self) -> None:
+        last_flush = time.monotonic()
+        while not self._stop.wait(self.interval):
+            # CPU time, not wall time: waiting for the GIL costs the other threads nothing
+            started = time.thread_time()
+            self.sample()
+            cost = time.thread_time() - started
+            self.overhead = 0.9 * self.overhead + 0.1 * cost / (self.interval + cost)
+            if self.overhead > self.max_overhead:
+                self.interval = min(self.interval * 1.5, 1.0)
+            elif self.overhead < self.max_overhead / 4 and self.interval > self.base_interval:
+                self.interval = max(self.interval / 1.5, self.base_interval)
+
+            now = time.monotonic()
+            if now - self._window_started >= self.window_seconds:
+                with self._lock:
+                    self._previous, self._current = self._current, Counter()
+                self._window_started = now
+            if self.snapshot_dir and now - last_flush >= self.flush_seconds:
+                self.flush()
+                last_flush = now
+            registry.set_gauge("profiler_overhead_ratio", round(self.overhead, 5))
+            registry.set_gauge("profiler_interval_seconds", self.interval)
+            registry.inc("profiler_samples_total")
+
+    def counts(self) -> Counter:
+        """Stack counts of the current and the previous window."""
+        with self._lock:
+            return self._current + self._previous
+
+    def flush(self) -> None:
+        """Write this process's counts to snapshot_dir/<pid>.folded."""
+        if not self.snapshot_dir:
+            return
+        path = os.path.join(self.snapshot_dir, f"{os.getpid()}.folded")
+        try:
+            with open(path + ".tmp", "w") as f:
+                f.write(format_folded(self.counts()))
+            os.replace(path + ".tmp", path)
+        except OSError as e:
+            logger.error("Failed to write profile snapshot %s: %s", path, e)
+
+    def all_workers(self) -> Counter:
+        """
+        This process's live counts plus the snapshots of other workers, ignoring
+        snapshots not refreshed for two windows (workers that have exited).
+        """
+        total = self.counts()
+        if not self.snapshot_dir:
+            return total
+        own = os.path.join(self.snapshot_dir, f"{os.getpid()}.folded")
+        cutoff = time.time() - 2 * self.window_seconds
+        for path in glob.glob(os.path.join(self.snapshot_dir, "*.folded")):
+            try:
+                if path == own or os.path.getmtime(path) < cutoff:
+                    continue
+                with open(path) as f:
+                    total.update(parse_folded(f.read()))
+            except OSError:
+                continue
+        return total
+
+
+def format_folded(counts: Counter) -> str:
+    return "".join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+
+def parse_folded(text: str) -> Counter:
+    counts: Counter = Counter()
+    for line in text.splitlines():
+        stack, _, count = line.rpartition(" ")
+        if stack and count.isdigit():
+            counts[stack] += int(count)
+    return counts
+
+
+# Per-request profiling: deterministic cProfile of the work a request runs in
+# the pose pool, merged across the threads it ran on
+
+active_profile: contextvars.ContextVar[Optional["RequestProfile"]] = contextvars.ContextVar(
+    "active_profile", default=None
+)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self._stats: Optional[pstats.Stats] = None
+        self._lock = threading.Lock()
+
+    def run(self, fn, *args):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(fn, *args)
+        finally:
+            with self._lock:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+
+    def report(self, limit: int = 30) -> Dict:
+        """Wall time and the top functions by cumulative time."""
+        functions = []
+        with self._lock:
+            stats = self._stats.stats if self._stats is not None else {}
+            top = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+        for (filename, line, name), (_, calls, tottime, cumtime, _) in top:
+            functions.append({
+                "function": f"{os.path.basename(filename)}:{line}:{name}" if line else name,
+                "calls": calls,
+                "tottime_ms": round(tottime * 1000, 3),
+                "cumtime_ms": round(cumtime * 1000, 3),
+            })
+        return {"wall_ms": round((time.perf_counter() - self.started) * 1000, 2), "functions": functions}
+
+
+def profiled(fn):
+    """fn wrapped to run under the current request's profile, if one is active."""
+    profile = active_profile.get()
+    return fn if profile is None else functools.partial(profile.run, fn)
@@ -0,0 +1,74 @@
+from dataclasses import dataclass
+from typing import Dict, List
+
+import cv2
+import numpy as np
+
+# Cheap pre-inference checks on the preprocessed frame. Photos that are too
+# blurry, dark, small or sparse to yield a pose are rejected with a reason
+# the user can act on, before paying for pose_model.process.
+
+ANALYSIS_DIM = 256  # Checks run on a grayscale copy with this longest side
+EDGE_THRESHOLD = 40.0  # Gradient magnitude counted as structure for the coverage check
+
+
+@dataclass
+class QualityThresholds:
+    min_dim: int = 200
+    min_sharpness: float = 10.0
+    min_brightness: float = 35.0
+    max_brightness: float = 225.0
+    min_coverage: float = 0.1
+
+
+def measure(img: np.ndarray) -> Dict[str, float]:
+    """Resolution, sharpness (Laplacian variance), mean brightness and structure coverage of a BGR frame."""
+    height, width = img.shape[:2]
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if img.ndim == 3 else img
+    scale = ANALYSIS_DIM / max(height, width)
+    if scale < 1:
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+    sharpness = float(cv2.Laplacian(gray, cv2.CV_32F).var())
+    brightness = float(gray.mean())
+
+    # Share of the frame spanned by edges, ignoring the outermost 2% of edge pixels on each side
+    magnitude = cv2.magnitude(cv2.Sobel(gray, cv2.CV_32F, 1, 0), cv2.Sobel(gray, cv2.CV_32F, 0, 1))
+    ys, xs = np.nonzero(magnitude > EDGE_THRESHOLD)
+    coverage = 0.0
+    if len(xs) > 0:
+        x0, x1 = np.percentile(xs, (2, 98))
+        y0, y1 = np.percentile(ys, (2, 98))
+        coverage = float((x1 - x0) * (y1 - y0) / (gray.shape[0] * gray.shape[1]))
+
+    return {
+        "min_dim": float(min(height, width)),
+        "sharpness": sharpness,
+        "brightness": brightness,
+        "coverage": coverage,
+    }
+
+
+def check(measurements: Dict[str, float], thresholds: QualityThresholds) -> List[Dict]:
+    """Failed checks as {check, value, threshold, message}; empty when the frame passes."""
+    failures = []
+
+    def fail(name, value, threshold, message):
+        failures.append({"check": name, "value": round(value, 2), "threshold": threshold, "message": message})
+
+    if measurements["min_dim"] < thresholds.min_dim:
+        fail("resolution", measurements["min_dim"], thresholds.min_dim,
+             "Image resolution is too low; use a higher resolution photo")
+    if measurements["sharpness"] < thresholds.min_sharpness:
+        fail("blur", measurements["sharpness"], thresholds.min_sharpness,
+             "Image is blurry; hold the camera steady and make sure the subject is in focus")
+    if measurements["brightness"] < thresholds.min_brightness:
+        fail("exposure", measurements["brightness"], thresholds.min_brightness,
+             "Image is too dark; add light or move to a brighter area")
+    elif measurements["brightness"] > thresholds.max_brightness:
+        fail("exposure", measurements["brightness"], thresholds.max_brightness,
+             "Image is overexposed; avoid direct light behind or on the subject")
+    if measurements["coverage"] < thresholds.min_coverage:
+        fail("coverage", measurements["coverage"], thresholds.min_coverage,
+             "Subject fills too little of the frame; move closer so the limb is clearly visible")
+    return failures
@@ -0,0 +1,179 @@
+import threading
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+# Batched annotation renderer.
+# Connection index arrays are built once at import; each call converts all
+# landmarks to pixels in one vectorized step and draws every segment with a
+# single cv2.polylines call instead of per-point cv2.circle/cv2.line loops.
+
+# MediaPipe Pose landmark topology, spelled out so the server does not import
+# mediapipe (and matplotlib with it) just for names and edges
+LANDMARK_NAMES = [
+    "NOSE", "LEFT_EYE_INNER", "LEFT_EYE", "LEFT_EYE_OUTER", "RIGHT_EYE_INNER", "RIGHT_EYE",
+    "RIGHT_EYE_OUTER", "LEFT_EAR", "RIGHT_EAR", "MOUTH_LEFT", "MOUTH_RIGHT", "LEFT_SHOULDER",
+    "RIGHT_SHOULDER", "LEFT_ELBOW", "RIGHT_ELBOW", "LEFT_WRIST", "RIGHT_WRIST", "LEFT_PINKY",
+    "RIGHT_PINKY", "LEFT_INDEX", "RIGHT_INDEX", "LEFT_THUMB", "RIGHT_THUMB", "LEFT_HIP", "RIGHT_HIP",
+    "LEFT_KNEE", "RIGHT_KNEE", "LEFT_ANKLE", "RIGHT_ANKLE", "LEFT_HEEL", "RIGHT_HEEL",
+    "LEFT_FOOT_INDEX", "RIGHT_FOOT_INDEX",
+]
+LANDMARK_INDEX = {name: index for index, name in enumerate(LANDMARK_NAMES)}
+
+LANDMARK_COLOR = (245, 117, 66)
+CONNECTION_COLOR = (245, 66, 230)
+TEXT_COLOR = (0, 255, 0)
+VISIBILITY_THRESHOLD = 0.5  # Same cut-off mp_drawing.draw_landmarks uses
+
+# (35, 2) landmark index pairs, as mediapipe.solutions.pose.POSE_CONNECTIONS
+POSE_CONNECTIONS = np.array([
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10), (11, 12), (11, 13),
+    (11, 23), (12, 14), (12, 24), (13, 15), (14, 16), (15, 17), (15, 19), (15, 21), (16, 18), (16, 20),
+    (16, 22), (17, 19), (18, 20), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29), (27, 31),
+    (28, 30), (28, 32), (29, 31), (30, 32),
+], dtype=np.int32)
+
+# Joint chain drawn for each metric, without the LEFT_/RIGHT_ prefix
+METRIC_CHAINS = {
+    "ankle": ["KNEE", "ANKLE", "FOOT_INDEX"],
+    "knee": ["HIP", "KNEE", "ANKLE"],
+    "hipFlexion": ["KNEE", "HIP"],
+    "R1": ["ANKLE", "KNEE", "HIP"],
+    "popliteal": ["ANKLE", "KNEE"],
+    "R2": ["ANKLE", "KNEE", "HIP"],
+}
+
+
+def _build_chain_indices() -> Dict[Tuple[str, str], np.ndarray]:
+    indices = {}
+    for metric, chain in METRIC_CHAINS.items():
+        for side in ("left", "right"):
+            prefix = "RIGHT_" if side == "right" else "LEFT_"
+            indices[(metric, side)] = np.array(
+                [LANDMARK_INDEX[prefix + joint] for joint in chain], dtype=np.int32
+            )
+    return indices
+
+
+METRIC_CHAIN_INDICES = _build_chain_indices()
+
+_buffers = threading.local()
+
+
+def get_output_buffer(shape, dtype=np.uint8) -> np.ndarray:
+    """
+    Per-thread reusable output buffer for the given image shape.
+    The contents are only valid until the next call on the same thread,
+    so callers must encode the annotated image before rendering again.
+    Each thread keeps one buffer, replaced when the shape changes.
+    """
+    buffer = getattr(_buffers, "buffer", None)
+    if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+        buffer = _buffers.buffer = np.empty(shape, dtype=dtype)
+    return buffer
+
+
+def landmarks_to_pixels(landmarks: np.ndarray, image_shape) -> np.ndarray:
+    height, width = image_shape[:2]
+    return (landmarks[:, :2] * np.array([width, height], dtype=np.float32)).astype(np.int32)
+
+
+def draw_joints(out: np.ndarray, points: np.ndarray, radius: int, color) -> None:
+    # Zero-length segments render as round dots, so all joints go in one call
+    if len(points):
+        cv2.polylines(out, np.stack([points, points], axis=1), isClosed=False, color=color, thickness=2 * radius)
+
+
+def draw_skeleton(out: np.ndarray, pixels: np.ndarray, visible: np.ndarray) -> None:
+    keep = visible[POSE_CONNECTIONS[:, 0]] & visible[POSE_CONNECTIONS[:, 1]]
+    segments = pixels[POSE_CONNECTIONS[keep]]  # (n, 2, 2)
+    if len(segments):
+        cv2.polylines(out, segments, isClosed=False, color=CONNECTION_COLOR, thickness=2)
+    draw_joints(out, pixels[visible], 4, LANDMARK_COLOR)
+
+
+def draw_metric_limb(out: np.ndarray, pixels: np.ndarray, metric: str, side: str) -> None:
+    chain = METRIC_CHAIN_INDICES.get((metric, side))
+    if chain is None:
+        return
+    points = pixels[chain]
+    cv2.polylines(out, [points], isClosed=False, color=LANDMARK_COLOR, thickness=3)
+    draw_joints(out, points, 5, CONNECTION_COLOR)
+
+
+def draw_angle_text(out: np.ndarray, angle: Optional[float], metric: str, side: str) -> None:
+    if angle is None:
+        return
+    cv2.putText(out, f"{metric}: {angle:.1f}°", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1.0, TEXT_COLOR, 2)
+    cv2.putText(out, f"Side: {side}", (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.8, TEXT_COLOR, 2)
+
+
+def render_annotations(image: np.ndarray, landmarks: Optional[np.ndarray], angle: Optional[float],
+                       metric: str, side: str, out: Optional[np.ndarray] = None,
+                       full_skeleton: bool = False) -> np.ndarray:
+    """
+    Draw the metric-relevant limb (or the full skeleton) and the angle label.
+    :param image: BGR image, left untouched unless passed as out
+    :param landmarks: (33, 4) normalized landmarks or None
+    :param out: destination buffer of the same shape; pass image itself to annotate in place.
+                Defaults to the per-thread reusable buffer.
+    :return: the annotated buffer
+    """
+    if out is None:
+        out = get_output_buffer(image.shape, image.dtype)
+    if out is not image:
+        np.copyto(out, image)
+
+    if landmarks is not None:
+        pixels = landmarks_to_pixels(landmarks, image.shape)
+        if full_skeleton:
+            draw_skeleton(out, pixels, landmarks[:, 3] >= VISIBILITY_THRESHOLD)
+        draw_metric_limb(out, pixels, metric, side)
+
+    draw_angle_text(out, angle, metric, side)
+    return out
+
+
+# Vector overlays: the geometry of the annotation for the client to draw
+
+ARC_RADIUS = 30  # Matches AngleCalculator.drawAngle on the frontend
+
+
+def build_overlay(angle_points, angle: Optional[float], metric: str, image_shape) -> Dict:
+    """
+    Describe the annotation as vector primitives in image pixel coordinates.
+    :param angle_points: (p1, vertex, p3) from ClinicalAngleCalculator.metric_points
+    :return: dict with segments, points, reference point, arc and label; arc
+             angles are radians, clockwise on screen, as canvas ctx.arc expects
+    """
+    height, width = image_shape[:2]
+    overlay = {"width": width, "height": height, "segments": [], "points": [], "reference": None,
+               "arc": None, "label": None}
+    if angle_points is None:
+        return overlay
+
+    p1, vertex, p3 = [(round(float(x), 1), round(float(y), 1)) for x, y in angle_points]
+    overlay["segments"] = [[*p1, *vertex], [*vertex, *p3]]
+    overlay["points"] = [list(p1), list(vertex)]
+    if metric in ("hipFlexion", "popliteal"):
+        # The third point is an imaginary horizontal/vertical reference, not a landmark
+        overlay["reference"] = list(p3)
+    else:
+        overlay["points"].append(list(p3))
+
+    if angle is not None:
+        start = float(np.arctan2(p1[1] - vertex[1], p1[0] - vertex[0]))
+        end = float(np.arctan2(p3[1] - vertex[1], p3[0] - vertex[0]))
+        if (end - start) % (2 * np.pi) > np.pi:
+            start, end = end, start
+        sweep = (end - start) % (2 * np.pi)
+        mid = start + sweep / 2
+        overlay["arc"] = {"center": list(vertex), "radius": ARC_RADIUS,
+                          "start": round(start, 4), "end": round(end, 4)}
+        overlay["label"] = {
+            "text": f"{metric}: {angle:.1f}°",
+            "position": [round(vertex[0] + (ARC_RADIUS + 10) * float(np.cos(mid)), 1),
+                         round(vertex[1] + (ARC_RADIUS + 10) * float(np.sin(mid)), 1)]
+        }
+    return overlay
@@ -0,0 +1,85 @@
+import gzip
+from typing import Any, Optional
+
+import orjson
+from fastapi.responses import Response
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip is used when brotli is not installed
+    brotli = None
+
+import config
+
+# JSON responses serialized with orjson. Returning one of these from an
+# endpoint skips FastAPI's jsonable_encoder walk over the result dict.
+
+ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any):
+    # numpy values of dtypes OPT_SERIALIZE_NUMPY rejects, such as float16 scalars and
+    # arrays (stored landmarks); tolist() turns either into Python numbers
+    if hasattr(obj, "tolist"):
+        return obj.tolist()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+def image_payload_bytes(content: Any) -> int:
+    """Size of inline data:image/... strings in a result dict (already-compressed bytes)."""
+    if isinstance(content, dict):
+        return sum(image_payload_bytes(v) for v in content.values())
+    if isinstance(content, list):
+        return 0  # keypoint lists never hold images
+    if isinstance(content, str) and content.startswith("data:image/"):
+        return len(content)
+    return 0
+
+
+def choose_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    accepted = {part.split(";")[0].strip() for part in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return "br"
+    if "gzip" in accepted:
+        return "gzip"
+    return None
+
+
+class FastJSONResponse(Response):
+    """
+    orjson-rendered JSON response with optional gzip/brotli.
+
+    The body is compressed only when the client accepts it, it is at least
+    COMPRESS_MIN_BYTES and inline images (base64 of JPEG/WebP, which gain little
+    and cost a lot of CPU) make up less than COMPRESS_MAX_IMAGE_FRACTION of it.
+    """
+    media_type = "application/json"
+
+    def __init__(self, content: Any, accept_encoding: Optional[str] = None, status_code: int = 200, **kwargs):
+        self._accept_encoding = accept_encoding
+        super().__init__(content, status_code=status_code, **kwargs)
+
+    def render(self, content: Any) -> bytes:
+        body = dumps(content)
+        encoding = choose_encoding(self._accept_encoding)
+        if encoding is None or len(body) < config.COMPRESS_MIN_BYTES:
+            return body
+        if image_payload_bytes(content) > len(body) * config.COMPRESS_MAX_IMAGE_FRACTION:
+            return body
+        if encoding == "br":
+            compressed = brotli.compress(body, quality=config.BROTLI_QUALITY)
+        else:
+            compressed = gzip.compress(body, compresslevel=config.GZIP_LEVEL)
+        self._content_encoding = encoding
+        return compressed
+
+    def init_headers(self, headers=None) -> None:
+        super().init_headers(headers)
+        encoding = getattr(self, "_content_encoding", None)
+        if encoding is not None:
+            self.raw_headers.append((b"content-encoding", encoding.encode("latin-1")))
+        self.raw_headers.append((b"vary", b"Accept-Encoding"))
@@ -0,0 +1,253 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+import config
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Content-addressed cache for landmarks and finished metric results.
+# Tiers are tried in order (memory, then disk or Redis); hits backfill the
+# faster tiers. Every backend stores opaque bytes under string keys.
+
+
+def content_key(content: bytes) -> str:
+    return hashlib.blake2b(content, digest_size=20).hexdigest()
+
+
+def pack_landmarks(landmarks: Optional[np.ndarray]) -> bytes:
+    """Serialize landmarks; None (no pose detected) is cached too."""
+    if landmarks is None:
+        return b"\x00"
+    return b"\x01" + landmarks.astype(np.float32).tobytes()
+
+
+def unpack_landmarks(data: bytes) -> Optional[np.ndarray]:
+    if data[:1] == b"\x00":
+        return None
+    return np.frombuffer(data, dtype=np.float32, offset=1).reshape(-1, 4).copy()
+
+
+class CacheBackend:
+    """Interface for a cache tier."""
+    name = "backend"
+
+    def get(self, key: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes) -> None:
+        raise NotImplementedError
+
+    def delete(self, key: str) -> None:
+        raise NotImplementedError
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU bounded by total value size. Also the local stand-in for Redis in tests."""
+    name = "memory"
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = value
+            self._bytes += len(value)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            value = self._entries.pop(key, None)
+            if value is not None:
+                self._bytes -= len(value)
+
+
+class SQLiteBackend(CacheBackend):
+    """
+    Disk tier in a single SQLite file, shared by every worker process on the host.
+
+    WAL mode lets readers proceed while one process writes; each thread gets its
+    own connection. Total size is tracked in a meta row and trimmed back to 90%
+    of max_bytes, least recently used first. Access times are only rewritten
+    when older than touch_interval, so hot reads stay read-only.
+    """
+    name = "disk"
+
+    def __init__(self, path: str, max_bytes: int, touch_interval: float = 60.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_interval = touch_interval
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                value BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                last_access REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+            CREATE TABLE IF NOT EXISTS meta (id INTEGER PRIMARY KEY CHECK (id = 0), total_bytes INTEGER NOT NULL);
+            INSERT OR IGNORE INTO meta (id, total_bytes) VALUES (0, 0);
+        """)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[bytes]:
+        conn = self._conn()
+        row = conn.execute("SELECT value, last_access FROM entries WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > self.touch_interval:
+            conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (now, key))
+        return row[0]
+
+    def set(self, key: str, value: bytes) -> None:
+        if len(value) > self.max_bytes:
+            return
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            delta = len(value) - (row[0] if row else 0)
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            total = conn.execute(
+                "UPDATE meta SET total_bytes = total_bytes + ? WHERE id = 0 RETURNING total_bytes", (delta,)
+            ).fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn, total - int(self.max_bytes * 0.9))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _evict(self, conn: sqlite3.Connection, bytes_to_free: int) -> None:
+        freed = 0
+        victims: List[str] = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            victims.append(key)
+            freed += size
+            if freed >= bytes_to_free:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in victims])
+        conn.execute("UPDATE meta SET total_bytes = total_bytes - ? WHERE id = 0", (freed,))
+        registry.inc("result_cache_evictions_total", len(victims), tier=self.name)
+
+    def delete(self, key: str) -> None:
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        row = conn.execute("DELETE FROM entries WHERE key = ? RETURNING size", (key,)).fetchone()
+        if row is not None:
+            conn.execute("UPDATE meta SET total_bytes = total_bytes - ? WHERE id = 0", (row[0],))
+        conn.execute("COMMIT")
+
+
+class RedisBackend(CacheBackend):
+    """Shared tier for multi-node setups; works with any client exposing get/set/delete like redis-py."""
+    name = "redis"
+
+    def __init__(self, client, ttl_seconds: int, prefix: str = "pose:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url: str, ttl_seconds: int) -> "RedisBackend":
+        import redis  # Optional dependency, only needed for this backend
+        return cls(redis.Redis.from_url(url), ttl_seconds)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.prefix + key)
+
+    def set(self, key: str, value: bytes) -> None:
+        self.client.set(self.prefix + key, value, ex=self.ttl_seconds)
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+
+class TieredCache:
+    """Look up tiers in order and backfill faster tiers on a hit. Backend errors count as misses."""
+
+    def __init__(self, tiers: List[CacheBackend]):
+        self.tiers = tiers
+
+    def get(self, key: str, kind: str) -> Optional[bytes]:
+        if not self.tiers:
+            return None
+        for index, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                logger.error("Cache tier %s get failed: %s", tier.name, e)
+                continue
+            if value is not None:
+                registry.inc("result_cache_hits_total", tier=tier.name, kind=kind)
+                for faster in self.tiers[:index]:
+                    self._safe_set(faster, key, value)
+                return value
+        registry.inc("result_cache_misses_total", kind=kind)
+        return None
+
+    def set(self, key: str, value: bytes) -> None:
+        for tier in self.tiers:
+            self._safe_set(tier, key, value)
+
+    @staticmethod
+    def _safe_set(tier: CacheBackend, key: str, value: bytes) -> None:
+        try:
+            tier.set(key, value)
+        except Exception as e:
+            logger.error("Cache tier %s set failed: %s", tier.name, e)
+
+
+def build_tiers() -> List[CacheBackend]:
+    """Cache tiers for the configured RESULT_CACHE_BACKEND."""
+    backend = config.RESULT_CACHE_BACKEND
+    if backend == "none":
+        return []
+    tiers: List[CacheBackend] = [MemoryBackend(config.RESULT_CACHE_MEMORY_MB * 1024 * 1024)]
+    if backend == "disk":
+        tiers.append(SQLiteBackend(config.RESULT_CACHE_PATH, config.RESULT_CACHE_MAX_MB * 1024 * 1024))
+    elif backend == "redis":
+        tiers.append(RedisBackend.from_url(config.RESULT_CACHE_REDIS_URL, config.RESULT_CACHE_TTL_SECONDS))
+    elif backend != "memory":
+        raise ValueError(f"Unknown RESULT_CACHE_BACKEND: {backend}")
+    return tiers
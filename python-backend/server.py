@@ -0,0 +1,167 @@
+import asyncio
+import importlib
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+# Staged startup. uvicorn is started with this small ASGI app, which imports
+# nothing heavy, so the port is open and /healthz answers within a fraction
+# of a second. The API module (main, with FastAPI, OpenCV, NumPy ...) is
+# imported in a background thread, its startup handlers run through its own
+# lifespan, and the first pose model is loaded; requests get 503 with
+# Retry-After until then and go straight to the API afterwards.
+#
+#   /healthz  200 as soon as the process listens (liveness)
+#   /readyz   200 once requests are served, 503 before or if loading failed
+#
+# Run with "python server.py" or "uvicorn server:app".
+
+logger = logging.getLogger(__name__)
+
+APP_MODULE = os.environ.get("APP_MODULE", "main:app")
+HOST = os.environ.get("HOST", "0.0.0.0")
+PORT = int(os.environ.get("PORT", "5000"))
+
+STARTING = "starting"
+READY = "ready"
+FAILED = "failed"
+
+
+async def _send_json(send, status: int, body: bytes, headers=()) -> None:
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode()),
+                    *headers],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class _Lifespan:
+    """Drives the lifespan protocol of an inner ASGI app: startup, then shutdown on request."""
+
+    def __init__(self, app):
+        self.app = app
+        self._messages: asyncio.Queue = asyncio.Queue()
+        self._replies: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        try:
+            await self.app({"type": "lifespan", "asgi": {"version": "3.0"}, "state": {}},
+                           self._messages.get, self._replies.put)
+        except Exception as e:
+            await self._replies.put({"type": "lifespan.failed", "message": str(e)})
+
+    async def _step(self, event: str) -> None:
+        """:raises RuntimeError: if the app reports the step failed"""
+        await self._messages.put({"type": f"lifespan.{event}"})
+        reply = await self._replies.get()
+        if reply["type"] != f"lifespan.{event}.complete":
+            raise RuntimeError(reply.get("message") or f"lifespan {event} failed")
+
+    async def startup(self) -> None:
+        self._task = asyncio.create_task(self._run())
+        await self._step("startup")
+
+    async def shutdown(self) -> None:
+        if self._task is not None and not self._task.done():
+            await self._step("shutdown")
+            await self._task
+
+
+class StagedApp:
+    def __init__(self, app_path: str = APP_MODULE):
+        self.app_path = app_path
+        self.state = STARTING
+        self.error: Optional[str] = None
+        self.started = time.monotonic()
+        self.timings = {}  # stage -> seconds since the process started listening
+        self._app = None
+        self._lifespan: Optional[_Lifespan] = None
+        self._loader: Optional[asyncio.Task] = None
+
+    def _mark(self, stage: str) -> None:
+        self.timings[stage] = round(time.monotonic() - self.started, 3)
+
+    def _import(self):
+        module_name, _, attribute = self.app_path.partition(":")
+        module = importlib.import_module(module_name)
+        return module, getattr(module, attribute or "app")
+
+    async def _load(self) -> None:
+        try:
+            module, app = await asyncio.to_thread(self._import)
+            self._mark("imported")
+            self._lifespan = _Lifespan(app)
+            await self._lifespan.startup()
+            self._mark("started")
+            # Load the first pose model (or wait for the first inference worker)
+            pose_pool = getattr(module, "pose_pool", None)
+            if pose_pool is not None and not await asyncio.to_thread(pose_pool.ensure_ready):
+                logger.error("Pose model failed to load; requests will retry it")
+            self._mark("ready")
+            self._app = app
+            self.state = READY
+            logger.info("Server ready in %.2f s (%s)", time.monotonic() - self.started, self.timings)
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+            self.state = FAILED
+            logger.exception("Failed to load %s", self.app_path)
+
+    async def _handle_lifespan(self, receive, send) -> None:
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                self.started = time.monotonic()
+                self._loader = asyncio.create_task(self._load())
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                if self._loader is not None and not self._loader.done():
+                    # The import thread cannot be interrupted; let it finish so shutdown handlers see a started app
+                    await self._loader
+                if self._lifespan is not None:
+                    try:
+                        await self._lifespan.shutdown()
+                    except Exception as e:
+                        logger.error("Shutdown of %s failed: %s", self.app_path, e)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    def _status_body(self) -> bytes:
+        body = {"status": self.state, "uptime_s": round(time.monotonic() - self.started, 3), "stages": self.timings}
+        if self.error:
+            body["error"] = self.error
+        return json.dumps(body).encode()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "lifespan":
+            await self._handle_lifespan(receive, send)
+            return
+        if self._app is not None and scope.get("path") not in ("/healthz", "/readyz"):
+            await self._app(scope, receive, send)
+            return
+        if scope["type"] != "http":
+            await send({"type": "websocket.close", "code": 1013})  # Try again later
+            return
+
+        path = scope["path"]
+        if path == "/healthz":
+            await _send_json(send, 200, b'{"status":"ok"}')
+        elif path == "/readyz":
+            await _send_json(send, 200 if self.state == READY else 503, self._status_body())
+        else:
+            await _send_json(send, 503, self._status_body(), headers=[(b"retry-after", b"1")])
+
+
+app = StagedApp()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # Inference workers are spawned processes that re-import this script as
+    # __mp_main__; it is kept light so they do not load the API module
+    uvicorn.run(app, host=HOST, port=PORT)
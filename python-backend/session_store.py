@@ -0,0 +1,273 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _result_nbytes(value) -> int:
+    """Approximate size of a stored response entry; the base64 images in it dominate."""
+    if isinstance(value, dict):
+        return sum(len(key) + _result_nbytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_result_nbytes(item) for item in value)
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    return 8
+
+
+def _json_default(obj):
+    # numpy scalars in stored results
+    if hasattr(obj, "item"):
+        return obj.item()
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+@dataclass
+class MetricRecord:
+    """Preprocessed image and inferred landmarks for one metric."""
+    image: np.ndarray
+    landmarks: Optional[np.ndarray] = None  # (33, 4) float32: x, y, z, visibility
+
+    @property
+    def nbytes(self) -> int:
+        return self.image.nbytes + (self.landmarks.nbytes if self.landmarks is not None else 0)
+
+
+@dataclass
+class Session:
+    session_id: str
+    side: str
+    expires_at: float
+    metrics: Dict[str, MetricRecord] = field(default_factory=dict)
+    results: Dict[str, Dict] = field(default_factory=dict)  # Response entries of incremental submissions
+    patient_id: Optional[str] = None  # Measurements are recorded for this patient when set
+
+    @property
+    def nbytes(self) -> int:
+        return (sum(record.nbytes for record in self.metrics.values())
+                + sum(_result_nbytes(result) for result in self.results.values()))
+
+
+class SessionStore:
+    """
+    TTL-bounded session store keyed by session id.
+
+    Sessions live in memory in LRU order. When the in-memory total exceeds
+    max_memory_bytes the least recently used sessions are spilled to
+    spill_dir as .npz files and loaded back transparently on access.
+    Expired sessions are dropped from memory and disk.
+
+    Spill files are written by the calling thread after it released the lock,
+    so other requests keep using the store meanwhile; the methods do file I/O
+    and async callers run them in a thread.
+    """
+
+    def __init__(self, ttl_seconds: int, max_memory_bytes: int, spill_dir: str):
+        self.ttl_seconds = ttl_seconds
+        self.max_memory_bytes = max_memory_bytes
+        self.spill_dir = spill_dir
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._spilled: Dict[str, float] = {}  # session_id -> expires_at
+        self._spilling: Dict[str, Session] = {}  # Out of the memory budget, file being written
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        os.makedirs(spill_dir, exist_ok=True)
+
+    def create(self, side: str, patient_id: Optional[str] = None) -> Session:
+        session = Session(
+            session_id=uuid.uuid4().hex,
+            side=side,
+            expires_at=time.time() + self.ttl_seconds,
+            patient_id=patient_id,
+        )
+        with self._lock:
+            self._sweep_expired()
+            self._sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str) -> Optional[Session]:
+        """Return the session and extend its TTL, or None if unknown or expired."""
+        with self._lock:
+            session = self._lookup(session_id)
+            if session is None:
+                return None
+            if session.expires_at < time.time():
+                self._drop(session_id)
+                return None
+            session.expires_at = time.time() + self.ttl_seconds
+            self._sessions.move_to_end(session_id)
+            spills = self._enforce_memory_limit(keep=session_id)
+        self._write_spills(spills)
+        return session
+
+    def put_metric(self, session_id: str, metric: str, image: np.ndarray,
+                   landmarks: Optional[np.ndarray]) -> None:
+        with self._lock:
+            session = self._lookup(session_id)
+            if session is None:
+                raise KeyError(session_id)
+            before = session.nbytes
+            session.metrics[metric] = MetricRecord(image=image, landmarks=landmarks)
+            self._memory_bytes += session.nbytes - before
+            self._sessions.move_to_end(session_id)
+            spills = self._enforce_memory_limit(keep=session_id)
+        self._write_spills(spills)
+
+    def put_result(self, session_id: str, metric: str, result: Dict) -> None:
+        with self._lock:
+            session = self._lookup(session_id)
+            if session is None:
+                raise KeyError(session_id)
+            before = session.nbytes
+            session.results[metric] = result
+            self._memory_bytes += session.nbytes - before
+            self._sessions.move_to_end(session_id)
+            spills = self._enforce_memory_limit(keep=session_id)
+        self._write_spills(spills)
+
+    def delete(self, session_id: str) -> bool:
+        with self._lock:
+            return self._drop(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "in_memory": len(self._sessions),
+                "spilled": len(self._spilled) + len(self._spilling),
+                "memory_bytes": self._memory_bytes,
+            }
+
+    # Internal helpers, called with the lock held
+
+    def _spill_path(self, session_id: str) -> str:
+        return os.path.join(self.spill_dir, f"{session_id}.npz")
+
+    def _lookup(self, session_id: str) -> Optional[Session]:
+        """The session back in memory, taken from a pending spill or loaded from disk."""
+        session = self._sessions.get(session_id)
+        if session is None and session_id in self._spilling:
+            # Still being written; the writer discards the file when it finds the session gone
+            session = self._spilling.pop(session_id)
+            self._sessions[session_id] = session
+            self._memory_bytes += session.nbytes
+        if session is None and session_id in self._spilled:
+            session = self._load_spilled(session_id)
+        return session
+
+    def _drop(self, session_id: str) -> bool:
+        found = False
+        session = self._sessions.pop(session_id, None)
+        if session is not None:
+            self._memory_bytes -= session.nbytes
+            found = True
+        if self._spilling.pop(session_id, None) is not None:
+            found = True
+        if self._spilled.pop(session_id, None) is not None:
+            try:
+                os.remove(self._spill_path(session_id))
+            except OSError:
+                pass
+            found = True
+        return found
+
+    def _sweep_expired(self) -> None:
+        now = time.time()
+        expired = [sid for sid, s in self._sessions.items() if s.expires_at < now]
+        expired += [sid for sid, s in self._spilling.items() if s.expires_at < now]
+        expired += [sid for sid, expires_at in self._spilled.items() if expires_at < now]
+        for session_id in expired:
+            self._drop(session_id)
+
+    def _enforce_memory_limit(self, keep: Optional[str] = None) -> List[Tuple[Session, Dict]]:
+        """Take sessions out of the budget until it fits; returns what _write_spills must write."""
+        spills = []
+        while self._memory_bytes > self.max_memory_bytes:
+            victim = next((sid for sid in self._sessions if sid != keep), None)
+            if victim is None:
+                break
+            spills.append(self._spill(victim))
+        return spills
+
+    def _spill(self, session_id: str) -> Tuple[Session, Dict]:
+        session = self._sessions.pop(session_id)
+        self._memory_bytes -= session.nbytes
+        self._spilling[session_id] = session
+        # Snapshot what is written: the session may be taken back and changed meanwhile
+        arrays = {}
+        for metric, record in session.metrics.items():
+            arrays[f"image__{metric}"] = record.image
+            if record.landmarks is not None:
+                arrays[f"landmarks__{metric}"] = record.landmarks
+        meta = {"side": session.side, "expires_at": session.expires_at, "results": dict(session.results),
+                "patient_id": session.patient_id}
+        return session, {"meta": meta, "arrays": arrays}
+
+    def _load_spilled(self, session_id: str) -> Optional[Session]:
+        path = self._spill_path(session_id)
+        self._spilled.pop(session_id, None)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                session = Session(session_id=session_id, side=meta["side"], expires_at=meta["expires_at"],
+                                  results=meta.get("results", {}), patient_id=meta.get("patient_id"))
+                for key in data.files:
+                    if key.startswith("image__"):
+                        metric = key[len("image__"):]
+                        landmarks_key = f"landmarks__{metric}"
+                        session.metrics[metric] = MetricRecord(
+                            image=data[key],
+                            landmarks=data[landmarks_key] if landmarks_key in data.files else None,
+                        )
+            os.remove(path)
+        except (OSError, ValueError, KeyError) as e:
+            logger.error("Failed to load spilled session %s: %s", session_id, e)
+            return None
+        self._sessions[session_id] = session
+        self._memory_bytes += session.nbytes
+        return session
+
+    # Called without the lock
+
+    def _write_spills(self, spills: List[Tuple[Session, Dict]]) -> None:
+        for session, snapshot in spills:
+            session_id = session.session_id
+            path = self._spill_path(session_id)
+            partial = f"{path}.{uuid.uuid4().hex}.partial"
+            error = None
+            try:
+                meta = json.dumps(snapshot["meta"], default=_json_default)
+                with open(partial, "wb") as f:
+                    np.savez(f, meta=np.array(meta), **snapshot["arrays"])
+            except OSError as e:
+                error = e
+            with self._lock:
+                if self._spilling.get(session_id) is session:
+                    del self._spilling[session_id]
+                    if error is None:
+                        try:
+                            os.replace(partial, path)
+                            self._spilled[session_id] = snapshot["meta"]["expires_at"]
+                        except OSError as e:
+                            error = e
+                    if error is not None:
+                        logger.error("Failed to spill session %s, dropping it: %s", session_id, error)
+                    else:
+                        logger.info("Spilled session %s to disk (%d bytes)", session_id, session.nbytes)
+                        continue
+            self._remove(partial)  # Failed, or taken back or dropped while it was written
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,240 @@
+import atexit
+import contextvars
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import time
+import uuid
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import orjson
+
+from metrics import registry
+
+# Logging off the request path. Loggers only put records on a queue (a few
+# microseconds); a QueueListener thread formats and writes them. Messages use
+# %-style arguments, so the string is only built in the listener thread, and
+# only for records that survive sampling.
+#
+# Each record carries the request id and the stage timings of the request so
+# far (see record_stage). Records below WARNING can be sampled per level;
+# sampling is keyed on the request id, so a request keeps all of its lines
+# or none.
+
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+# (stage, seconds) pairs appended by the pipeline, summed when a line is formatted
+stage_timings_var: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar(
+    "stage_timings", default=None
+)
+
+# LogRecord attributes that are not extra fields
+_RECORD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {
+    "message", "asctime", "request_id", "stage_timings", "taskName",
+}
+
+
+def bind_request(request_id: str):
+    """Start a request context in the current task; returns tokens for unbind_request."""
+    return request_id_var.set(request_id), stage_timings_var.set([])
+
+
+def unbind_request(tokens) -> None:
+    request_id_var.reset(tokens[0])
+    stage_timings_var.reset(tokens[1])
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    timings = stage_timings_var.get()
+    if timings is not None:
+        timings.append((stage, seconds))  # list.append is atomic, jobs may run in several threads
+
+
+def stage_ms(timings: Optional[Tuple[List[Tuple[str, float]], int]]) -> Optional[Dict[str, float]]:
+    if not timings or not timings[1]:
+        return None
+    totals: Dict[str, float] = {}
+    for stage, seconds in timings[0][:timings[1]]:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return {stage: round(seconds * 1000, 2) for stage, seconds in totals.items()}
+
+
+class ContextFilter(logging.Filter):
+    """Attach the request context. Runs in the caller's thread, so only references are taken."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        timings = stage_timings_var.get()
+        record.stage_timings = (timings, len(timings)) if timings else None
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep records of a level with the given probability; WARNING and above are always kept."""
+
+    def __init__(self, rates: Dict[int, float]):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.levelno, 1.0)
+        if rate >= 1.0:
+            return True
+        request_id = getattr(record, "request_id", None)
+        # Same decision for every line of a request
+        sample = zlib.crc32(request_id.encode()) / 2 ** 32 if request_id else random.random()
+        if sample < rate:
+            return True
+        registry.inc("log_records_sampled_out_total", level=record.levelname)
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, request_id, stage_ms, extra fields, exc."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        timings = stage_ms(getattr(record, "stage_timings", None))
+        if timings:
+            entry["stage_ms"] = timings
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+        return orjson.dumps(entry, default=str, option=orjson.OPT_SERIALIZE_NUMPY).decode()
+
+
+class TextFormatter(logging.Formatter):
+    """The default basicConfig layout with the request id and stage timings appended."""
+
+    def __init__(self):
+        super().__init__("%(levelname)s:%(name)s:%(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        if getattr(record, "request_id", None):
+            line += f" request_id={record.request_id}"
+        timings = stage_ms(getattr(record, "stage_timings", None))
+        if timings:
+            line += " stage_ms=" + ",".join(f"{stage}:{ms}" for stage, ms in timings.items())
+        return line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that hands records over unformatted and drops them when the
+    queue is full instead of blocking or printing errors.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The listener lives in this process, so the record needs no pickling;
+        # formatting it here would defeat lazy formatting. Log arguments are
+        # therefore read later and must not be mutated after the call.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            registry.inc("log_records_dropped_total")
+
+
+def parse_sample_rates(value: str) -> Dict[int, float]:
+    """
+    "DEBUG=0.01,INFO=0.5" -> {10: 0.01, 20: 0.5}
+    :raises ValueError: on an unknown level or a malformed rate
+    """
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        name, rate = item.split("=")
+        level = logging.getLevelName(name.strip().upper())
+        if not isinstance(level, int):
+            raise ValueError(f"Unknown log level: {name}")
+        rates[level] = float(rate)
+    return rates
+
+
+def configure(level: str = "INFO", format: str = "json", sample_rates: Optional[Dict[int, float]] = None,
+              queue_size: int = 10000, stream=None) -> logging.handlers.QueueListener:
+    """Route the root logger through a queue to a listener thread writing to stream (stderr)."""
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if format == "json" else TextFormatter())
+    listener = logging.handlers.QueueListener(queue.Queue(maxsize=queue_size), handler)
+
+    queue_handler = DroppingQueueHandler(listener.queue)
+    queue_handler.addFilter(ContextFilter())
+    if sample_rates:
+        queue_handler.addFilter(SamplingFilter(sample_rates))
+
+    # Lines carry no process info, so skip collecting it for every record
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+    listener.start()
+    atexit.register(shutdown, listener)
+    return listener
+
+
+def shutdown(listener: logging.handlers.QueueListener) -> None:
+    """Write out what is still queued and stop the listener thread; safe to call twice."""
+    if getattr(listener, "_thread", None) is not None:
+        listener.stop()
+
+
+class RequestContextMiddleware:
+    """
+    ASGI middleware binding a request id (X-Request-ID, or a new one) for the
+    request's log lines, echoing it in the response and logging one summary
+    line per request with its status, duration and stage timings.
+    """
+
+    def __init__(self, app, logger: Optional[logging.Logger] = None):
+        self.app = app
+        self.logger = logger or logging.getLogger("access")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex[:16]
+        tokens = bind_request(request_id)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", ())) + [(b"x-request-id", request_id.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            self.logger.info("%s %s %d", scope["method"], scope["path"], status,
+                             extra={"duration_ms": round((time.perf_counter() - started) * 1000, 2)})
+            unbind_request(tokens)
@@ -0,0 +1,132 @@
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND)
+
+# main reads its configuration at import; keep every store of the test run in a
+# scratch directory and run inference in-process, without the sampling profiler
+_scratch = tempfile.mkdtemp(prefix="pose-tests-")
+for _name, _value in {
+    "SESSION_SPILL_DIR": os.path.join(_scratch, "sessions"),
+    "JOB_DB_PATH": os.path.join(_scratch, "jobs.sqlite3"),
+    "RESULT_CACHE_BACKEND": "memory",
+    "RESULT_CACHE_PATH": os.path.join(_scratch, "cache.sqlite3"),
+    "MEASUREMENT_DB_PATH": os.path.join(_scratch, "measurements.sqlite3"),
+    "LANDMARK_ARCHIVE_DIR": os.path.join(_scratch, "archives"),
+    "PROFILER_DIR": os.path.join(_scratch, "profiles"),
+    "PROFILER_ENABLED": "false",
+    "INFERENCE_MODE": "thread",
+    "LOG_LEVEL": "WARNING",
+    "LOG_FORMAT": "text",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+def standing_landmarks(knee_bend: float = 0.0) -> np.ndarray:
+    """
+    (33, 4) landmarks of a person standing upright in a 1:1 frame, every point
+    visible. knee_bend moves both ankles sideways (normalized units), which
+    bends the knees.
+    """
+    landmarks = np.zeros((33, 4), dtype=np.float32)
+    landmarks[:, 0] = 0.5
+    landmarks[:, 1] = np.linspace(0.1, 0.9, 33)
+    landmarks[:, 3] = 0.99
+    for index, (x, y) in {
+        0: (0.5, 0.1),  # nose
+        11: (0.45, 0.3), 12: (0.55, 0.3),  # shoulders
+        13: (0.43, 0.42), 14: (0.57, 0.42),  # elbows
+        15: (0.42, 0.52), 16: (0.58, 0.52),  # wrists
+        23: (0.47, 0.55), 24: (0.53, 0.55),  # hips
+        25: (0.47, 0.7), 26: (0.53, 0.7),  # knees
+        27: (0.47 - knee_bend, 0.85), 28: (0.53 + knee_bend, 0.85),  # ankles
+        29: (0.46 - knee_bend, 0.87), 30: (0.54 + knee_bend, 0.87),  # heels
+        31: (0.49 - knee_bend, 0.88), 32: (0.51 + knee_bend, 0.88),  # foot tips
+    }.items():
+        landmarks[index, :2] = (x, y)
+    return landmarks
+
+
+@pytest.fixture
+def landmarks():
+    return standing_landmarks()
+
+
+@pytest.fixture
+def frame():
+    """Textured 480x360 BGR frame that passes the quality gate."""
+    rng = np.random.default_rng(0)
+    img = rng.integers(40, 200, (360, 480, 3), dtype=np.uint8)
+    return np.ascontiguousarray(img)
+
+
+def jpeg(img: np.ndarray, quality: int = 90) -> bytes:
+    import cv2
+
+    ok, data = cv2.imencode(".jpg", img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    assert ok
+    return data.tobytes()
+
+
+def write_video(path: str, frames, fps: float = 30.0) -> str:
+    import cv2
+
+    height, width = frames[0].shape[:2]
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+    assert writer.isOpened()
+    for frame in frames:
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class FakeBackend:
+    """Pose backend answering every image with the same landmarks (None: no pose found)."""
+
+    def __init__(self, landmarks: np.ndarray):
+        self.landmarks = landmarks
+        self.calls = 0
+
+    def infer(self, img_rgb: np.ndarray):
+        self.calls += 1
+        return None if self.landmarks is None else self.landmarks.copy()
+
+    def video(self):
+        from pose_backends import VideoSession
+
+        return VideoSession(lambda img_rgb, timestamp_ms: self.infer(img_rgb))
+
+    def close(self) -> None:
+        pass
+
+
+@pytest.fixture
+def api(monkeypatch, tmp_path):
+    """
+    TestClient of main.app with fresh stores and a FakeBackend for the pose
+    model (client.backend), so requests need neither MediaPipe nor a person.
+    """
+    from fastapi.testclient import TestClient
+
+    import main
+    from phash import PerceptualIndex
+    from pose_pool import PosePool
+    from result_cache import MemoryBackend, TieredCache
+    from session_store import SessionStore
+
+    backend = FakeBackend(standing_landmarks())
+    monkeypatch.setattr(main, "pose_pool", PosePool(size=1, factory=lambda: backend))
+    monkeypatch.setattr(main, "result_cache", TieredCache([MemoryBackend(8 << 20)]))
+    monkeypatch.setattr(main, "session_store", SessionStore(ttl_seconds=60, max_memory_bytes=64 << 20,
+                                                            spill_dir=str(tmp_path / "sessions")))
+    monkeypatch.setattr(main, "phash_index", PerceptualIndex(max_distance=4, max_entries=64))
+    with TestClient(main.app) as client:
+        client.backend = backend
+        yield client
@@ -0,0 +1,61 @@
+import numpy as np
+
+from buffer_arena import MIN_CLASS_BYTES, BufferArena, size_class
+
+
+def test_size_class_bounds_waste():
+    assert size_class(1) == MIN_CLASS_BYTES
+    for nbytes in (MIN_CLASS_BYTES + 1, 480 * 640 * 3, 1080 * 1920 * 3, 12_345_678):
+        cls = size_class(nbytes)
+        assert nbytes <= cls <= nbytes * 1.125
+        assert size_class(cls) == cls
+
+
+def test_released_buffer_is_reused():
+    arena = BufferArena(max_bytes=8 << 20, max_per_class=2, max_pooled_bytes=32 << 20)
+    with arena.lease() as lease:
+        first = lease.take((360, 480, 3))
+        base = first.base
+    assert arena.pooled_bytes == size_class(first.nbytes)
+    with arena.lease() as lease:
+        second = lease.take((350, 490, 3))  # Same size class
+        assert second.base is base
+        assert second.shape == (350, 490, 3) and second.dtype == np.uint8
+    assert arena.pooled_bytes == size_class(first.nbytes)
+
+
+def test_lease_views_do_not_overlap():
+    arena = BufferArena(max_bytes=8 << 20, max_per_class=4, max_pooled_bytes=32 << 20)
+    with arena.lease() as lease:
+        a = lease.take((100, 100, 3))
+        b = lease.take((100, 100, 3))
+        a[:] = 1
+        b[:] = 2
+        assert not np.shares_memory(a, b)
+        assert a.min() == 1
+
+
+def test_pool_limits():
+    arena = BufferArena(max_bytes=1 << 20, max_per_class=1, max_pooled_bytes=32 << 20)
+    with arena.lease() as lease:
+        lease.take((100, 100, 3))
+        lease.take((100, 100, 3))
+        oversize = lease.take((1000, 1000, 3))
+        assert oversize.nbytes == 3_000_000
+    # One buffer per class is kept; the oversize one is never pooled
+    assert arena.pooled_bytes == size_class(30_000)
+
+    arena = BufferArena(max_bytes=1 << 20, max_per_class=8, max_pooled_bytes=MIN_CLASS_BYTES)
+    with arena.lease() as lease:
+        lease.take((100, 100, 3))
+        lease.take((100, 100, 3))
+    assert arena.pooled_bytes == MIN_CLASS_BYTES
+
+
+def test_disabled_arena_pools_nothing():
+    arena = BufferArena(max_bytes=8 << 20, max_per_class=8, max_pooled_bytes=32 << 20, enabled=False)
+    with arena.lease() as lease:
+        buffer = lease.take((360, 480, 3))
+        assert buffer.shape == (360, 480, 3)
+    assert arena.pooled_bytes == 0
+
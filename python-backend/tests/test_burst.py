@@ -0,0 +1,77 @@
+import numpy as np
+
+from conftest import FakeBackend, jpeg, standing_landmarks
+
+
+class SequenceBackend(FakeBackend):
+    """Answers the n-th image with the n-th landmarks; the pool's single thread keeps shots in order."""
+
+    def __init__(self, answers):
+        super().__init__(None)
+        self.answers = list(answers)
+
+    def infer(self, img_rgb):
+        answer = self.answers[self.calls]
+        self.calls += 1
+        return None if answer is None else answer.copy()
+
+
+def visible(visibility):
+    landmarks = standing_landmarks()
+    landmarks[:, 3] = visibility
+    return landmarks
+
+
+def shots(frame, count):
+    # Distinct uploads, so none is served from the cache of another
+    return [("knee", (f"shot{n}.jpg", jpeg(np.roll(frame, 7 * n, axis=1)), "image/jpeg")) for n in range(count)]
+
+
+def use_backend(api, monkeypatch, backend):
+    import main
+    from pose_pool import PosePool
+
+    monkeypatch.setattr(main, "pose_pool", PosePool(size=1, factory=lambda: backend))
+
+
+def test_first_good_shot_wins(api, frame, monkeypatch):
+    backend = SequenceBackend([visible(0.3), visible(0.95), visible(0.99), visible(0.99)])
+    use_backend(api, monkeypatch, backend)
+    result = api.post("/analyze-metrics", files=shots(frame, 4), data={"render": "none"}).json()["knee"]
+    burst = result["burst"]
+    assert burst["selected"] == 1
+    assert burst["early_stop"] is True
+    assert burst["shots"] == 4
+    assert burst["score"] == 0.95
+    assert backend.calls < 4  # Shots after the winner are cancelled
+
+
+def test_best_shot_without_a_winner(api, frame, monkeypatch):
+    backend = SequenceBackend([visible(0.3), None, visible(0.6)])
+    use_backend(api, monkeypatch, backend)
+    result = api.post("/analyze-metrics", files=shots(frame, 3), data={"render": "raster"}).json()["knee"]
+    assert result["burst"] == {"shots": 3, "used": 3, "selected": 2, "score": 0.6, "early_stop": False}
+    assert result["angle"] is not None
+    assert result["image"].startswith("data:image/jpeg;base64,")
+
+
+def test_burst_limit(api, frame, monkeypatch):
+    import config
+
+    monkeypatch.setattr(config, "BURST_MAX_SHOTS", 2)
+    backend = SequenceBackend([visible(0.3)] * 3)
+    use_backend(api, monkeypatch, backend)
+    result = api.post("/analyze-metrics", files=shots(frame, 3), data={"render": "none"}).json()["knee"]
+    assert result["burst"]["shots"] == 2
+    assert backend.calls == 2
+
+
+def test_session_stores_selected_shot(api, frame, monkeypatch):
+    import main
+
+    backend = SequenceBackend([visible(0.3), visible(0.6)])
+    use_backend(api, monkeypatch, backend)
+    body = api.post("/sessions", files=shots(frame, 2), data={"render": "none"}).json()
+    assert body["results"]["knee"]["burst"]["selected"] == 1
+    record = main.session_store.get(body["session_id"]).metrics["knee"]
+    assert float(record.landmarks[:, 3].min()) == np.float32(0.6)
@@ -0,0 +1,84 @@
+import asyncio
+import threading
+
+import pytest
+
+import main
+from cancellation import CancellationToken, ClientDisconnected
+from conftest import jpeg
+
+
+def test_token_cancels_once():
+    token = CancellationToken()
+    assert not token.cancelled
+    assert token.cancel("disconnect")
+    assert not token.cancel("deadline")
+    assert token.cancelled
+    assert token.reason == "disconnect"
+
+
+def test_child_follows_parent_but_not_the_other_way():
+    parent = CancellationToken()
+    child = CancellationToken(parent)
+    sibling = CancellationToken(parent)
+    child.cancel("winner")
+    assert child.cancelled and child.reason == "winner"
+    assert not parent.cancelled and not sibling.cancelled
+    parent.cancel("disconnect")
+    assert sibling.cancelled and sibling.reason == "disconnect"
+    assert child.reason == "winner"
+
+
+class DisconnectingRequest:
+    """Stands in for a Starlette request whose client leaves after `after` polls."""
+
+    def __init__(self, after: int):
+        self.after = after
+        self.polls = 0
+
+    async def is_disconnected(self) -> bool:
+        self.polls += 1
+        return self.polls > self.after
+
+
+def test_watch_disconnect_cancels_token_and_queued_work(monkeypatch):
+    monkeypatch.setattr(main.config, "DISCONNECT_POLL_SECONDS", 0.001)
+
+    async def scenario():
+        token = CancellationToken()
+        queued = asyncio.get_running_loop().create_future()
+        await main.watch_disconnect(DisconnectingRequest(after=2), token, [queued])
+        return token, queued
+
+    token, queued = asyncio.run(scenario())
+    assert token.reason == "disconnect"
+    assert queued.cancelled()
+
+
+def test_disconnected_client_stops_the_pipeline(api, frame, monkeypatch):
+    monkeypatch.setattr(main.config, "DISCONNECT_POLL_SECONDS", 0.001)
+    release = threading.Event()
+    original = api.backend.infer
+
+    def slow_infer(img_rgb):
+        release.wait(5)
+        return original(img_rgb)
+
+    monkeypatch.setattr(api.backend, "infer", slow_infer)
+    annotated = []
+    monkeypatch.setattr(main, "build_metric_result", lambda *args, **kwargs: annotated.append(args) or {})
+
+    async def scenario():
+        request = DisconnectingRequest(after=1)
+        task = asyncio.ensure_future(main.process_contents({"knee": jpeg(frame)}, "right", request=request,
+                                                           render=main.RENDER_NONE))
+        while request.polls < 2:
+            await asyncio.sleep(0.005)
+        release.set()
+        with pytest.raises(ClientDisconnected):
+            await task
+
+    asyncio.run(scenario())
+    # Inference finished after the disconnect, so annotation was skipped
+    main.pose_pool.executor.submit(lambda: None).result()
+    assert annotated == []
@@ -0,0 +1,68 @@
+import time
+
+import pytest
+
+import deadline
+import main
+from conftest import jpeg
+from deadline import Deadline, StageEstimator
+
+
+def test_from_request_prefers_the_header():
+    assert Deadline.from_request(None, None) is None
+    assert Deadline.from_request("", "") is None
+    assert Deadline.from_request("250", "5000").budget_seconds == pytest.approx(0.25)
+    assert Deadline.from_request(None, "1500").budget_seconds == pytest.approx(1.5)
+
+
+@pytest.mark.parametrize("raw", ["0", "-5", "soon"])
+def test_from_request_rejects_invalid_budgets(raw):
+    with pytest.raises(ValueError):
+        Deadline.from_request(raw, None)
+
+
+def test_remaining_and_expired():
+    budget = Deadline(0.05)
+    assert 0 < budget.remaining() <= 0.05
+    assert not budget.expired()
+    time.sleep(0.06)
+    assert budget.expired()
+    assert budget.remaining() == 0.0
+
+
+def test_stage_estimator_moving_average():
+    estimator = StageEstimator(alpha=0.5)
+    assert estimator.estimate("inference") == 0.0
+    estimator.record("inference", 1.0)
+    estimator.record("inference", 3.0)
+    assert estimator.estimate("inference") == pytest.approx(2.0)
+
+
+def test_can_start_only_when_the_stage_fits(monkeypatch):
+    estimator = StageEstimator()
+    estimator.record("inference", 10.0)
+    monkeypatch.setattr(deadline, "stage_estimates", estimator)
+    assert not Deadline(1.0).can_start("inference")
+    assert Deadline(1.0).can_start("decode")
+
+
+def test_invalid_deadline_is_a_bad_request(api, frame):
+    response = api.post("/analyze-metrics", files={"knee": ("a.jpg", jpeg(frame), "image/jpeg")},
+                        data={"render": "none"}, headers={"X-Request-Deadline-Ms": "-1"})
+    assert response.status_code == 400
+
+
+def test_stage_that_does_not_fit_returns_a_partial_result(api, frame, monkeypatch):
+    estimator = StageEstimator()
+    estimator.record("inference", 60.0)
+    monkeypatch.setattr(deadline, "stage_estimates", estimator)
+    monkeypatch.setattr(main, "stage_estimates", estimator)
+
+    response = api.post("/analyze-metrics", files={"knee": ("a.jpg", jpeg(frame), "image/jpeg")},
+                        data={"render": "none", "deadline_ms": "2000"})
+    assert response.status_code == 200
+    knee = response.json()["knee"]
+    assert knee["status"] == "timed_out"
+    assert knee["stage"] == "inference"
+    assert knee["angle"] is None
+    assert api.backend.calls == 0
@@ -0,0 +1,75 @@
+import base64
+
+import cv2
+import numpy as np
+import pytest
+
+from conftest import jpeg
+from encoding import MIN_QUALITY, EncodeOptions, encode_image, make_thumbnail, negotiate_options
+
+
+def test_negotiate_format():
+    assert negotiate_options(None).format == "jpeg"
+    assert negotiate_options("image/avif,image/webp,*/*").format == "webp"
+    assert negotiate_options("image/webp", image_format="JPG").format == "jpeg"
+    assert negotiate_options(None, target_kb=20).target_bytes == 20 * 1024
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"image_format": "gif"}, {"quality": 0}, {"quality": 101}, {"target_kb": 0}, {"thumbnail": 8},
+])
+def test_negotiate_rejects_bad_values(kwargs):
+    with pytest.raises(ValueError):
+        negotiate_options(None, **kwargs)
+
+
+def test_fixed_quality(frame):
+    encoded = encode_image(frame, EncodeOptions(quality=70))
+    assert (encoded.quality, encoded.trials) == (70, 1)
+    decoded = cv2.imdecode(np.frombuffer(encoded.data, np.uint8), cv2.IMREAD_COLOR)
+    assert decoded.shape == frame.shape
+
+
+def test_webp_data_url(frame):
+    encoded = encode_image(frame, EncodeOptions(format="webp"))
+    header, data = encoded.data_url().split(",", 1)
+    assert header == "data:image/webp;base64"
+    assert base64.b64decode(data)[8:12] == b"WEBP"
+
+
+def test_thumbnail_keeps_aspect(frame):
+    assert make_thumbnail(frame, 120).shape == (90, 120, 3)
+    assert make_thumbnail(frame, 1000) is frame
+    encoded = encode_image(frame, EncodeOptions(thumbnail=240))
+    assert (encoded.width, encoded.height) == (240, 180)
+
+
+def test_target_size_search(frame):
+    full = len(encode_image(frame, EncodeOptions(quality=95)).data)
+    target = full // 2
+    encoded = encode_image(frame, EncodeOptions(target_bytes=target, max_trials=8))
+    assert len(encoded.data) <= target
+    assert MIN_QUALITY <= encoded.quality < 95
+    assert encoded.trials <= 8
+    # One step up no longer fits, so the search kept the best quality it could
+    above = len(encode_image(frame, EncodeOptions(quality=encoded.quality + 1)).data)
+    assert above > target or encoded.trials == 8
+
+
+def test_target_size_unreachable(frame):
+    encoded = encode_image(frame, EncodeOptions(target_bytes=100))
+    assert encoded.quality == MIN_QUALITY
+    assert encoded.trials == 2
+
+
+def test_api_encode_options(api, frame):
+    response = api.post("/analyze-metrics", files={"knee": ("knee.jpg", jpeg(frame), "image/jpeg")},
+                        data={"thumbnail": "200"}, headers={"Accept": "image/webp"})
+    result = response.json()["knee"]
+    assert result["image"].startswith("data:image/webp;base64,")
+    assert result["encoding"]["format"] == "webp"
+    assert result["encoding"]["width"] == 200
+
+    response = api.post("/analyze-metrics", files={"knee": ("knee.jpg", jpeg(frame), "image/jpeg")},
+                        data={"image_format": "bmp"})
+    assert response.status_code == 400
@@ -0,0 +1,100 @@
+import threading
+
+import pytest
+
+from conftest import FakeBackend, jpeg, standing_landmarks
+
+
+def capture(api, metric, img, **data):
+    return api.post(f"/analyze-metric/{metric}", files={"file": (f"{metric}.jpg", jpeg(img), "image/jpeg")},
+                    data={"render": "none", **data})
+
+
+def test_captures_collect_in_one_session(api, frame):
+    response = capture(api, "knee", frame, side="left")
+    assert response.status_code == 202
+    body = response.json()
+    assert body["status"] == "processing"
+    session_id = body["session_id"]
+    assert body["results_url"] == f"/sessions/{session_id}/results"
+
+    assert capture(api, "ankle", frame[::-1].copy(), session_id=session_id).status_code == 202
+    results = api.get(f"/sessions/{session_id}/results").json()
+    assert results["side"] == "left"
+    assert results["pending"] == []
+    assert set(results["results"]) == {"ankle", "knee"}
+    assert results["results"]["knee"]["angle"] == pytest.approx(180.0, abs=1.0)
+
+
+def test_unknown_metric_and_session(api, frame):
+    assert capture(api, "elbow", frame).status_code == 404
+    assert capture(api, "knee", frame, session_id="missing").status_code == 404
+    assert api.get("/sessions/missing/results", params={"wait": 0}).status_code == 404
+
+
+class BlockingBackend(FakeBackend):
+    """Holds every inference until released."""
+
+    def __init__(self, landmarks):
+        super().__init__(landmarks)
+        self.release = threading.Event()
+        self.started = threading.Event()
+
+    def infer(self, img_rgb):
+        self.started.set()
+        self.release.wait(5)
+        return super().infer(img_rgb)
+
+
+@pytest.fixture
+def blocking(api, monkeypatch):
+    import main
+    from pose_pool import PosePool
+
+    backend = BlockingBackend(standing_landmarks())
+    monkeypatch.setattr(main, "pose_pool", PosePool(size=2, factory=lambda: backend))
+    yield backend
+    backend.release.set()
+
+
+def test_results_report_pending_captures(api, frame, blocking):
+    session_id = capture(api, "knee", frame).json()["session_id"]
+    assert blocking.started.wait(5)
+    results = api.get(f"/sessions/{session_id}/results", params={"wait": 0.05}).json()
+    assert results["pending"] == ["knee"]
+    assert results["results"] == {}
+
+    blocking.release.set()
+    results = api.get(f"/sessions/{session_id}/results").json()
+    assert results["pending"] == []
+    assert results["results"]["knee"]["angle"] is not None
+
+
+def test_retake_replaces_earlier_capture(api, frame, blocking):
+    import main
+
+    session_id = capture(api, "knee", frame).json()["session_id"]
+    assert blocking.started.wait(5)
+    first = main.session_tasks[session_id]["knee"]
+    blocking.landmarks = standing_landmarks(knee_bend=0.1)
+    capture(api, "knee", frame[::-1].copy(), session_id=session_id)
+    assert main.session_tasks[session_id]["knee"] is not first
+
+    blocking.release.set()
+    results = api.get(f"/sessions/{session_id}/results").json()
+    assert first.cancelled()
+    assert results["results"]["knee"]["angle"] < 170  # The retake's bent knee, not the first capture
+
+
+def test_delete_cancels_in_flight_captures(api, frame, blocking):
+    import main
+
+    session_id = capture(api, "knee", frame).json()["session_id"]
+    assert blocking.started.wait(5)
+    task = main.session_tasks[session_id]["knee"]
+    assert api.delete(f"/sessions/{session_id}").status_code == 200
+    assert session_id not in main.session_tasks
+    blocking.release.set()
+    api.portal.call(lambda: None)  # Let the event loop run the cancellation
+    assert task.cancelled() or task.done()
+    assert api.get(f"/sessions/{session_id}/results", params={"wait": 0}).status_code == 404
@@ -0,0 +1,195 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import inference_workers
+from inference_workers import InferenceTimeout, InferenceWorkerPool
+
+POSE_OPTIONS = {"static_image_mode": True, "model_complexity": 1, "min_detection_confidence": 0.5}
+
+
+@pytest.fixture
+def pool():
+    pool = InferenceWorkerPool(1, POSE_OPTIONS, timeout=10, startup_timeout=60)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def person():
+    data = pytest.importorskip("skimage.data")
+    return np.ascontiguousarray(data.astronaut())
+
+
+def test_infer_matches_in_process_backend(pool, person):
+    from pose_backends import create_backend
+
+    assert pool.ensure_ready()
+    landmarks = pool.infer(person)
+    local = create_backend("mediapipe", POSE_OPTIONS)
+    try:
+        expected = local.infer(person)
+    finally:
+        local.close()
+    assert landmarks.shape == (33, 4)
+    assert np.allclose(landmarks, expected, atol=1e-4)
+    assert pool.infer(np.zeros((64, 64, 3), dtype=np.uint8)) is None
+
+
+def test_worker_recycled_after_max_jobs(frame):
+    pool = InferenceWorkerPool(1, POSE_OPTIONS, max_jobs=2)
+    try:
+        assert pool.ensure_ready()
+        first = pool._idle.queue[0].pid
+        pool.infer(frame)
+        pool.infer(frame)
+        assert pool.ensure_ready()
+        assert pool._idle.queue[0].pid != first
+    finally:
+        pool.close()
+
+
+def test_timeout_kills_worker_and_replaces_it(pool, frame):
+    assert pool.ensure_ready()
+    worker = pool._idle.queue[0]
+    pool.timeout = 0.0001
+    with pytest.raises(InferenceTimeout):
+        pool.infer(frame)
+    assert not worker.process.is_alive()
+    pool.timeout = 10
+    pool.infer(frame)  # Served by the replacement
+
+
+def test_dead_idle_worker_is_replaced(pool, frame):
+    assert pool.ensure_ready()
+    worker = pool._idle.queue[0]
+    worker.process.kill()
+    worker.process.join(5)
+    pool.infer(frame)
+    assert pool._idle.queue[0].pid != worker.pid
+
+
+def test_failed_spawn_releases_its_slot(monkeypatch):
+    def broken(*args):
+        raise OSError("no more processes")
+
+    monkeypatch.setattr(inference_workers, "Worker", broken)
+    pool = InferenceWorkerPool(2, POSE_OPTIONS, startup_timeout=30)
+    started = time.monotonic()
+    assert pool.ensure_ready() is False
+    assert time.monotonic() - started < 5  # Not the whole startup timeout
+    assert pool._alive == 0
+
+
+def test_handlers_wait_for_models_off_the_event_loop(api, frame, monkeypatch):
+    from conftest import jpeg
+
+    import main
+
+    loop_thread = api.portal.call(threading.get_ident)
+    threads = []
+
+    def ensure_ready():
+        threads.append(threading.get_ident())
+        return True
+
+    monkeypatch.setattr(main.pose_pool, "ensure_ready", ensure_ready)
+    response = api.post("/analyze-metric/knee", files={"file": ("knee.jpg", jpeg(frame), "image/jpeg")},
+                        data={"render": "none"})
+    assert response.status_code == 202
+    api.post("/analyze-metrics", files={"knee": ("knee.jpg", jpeg(frame), "image/jpeg")}, data={"render": "none"})
+    assert len(threads) == 2
+    assert loop_thread not in threads
+
+
+@pytest.fixture(scope="module")
+def task_bundle(tmp_path_factory):
+    from model_registry import ModelError, mediapipe_model_path, write_task_bundle
+
+    try:
+        detector, landmarks = (mediapipe_model_path(name) for name in ("pose_detection", "pose_landmark_full"))
+    except ModelError as e:
+        pytest.skip(str(e))
+    path = str(tmp_path_factory.mktemp("models") / "pose_landmarker_full.task")
+    write_task_bundle(detector, landmarks, path)
+    return path
+
+
+def clip(person, count=6):
+    """The person drifting right, as video frames."""
+    return [np.ascontiguousarray(np.roll(person, 6 * n, axis=1)) for n in range(count)]
+
+
+def wait_for_idle(pool, count, timeout=60):
+    deadline = time.monotonic() + timeout
+    while pool._idle.qsize() < count:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+
+def test_video_session_tracks_on_one_worker(task_bundle, person):
+    from pose_backends import TasksBackend
+
+    frames = clip(person)
+    local = TasksBackend(task_bundle)
+    with local.video() as video:
+        expected = [video.infer(frame, 33 * n) for n, frame in enumerate(frames)]
+    local.close()
+
+    pool = InferenceWorkerPool(2, {"model_path": task_bundle}, engine="tasks")
+    try:
+        pool.start()
+        wait_for_idle(pool, 2)
+        with pool.video() as video:
+            other = pool._idle.queue[0]
+            actual = [video.infer(frame, 33 * n) for n, frame in enumerate(frames)]
+            assert pool.infer(frames[0]) is not None  # Single images go to the other worker meanwhile
+        assert all(a is not None for a in actual)
+        # The worker ran a VIDEO landmarker: the same tracked landmarks as in process
+        assert np.allclose(np.stack(actual), np.stack(expected), atol=1e-4)
+        owner = next(worker for worker in pool._idle.queue if worker is not other)
+        assert owner.jobs == len(frames)
+        assert other.jobs == 1
+    finally:
+        pool.close()
+
+
+def test_video_session_fails_when_its_worker_dies(pool, frame):
+    from inference_workers import WorkerCrashed
+
+    assert pool.ensure_ready()
+    worker = pool._idle.queue[0]
+    with pool.video() as video:
+        assert pool._idle.qsize() == 0  # Held for the whole session
+        video.infer(frame, 0)
+        worker.process.kill()
+        worker.process.join(5)
+        with pytest.raises(WorkerCrashed):
+            video.infer(frame, 33)
+        with pytest.raises(WorkerCrashed):
+            video.infer(frame, 66)
+    pool.infer(frame)  # The replacement serves
+    assert pool._idle.queue[0] is not worker
+
+
+def test_analyze_video_in_process_mode(api, pool, person, tmp_path, monkeypatch):
+    import cv2
+
+    import main
+    from conftest import write_video
+    from pose_pool import PosePool
+
+    monkeypatch.setattr(main, "pose_pool", PosePool(size=1, factory=lambda: pool if pool.ensure_ready() else None))
+    frames = [cv2.cvtColor(frame, cv2.COLOR_RGB2BGR) for frame in clip(person, 4)]
+    path = write_video(str(tmp_path / "clip.mp4"), frames)
+    with open(path, "rb") as f:
+        response = api.post("/analyze-video", files={"file": ("clip.mp4", f, "video/mp4")},
+                            data={"metric": "knee", "max_skip": "0"})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["summary"]["frames"] == 4
+    assert all(f["angle"] is not None for f in body["frames"])
+    wait_for_idle(pool, 1)
+    assert pool._idle.queue[0].jobs == body["summary"]["keyframes"]
@@ -0,0 +1,227 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from conftest import jpeg
+from job_queue import DONE, FAILED, QUEUED, RUNNING, JobQueue, JobScheduler
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "jobs.sqlite3")
+
+
+def test_enqueue_claim_finish(db_path):
+    queue = JobQueue(db_path)
+    first = queue.enqueue({"side": "left"}, {"knee": b"knee-bytes"})
+    second = queue.enqueue({"side": "right"}, {"ankle": b"ankle-bytes"})
+    assert queue.get(second)["queue_position"] == 1
+
+    job = queue.claim_next()
+    assert job == {"id": first, "params": {"side": "left"}, "files": {"knee": b"knee-bytes"}}
+    assert queue.get(first)["status"] == RUNNING
+    assert queue.get(second)["queue_position"] == 0
+
+    assert queue.finish(first, result=b"{}")
+    assert queue.get(first)["status"] == DONE
+    assert queue.get(first)["result"] == b"{}"
+    assert queue.counts() == {DONE: 1, QUEUED: 1}
+
+
+def test_jobs_survive_restart(db_path):
+    job_id = JobQueue(db_path).enqueue({}, {"knee": b"x"})
+    assert JobQueue(db_path).claim_next()["id"] == job_id
+
+
+def test_recover_leaves_live_leases_alone(db_path):
+    # Two workers sharing the database: the second one starting up must not steal running jobs
+    first = JobQueue(db_path, lease_seconds=60)
+    job_id = first.enqueue({}, {"knee": b"x"})
+    first.claim_next()
+    second = JobQueue(db_path, lease_seconds=60)
+    assert second.recover() == 0
+    assert second.claim_next() is None
+    assert second.get(job_id)["status"] == RUNNING
+
+
+def test_recover_expired_lease(db_path):
+    crashed = JobQueue(db_path, lease_seconds=0.05)
+    job_id = crashed.enqueue({}, {"knee": b"x"})
+    crashed.claim_next()
+    time.sleep(0.1)
+
+    survivor = JobQueue(db_path)
+    assert survivor.recover() == 1
+    job = survivor.claim_next()
+    assert job["id"] == job_id and job["files"] == {"knee": b"x"}
+    # The original owner coming back cannot overwrite the new run
+    assert not crashed.finish(job_id, result=b"stale")
+    assert survivor.finish(job_id, result=b"fresh")
+    assert survivor.get(job_id)["result"] == b"fresh"
+
+
+def test_renew_extends_lease(db_path):
+    owner = JobQueue(db_path, lease_seconds=0.2)
+    job_id = owner.enqueue({}, {"knee": b"x"})
+    owner.claim_next()
+    time.sleep(0.12)
+    owner.renew([job_id])
+    time.sleep(0.12)
+    assert JobQueue(db_path).recover() == 0
+
+
+def test_migrates_old_schema(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.executescript("""
+        CREATE TABLE jobs (id TEXT PRIMARY KEY, status TEXT NOT NULL, params TEXT NOT NULL, result BLOB,
+                           error TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL);
+        INSERT INTO jobs VALUES ('old', 'running', '{}', NULL, NULL, 0, 0);
+    """)
+    conn.close()
+    queue = JobQueue(db_path)
+    assert queue.recover() == 1  # Rows without a lease are from before leases existed
+    assert queue.get("old")["status"] == QUEUED
+
+
+def test_purge(db_path):
+    queue = JobQueue(db_path)
+    job_id = queue.enqueue({}, {"knee": b"x"})
+    queue.claim_next()
+    queue.finish(job_id, error="boom")
+    assert queue.purge(3600) == 0
+    assert queue.purge(-1) == 1
+    assert queue.get(job_id) is None
+
+
+def scheduler(queue, runner, **kwargs):
+    options = {"concurrency": 1, "poll_seconds": 0.01, "retention_seconds": 3600}
+    options.update(kwargs)
+    return JobScheduler(queue, runner, **options)
+
+
+def test_scheduler_runs_and_wakes_waiters(db_path):
+    async def runner(params, files):
+        return b'{"ok": true}'
+
+    async def scenario():
+        jobs = scheduler(JobQueue(db_path), runner)
+        jobs.start()
+        job_id = jobs.queue.enqueue({}, {"knee": b"x"})
+        jobs.notify()
+        await asyncio.gather(jobs.wait_for(job_id, 5), jobs.wait_for(job_id, 5))
+        await jobs.stop()
+        return jobs, job_id
+
+    jobs, job_id = asyncio.run(scenario())
+    assert jobs.queue.get(job_id)["status"] == DONE
+    assert jobs._waiters == {}
+
+
+def test_failed_job_records_error(db_path, caplog):
+    async def runner(params, files):
+        raise RuntimeError("no pose")
+
+    async def scenario():
+        jobs = scheduler(JobQueue(db_path), runner)
+        jobs.start()
+        job_id = jobs.queue.enqueue({}, {"knee": b"x"})
+        jobs.notify()
+        await jobs.wait_for(job_id, 5)
+        await jobs.stop()
+        return job_id, jobs.queue.get(job_id)
+
+    job_id, job = asyncio.run(scenario())
+    assert job["status"] == FAILED and job["error"] == "no pose"
+    # Logged with %-style arguments, formatted only if the line is written
+    record = next(r for r in caplog.records if r.msg == "Job %s failed: %s")
+    assert record.args[0] == job_id and isinstance(record.args[1], RuntimeError)
+
+
+def test_timed_out_waiters_are_removed(db_path):
+    async def runner(params, files):
+        await asyncio.sleep(10)
+
+    async def scenario():
+        queue = JobQueue(db_path)
+        jobs = scheduler(queue, runner)
+        job_id = queue.enqueue({}, {"knee": b"x"})
+        await asyncio.gather(jobs.wait_for(job_id, 0.01), jobs.wait_for(job_id, 0.02))
+        return jobs
+
+    assert asyncio.run(scenario())._waiters == {}
+
+
+def test_waiter_sees_job_finished_by_another_process(db_path):
+    async def runner(params, files):
+        return b'{"ok": true}'
+
+    async def scenario():
+        # Two server processes sharing JOB_DB_PATH: one runs the job, the other answers the long poll
+        worker = scheduler(JobQueue(db_path), runner, poll_seconds=0.05)
+        server = scheduler(JobQueue(db_path), runner, poll_seconds=0.05)
+        job_id = server.queue.enqueue({}, {"knee": b"x"})
+        waiting = asyncio.create_task(server.wait_for(job_id, 30))
+        worker.start()
+        started = time.monotonic()
+        await waiting
+        elapsed = time.monotonic() - started
+        await worker.stop()
+        return server.queue.status(job_id), elapsed
+
+    status, elapsed = asyncio.run(scenario())
+    assert status == DONE
+    assert elapsed < 5  # Not the whole wait
+
+
+def test_status(db_path):
+    queue = JobQueue(db_path)
+    job_id = queue.enqueue({}, {"knee": b"x"})
+    assert queue.status(job_id) == QUEUED
+    assert queue.status("missing") is None
+
+
+def test_scheduler_survives_database_errors(db_path, monkeypatch):
+    queue = JobQueue(db_path)
+    claim_next = queue.claim_next
+    failures = []
+
+    def flaky_claim_next():
+        if len(failures) < 3:
+            failures.append(1)
+            raise sqlite3.OperationalError("database is locked")
+        return claim_next()
+
+    monkeypatch.setattr(queue, "claim_next", flaky_claim_next)
+
+    async def runner(params, files):
+        return b"{}"
+
+    async def scenario():
+        jobs = scheduler(queue, runner)
+        jobs.start()
+        job_id = queue.enqueue({}, {"knee": b"x"})
+        await jobs.wait_for(job_id, 5)
+        await jobs.stop()
+        return queue.get(job_id)
+
+    assert asyncio.run(scenario())["status"] == DONE
+    assert len(failures) == 3
+
+
+def test_jobs_api(api, frame, monkeypatch):
+    import main
+
+    jobs = scheduler(JobQueue(":memory:"), main.run_analysis_job)
+    monkeypatch.setattr(main, "job_scheduler", jobs)
+    api.portal.call(jobs.start)  # On the app's event loop
+
+    response = api.post("/jobs", files={"knee": ("knee.jpg", jpeg(frame), "image/jpeg")}, data={"render": "none"})
+    assert response.status_code == 202
+    job_id = response.json()["job_id"]
+    body = api.get(f"/jobs/{job_id}", params={"wait": 5}).json()
+    assert body["status"] == DONE
+    assert body["results"]["knee"]["angle"] == pytest.approx(180.0, abs=1.0)
+    api.portal.call(jobs.stop)
+    assert api.get("/jobs/missing").status_code == 404
@@ -0,0 +1,106 @@
+import numpy as np
+import pytest
+
+from conftest import standing_landmarks, write_video
+from keyframes import KeyframeScheduler, KeyframeSettings, LandmarkTracker
+
+
+def test_tracker_follows_constant_motion():
+    tracker = LandmarkTracker(process_noise=1e-4, measurement_noise=1e-5)
+    landmarks = standing_landmarks()
+    for step in range(10):
+        moved = landmarks.copy()
+        moved[:, 0] += 0.01 * step
+        if tracker.active:
+            tracker.predict()
+        tracker.update(moved)
+    predicted = tracker.predict()
+    assert np.allclose(predicted[:, 0], landmarks[:, 0] + 0.1, atol=2e-3)
+    assert np.array_equal(predicted[:, 3], landmarks[:, 3])
+    assert tracker.speed() == pytest.approx(0.01, abs=1e-3)
+
+
+def test_speed_ignores_occluded_landmarks():
+    tracker = LandmarkTracker(1e-4, 1e-5)
+    landmarks = standing_landmarks()
+    tracker.update(landmarks)
+    tracker.velocity[:, 0] = 0.001
+    tracker.velocity[5, 0] = 0.5
+    tracker.visibility[5] = 0.1
+    assert tracker.speed() == pytest.approx(0.001)
+
+
+class Counter:
+    def __init__(self, landmarks):
+        self.landmarks = landmarks
+        self.calls = 0
+
+    def __call__(self, frame):
+        self.calls += 1
+        return self.landmarks
+
+
+def test_still_frames_run_inference_every_max_skip(frame):
+    infer = Counter(standing_landmarks())
+    scheduler = KeyframeScheduler(infer, KeyframeSettings(max_skip=4))
+    reasons = [scheduler.process(frame)[2] for _ in range(10)]
+    assert reasons == ["no_track", "", "", "", "", "max_skip", "", "", "", ""]
+    assert infer.calls == scheduler.keyframes == 2
+    assert scheduler.inference_rate == pytest.approx(0.2)
+
+
+def test_frame_change_triggers_keyframe(frame):
+    scheduler = KeyframeScheduler(Counter(standing_landmarks()), KeyframeSettings(max_skip=10))
+    scheduler.process(frame)
+    landmarks, keyframe, reason = scheduler.process(255 - frame)
+    assert (keyframe, reason) == (True, "frame_diff")
+
+
+def test_motion_triggers_keyframe(frame):
+    infer = Counter(standing_landmarks())
+    scheduler = KeyframeScheduler(infer, KeyframeSettings(max_skip=10, motion_threshold=0.02))
+    scheduler.process(frame)
+    moving = standing_landmarks()
+    moving[:, 0] += 0.05
+    infer.landmarks = moving
+    scheduler._since_key = 10  # Force the next keyframe, which measures the motion
+    scheduler.process(frame)
+    assert scheduler.tracker.speed() > 0
+    reasons = [scheduler.process(frame)[2] for _ in range(3)]
+    assert "motion" in reasons
+
+
+def test_lost_pose_keeps_searching(frame):
+    infer = Counter(None)
+    scheduler = KeyframeScheduler(infer, KeyframeSettings(max_skip=10))
+    results = [scheduler.process(frame) for _ in range(3)]
+    assert [keyframe for _, keyframe, _ in results] == [True, True, True]
+    assert all(landmarks is None for landmarks, _, _ in results)
+
+
+def test_analyze_video(api, frame, tmp_path):
+    frames = [frame] * 12
+    path = write_video(str(tmp_path / "still.mp4"), frames)
+    with open(path, "rb") as f:
+        response = api.post("/analyze-video", files={"file": ("still.mp4", f, "video/mp4")},
+                            data={"metric": "knee", "side": "right", "max_skip": "5"})
+    assert response.status_code == 200
+    body = response.json()
+    summary = body["summary"]
+    assert summary["frames"] == 12
+    assert summary["keyframes"] == api.backend.calls == 2
+    assert [f["index"] for f in body["frames"] if f["keyframe"]] == [0, 6]
+    assert all(f["angle"] == pytest.approx(180.0, abs=1.0) for f in body["frames"])
+
+
+@pytest.mark.parametrize("data", [{"metric": "elbow"}, {"metric": "knee", "side": "up"},
+                                  {"metric": "knee", "max_skip": "-1"}])
+def test_analyze_video_validation(api, data):
+    response = api.post("/analyze-video", files={"file": ("v.mp4", b"not a video", "video/mp4")}, data=data)
+    assert response.status_code == 400
+
+
+def test_unreadable_video(api):
+    response = api.post("/analyze-video", files={"file": ("v.mp4", b"not a video", "video/mp4")},
+                        data={"metric": "knee"})
+    assert response.status_code == 400
@@ -0,0 +1,117 @@
+import numpy as np
+import pytest
+
+from conftest import standing_landmarks, write_video
+from landmark_codec import (FRAME_DELTA8, FRAME_DELTA16, FRAME_KEY, FRAME_NONE, SCALE, LandmarkArchive,
+                            LandmarkArchiveWriter, LandmarkEncoder, decode_record, read_all)
+
+
+def sequence(count=120, seed=0):
+    """Slow drift with occasional jumps and lost poses, values up to one frame outside the image."""
+    rng = np.random.default_rng(seed)
+    landmarks = standing_landmarks()
+    frames = []
+    for n in range(count):
+        landmarks = landmarks.copy()
+        landmarks[:, :3] += rng.normal(0, 0.001, (33, 3))
+        if n % 17 == 0:
+            landmarks[:, :2] += rng.uniform(-0.5, 0.5, 2)  # Delta beyond int8
+        landmarks[:, :3] = np.clip(landmarks[:, :3], -1.9, 1.9)
+        landmarks[:, 3] = rng.uniform(0, 1, 33)
+        frames.append(None if n % 29 == 5 else landmarks.astype(np.float32))
+    return frames
+
+
+def assert_close(decoded, original):
+    assert (decoded is None) == (original is None)
+    if original is not None:
+        assert np.abs(decoded[:, :3] - original[:, :3]).max() <= 0.5 / SCALE + 1e-7
+        assert np.abs(decoded[:, 3] - original[:, 3]).max() <= 0.5 / 255 + 1e-6
+
+
+def test_encoder_round_trip():
+    encoder = LandmarkEncoder(keyframe_interval=10)
+    coords = None
+    kinds = []
+    for original in sequence():
+        record = encoder.encode(original)
+        kinds.append(record[0])
+        decoded, coords = decode_record(record, coords)
+        assert_close(decoded, original)
+    assert {FRAME_NONE, FRAME_KEY, FRAME_DELTA8, FRAME_DELTA16} <= set(kinds)
+
+
+def test_record_sizes(landmarks):
+    encoder = LandmarkEncoder()
+    assert len(encoder.encode(landmarks)) == 1 + 33 * 3 * 2 + 33
+    assert len(encoder.encode(landmarks)) == 1 + 33 * 3 + 33  # Unchanged: int8 deltas
+    assert encoder.encode(None) == bytes([FRAME_NONE])
+
+
+def test_keyframe_interval(landmarks):
+    encoder = LandmarkEncoder(keyframe_interval=4)
+    kinds = [encoder.encode(landmarks)[0] for _ in range(9)]
+    assert [n for n, kind in enumerate(kinds) if kind == FRAME_KEY] == [0, 4, 8]
+
+
+def test_values_outside_range_are_clipped(landmarks):
+    far = landmarks.copy()
+    far[0, :3] = (5.0, -5.0, 0.0)
+    decoded, _ = decode_record(LandmarkEncoder().encode(far), None)
+    assert decoded[0, 0] == pytest.approx(32767 / SCALE)
+    assert decoded[0, 1] == pytest.approx(-32767 / SCALE)
+
+
+def test_archive_random_access(tmp_path):
+    path = str(tmp_path / "video.lmk")
+    frames = sequence()
+    with LandmarkArchiveWriter(path, keyframe_interval=8) as writer:
+        for landmarks in frames:
+            writer.append(landmarks)
+    with LandmarkArchive(path) as archive:
+        assert len(archive) == len(frames)
+        for index in (0, 1, 7, 8, 9, 63, len(frames) - 1):
+            assert_close(archive[index], frames[index])
+        assert_close(archive[-1], frames[-1])
+        for decoded, original in zip(archive.frames(30, 50), frames[30:50]):
+            assert_close(decoded, original)
+        with pytest.raises(IndexError):
+            archive[len(frames)]
+
+
+def test_archive_append_reopens_with_keyframe(tmp_path, landmarks):
+    path = str(tmp_path / "video.lmk")
+    with LandmarkArchiveWriter(path) as writer:
+        writer.append(landmarks)
+    with LandmarkArchiveWriter(path) as writer:
+        assert writer.frames == 1
+        assert writer.append(landmarks) == 1
+    decoded = read_all(path)
+    assert len(decoded) == 2
+    assert_close(decoded[1], landmarks)
+
+
+def test_empty_archive_and_bad_file(tmp_path):
+    path = str(tmp_path / "empty.lmk")
+    LandmarkArchiveWriter(path).close()
+    assert read_all(path) == []
+    bad = tmp_path / "bad.lmk"
+    bad.write_bytes(b"JUNK" + bytes(16))
+    (tmp_path / "bad.lmk.idx").write_bytes(b"")
+    with pytest.raises(ValueError):
+        LandmarkArchive(str(bad))
+
+
+def test_video_landmarks_api(api, frame, tmp_path):
+    path = write_video(str(tmp_path / "clip.mp4"), [frame] * 5)
+    with open(path, "rb") as f:
+        video_id = api.post("/analyze-video", files={"file": ("clip.mp4", f, "video/mp4")},
+                            data={"metric": "knee"}).json()["video_id"]
+    body = api.get(f"/videos/{video_id}/landmarks", params={"start": 1, "count": 2}).json()
+    assert body["total_frames"] == 5
+    assert [f["index"] for f in body["frames"]] == [1, 2]
+    assert np.allclose(body["frames"][0]["landmarks"], standing_landmarks(), atol=0.5 / 255 + 1e-5)
+
+    assert api.get(f"/videos/{video_id}/landmarks", params={"count": 0}).status_code == 400
+    assert api.get("/videos/../../etc/landmarks").status_code == 404
+    assert api.get(f"/videos/{'0' * 32}/landmarks").status_code == 404
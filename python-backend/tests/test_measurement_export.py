@@ -0,0 +1,121 @@
+import io
+
+import numpy as np
+import pytest
+
+from conftest import standing_landmarks, write_video
+from measurement_store import Measurement, MeasurementStore
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet  # noqa: E402
+
+import measurement_export  # noqa: E402
+
+
+@pytest.fixture
+def store():
+    store = MeasurementStore(":memory:", flush_seconds=0.01)
+    store.start()
+    for n in range(5):
+        store.record(Measurement("p1" if n < 4 else "p2", "knee" if n % 2 else "ankle", "right", angle=float(n),
+                                 confidence=0.5, landmarks=standing_landmarks() if n != 2 else None,
+                                 created_at=1000.0 + n))
+    store.stop()
+    return store
+
+
+def read_table(data: bytes, format: str):
+    if format == "parquet":
+        return pa.parquet.read_table(io.BytesIO(data))
+    return pa.ipc.open_stream(data).read_all()
+
+
+def test_parse_columns():
+    assert measurement_export.parse_columns(" angle, metric ,") == ["angle", "metric"]
+    for value in ("angle,password", "", ","):
+        with pytest.raises(ValueError):
+            measurement_export.parse_columns(value)
+
+
+@pytest.mark.parametrize("format", sorted(measurement_export.FORMATS))
+def test_measurements_round_trip(store, format):
+    columns = ["id", "metric", "angle", "landmarks", "created_at"]
+    batches = measurement_export.measurement_batches(store, columns, batch_size=2, patient_id="p1")
+    data = b"".join(measurement_export.stream(batches, measurement_export.schema(columns), format))
+    table = read_table(data, format)
+    assert table.column_names == columns
+    assert table.num_rows == 4
+    assert table.column("angle").to_pylist() == [0.0, 1.0, 2.0, 3.0]
+    assert table.column("metric").to_pylist() == ["ankle", "knee", "ankle", "knee"]
+    assert pa.types.is_dictionary(table.schema.field("metric").type)
+    assert table.column("created_at").to_pylist()[1].timestamp() == 1001.0
+
+    landmarks = table.column("landmarks").to_pylist()
+    assert landmarks[2] is None
+    assert len(landmarks[0]) == measurement_export.LANDMARK_VALUES
+    assert np.allclose(np.array(landmarks[0]).reshape(33, 4), standing_landmarks(), atol=1e-3)
+
+
+def test_parquet_row_groups_follow_batch_size(store, tmp_path):
+    path = str(tmp_path / "m.parquet")
+    columns = list(measurement_export.DEFAULT_COLUMNS)
+    rows = measurement_export.write(measurement_export.measurement_batches(store, columns, batch_size=2),
+                                    measurement_export.schema(columns), "parquet", path)
+    assert rows == 5
+    assert pa.parquet.ParquetFile(path).metadata.num_row_groups == 3
+
+
+def test_unknown_format(store):
+    columns = ["angle"]
+    with pytest.raises(ValueError):
+        list(measurement_export.stream(measurement_export.measurement_batches(store, columns),
+                                       measurement_export.schema(columns), "csv"))
+
+
+def test_cli(tmp_path, capsys):
+    db = str(tmp_path / "m.sqlite3")
+    disk = MeasurementStore(db, flush_seconds=0.01)
+    disk.start()
+    disk.record(Measurement("p1", "knee", "left", angle=90.0))
+    disk.stop()
+    output = str(tmp_path / "m.arrows")
+    assert measurement_export.main(["--format", "arrow", "measurements", db, output, "--columns", "side,angle"]) == 0
+    table = pa.ipc.open_stream(pa.OSFile(output)).read_all()
+    assert table.to_pydict() == {"side": ["left"], "angle": [90.0]}
+    assert measurement_export.main(["measurements", db, output, "--columns", "nope"]) == 1
+    assert "Export failed" in capsys.readouterr().err
+
+
+@pytest.mark.parametrize("format", sorted(measurement_export.FORMATS))
+def test_export_api(api, store, monkeypatch, format):
+    import main
+
+    monkeypatch.setattr(main, "measurement_store", store)
+    response = api.get("/exports/measurements", params={"format": format, "metric": "knee", "columns": "id,angle"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == measurement_export.FORMATS[format]
+    assert "attachment" in response.headers["content-disposition"]
+    assert read_table(response.content, format).to_pydict() == {"id": [2, 4], "angle": [1.0, 3.0]}
+
+
+def test_export_api_validation(api):
+    assert api.get("/exports/measurements", params={"format": "csv"}).status_code == 400
+    assert api.get("/exports/measurements", params={"metric": "elbow"}).status_code == 400
+    assert api.get("/exports/measurements", params={"columns": "password"}).status_code == 400
+
+
+def test_video_export_api(api, frame, tmp_path):
+    path = write_video(str(tmp_path / "clip.mp4"), [frame] * 3)
+    with open(path, "rb") as f:
+        video_id = api.post("/analyze-video", files={"file": ("clip.mp4", f, "video/mp4")},
+                            data={"metric": "knee"}).json()["video_id"]
+    response = api.get(f"/videos/{video_id}/export", params={"format": "parquet"})
+    assert response.status_code == 200
+    table = read_table(response.content, "parquet")
+    assert table.column("frame").to_pylist() == [0, 1, 2]
+    assert np.allclose(np.array(table.column("landmarks").to_pylist()[0]).reshape(33, 4), standing_landmarks(),
+                       atol=0.5 / 255 + 1e-5)
+
+    assert api.get(f"/videos/{video_id}/export", params={"format": "csv"}).status_code == 400
+    assert api.get(f"/videos/{'0' * 32}/export").status_code == 404
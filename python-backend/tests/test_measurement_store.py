@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from conftest import jpeg
+from measurement_store import (Measurement, MeasurementStore, decode_cursor, encode_cursor, pack_landmarks,
+                               unpack_landmarks)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MeasurementStore(str(tmp_path / "measurements.sqlite3"), flush_seconds=0.01)
+    yield store
+    store.stop()
+
+
+def fill(store, count, patient_id="p1", metric="knee"):
+    store.start()
+    for n in range(count):
+        store.record(Measurement(patient_id, metric, "right", angle=float(n), confidence=0.9, created_at=1000.0 + n))
+    store.stop()  # Flushes the queue
+
+
+def test_landmarks_pack_to_float16(landmarks):
+    data = pack_landmarks(landmarks)
+    assert len(data) == 33 * 4 * 2
+    assert np.allclose(unpack_landmarks(data), landmarks, atol=1e-3)
+    assert pack_landmarks(None) is None and unpack_landmarks(None) is None
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor(1234.5678, 42)) == (1234.5678, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+def test_history_pages_newest_first(store):
+    fill(store, 7)
+    fill(store, 2, patient_id="p2")
+    angles, cursor = [], None
+    while True:
+        page = store.history("p1", limit=3, cursor=cursor)
+        angles += [item["angle"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert angles == [6.0, 5.0, 4.0, 3.0, 2.0, 1.0, 0.0]
+
+
+def test_history_filters(store):
+    fill(store, 4)
+    fill(store, 2, metric="ankle")
+    assert len(store.history("p1", metric="ankle")["items"]) == 2
+    items = store.history("p1", metric="knee", since=1001.0, until=1003.0)["items"]
+    assert [item["angle"] for item in items] == [2.0, 1.0]
+    assert store.history("p1", side="left")["items"] == []
+
+
+def test_history_landmarks(store, landmarks):
+    store.start()
+    store.record(Measurement("p1", "knee", "right", angle=180.0, landmarks=landmarks))
+    store.stop()
+    item = store.history("p1", include_landmarks=True)["items"][0]
+    assert np.allclose(item["landmarks"], landmarks, atol=1e-3)
+    assert "landmarks" not in store.history("p1")["items"][0]
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    store = MeasurementStore(str(tmp_path / "m.sqlite3"), max_queue=2)
+    results = [store.record(Measurement("p1", "knee", "right", angle=1.0)) for _ in range(3)]
+    assert results == [True, True, False]
+
+
+def test_iter_rows(store):
+    fill(store, 5)
+    chunks = list(store.iter_rows(["angle", "created_at"], patient_id="p1", batch_size=2))
+    assert [len(chunk) for chunk in chunks] == [2, 2, 1]
+    assert [row[0] for chunk in chunks for row in chunk] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    with pytest.raises(ValueError):
+        list(store.iter_rows(["angle", "password"]))
+
+
+def test_memory_database():
+    store = MeasurementStore(":memory:", flush_seconds=0.01)
+    fill(store, 3)
+    assert len(store.history("p1")["items"]) == 3
+
+
+def test_api_records_patient_measurements(api, frame, monkeypatch):
+    import main
+
+    store = MeasurementStore(":memory:", flush_seconds=0.01)
+    monkeypatch.setattr(main, "measurement_store", store)
+    store.start()
+    body = {"knee": ("knee.jpg", jpeg(frame), "image/jpeg")}
+    api.post("/analyze-metrics", files=body, data={"render": "none", "patient_id": "p1"})
+    api.post("/analyze-metrics", files=body, data={"render": "none"})  # No patient, not recorded
+    store.stop()
+
+    response = api.get("/patients/p1/measurements", params={"include_landmarks": "true"})
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert len(items) == 1
+    assert items[0]["metric"] == "knee" and items[0]["angle"] == pytest.approx(180.0, abs=1.0)
+    assert len(items[0]["landmarks"]) == 33
+
+    assert api.get("/patients/p1/measurements", params={"cursor": "bad"}).status_code == 400
+    assert api.get("/patients/p1/measurements", params={"limit": 0}).status_code == 400
+    assert api.get("/patients/p1/measurements", params={"metric": "elbow"}).status_code == 400
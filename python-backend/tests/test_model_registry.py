@@ -0,0 +1,118 @@
+import json
+import os
+
+import pytest
+
+import model_registry
+from model_registry import (MANIFEST, ModelError, ModelRegistry, mediapipe_model_path, pose_landmarker_model,
+                            pose_models, sha256_file, write_manifest)
+
+
+@pytest.fixture
+def model_dir(tmp_path):
+    (tmp_path / "pose_detection.tflite").write_bytes(b"detector" * 100)
+    (tmp_path / "pose_landmark_full.tflite").write_bytes(b"landmarks" * 100)
+    (tmp_path / "custom.tflite").write_bytes(b"custom")
+    (tmp_path / "notes.txt").write_text("not a model")
+    write_manifest(str(tmp_path))
+    return tmp_path
+
+
+def test_model_names():
+    assert pose_models(0) == ["pose_detection", "pose_landmark_lite"]
+    assert pose_landmarker_model(2) == "pose_landmarker_heavy"
+    with pytest.raises(ValueError):
+        pose_models(3)
+    with pytest.raises(ValueError):
+        pose_landmarker_model(-1)
+
+
+def test_tasks_bundles_do_not_come_with_mediapipe():
+    with pytest.raises(ModelError):
+        mediapipe_model_path("pose_landmarker_full")
+
+
+def test_manifest_pins_checksums(model_dir):
+    manifest = json.loads((model_dir / MANIFEST).read_text())["models"]
+    assert sorted(manifest) == ["custom", "pose_detection", "pose_landmark_full"]
+    entry = manifest["pose_landmark_full"]
+    assert entry == {"file": "pose_landmark_full.tflite", "bytes": 900,
+                     "sha256": sha256_file(str(model_dir / "pose_landmark_full.tflite"))}
+    registry = ModelRegistry(str(model_dir))
+    assert registry.sha256("pose_landmark_full") == entry["sha256"]
+    assert registry.path("custom") == str(model_dir / "custom.tflite")
+
+
+def test_load_maps_once(model_dir):
+    registry = ModelRegistry(str(model_dir))
+    mapped = registry.load("pose_detection")
+    assert mapped[:8] == b"detector"
+    assert registry.load("pose_detection") is mapped
+    registry.verify()
+    rows = {row["model"]: row for row in registry.report()}
+    assert rows["pose_detection"]["verified"] and rows["pose_detection"]["bytes"] == 800
+    registry.close()
+
+
+def test_verify_lists_every_problem(model_dir):
+    (model_dir / "pose_landmark_full.tflite").write_bytes(b"tampered")
+    os.remove(model_dir / "custom.tflite")
+    registry = ModelRegistry(str(model_dir))
+    with pytest.raises(ModelError) as error:
+        registry.verify()
+    message = str(error.value)
+    assert "Checksum mismatch for model pose_landmark_full" in message
+    assert "custom" in message
+    registry.verify(["pose_detection"])  # The intact one still loads
+    with pytest.raises(ModelError):
+        registry.path("pose_landmark_heavy")
+
+
+def test_missing_manifest(tmp_path):
+    with pytest.raises(ModelError):
+        ModelRegistry(str(tmp_path)).verify()
+
+
+def test_install_mediapipe_links_verified_models(model_dir, tmp_path, monkeypatch):
+    package = tmp_path / "mediapipe"
+    monkeypatch.setattr(model_registry, "_mediapipe_root", lambda: str(package))
+    target = package / "modules/pose_landmark/pose_landmark_full.tflite"
+    target.parent.mkdir(parents=True)
+    target.write_bytes(b"stale")
+    ModelRegistry(str(model_dir)).install_mediapipe(["pose_landmark_full"])
+    assert target.read_bytes() == (model_dir / "pose_landmark_full.tflite").read_bytes()
+
+
+def test_cli(model_dir, capsys):
+    assert model_registry.main(["verify", str(model_dir)]) == 0
+    assert "pose_landmark_full" in capsys.readouterr().out
+    (model_dir / "pose_detection.tflite").write_bytes(b"changed")
+    assert model_registry.main(["verify", str(model_dir)]) == 1
+    assert model_registry.main(["manifest", str(model_dir)]) == 0
+
+
+def test_cache_keys_follow_the_model():
+    import main
+
+    tags = {
+        main.pose_model_tag("mediapipe", 1, "a" * 64),
+        main.pose_model_tag("tflite", 1, "a" * 64),
+        main.pose_model_tag("mediapipe", 2, "a" * 64),
+        main.pose_model_tag("mediapipe", 1, "b" * 64),
+    }
+    assert len(tags) == 4
+    assert main.landmark_model_name("mediapipe", 2) == "pose_landmark_heavy"
+    assert main.landmark_model_name("tasks", 0) == "pose_landmarker_lite"
+
+
+def test_cache_keys_use_the_model_tag(model_dir, monkeypatch):
+    import main
+
+    monkeypatch.setattr(main, "model_registry", ModelRegistry(str(model_dir)))
+    checksum = main.model_checksum("pose_landmark_full")
+    assert checksum == sha256_file(str(model_dir / "pose_landmark_full.tflite"))
+    monkeypatch.setattr(main, "POSE_MODEL_TAG", main.pose_model_tag("mediapipe", 1, checksum))
+    before = main.landmarks_cache_key("hash"), main.result_cache_key("hash", "knee", "right", "none", None)
+    monkeypatch.setattr(main, "POSE_MODEL_TAG", main.pose_model_tag("mediapipe", 1, "0" * 64))
+    after = main.landmarks_cache_key("hash"), main.result_cache_key("hash", "knee", "right", "none", None)
+    assert before[0] != after[0] and before[1] != after[1]
@@ -0,0 +1,145 @@
+import cv2
+import numpy as np
+import pytest
+
+from conftest import jpeg, standing_landmarks
+from phash import PerceptualIndex, dhash, joint_patches, patch_difference
+from renderer import METRIC_CHAIN_INDICES
+
+HEIGHT, WIDTH = 480, 360
+KNEE = METRIC_CHAIN_INDICES[("knee", "right")]
+
+
+def scene(knee_shift_px: int = 0):
+    """Frame with a figure drawn along its landmarks; knee_shift_px moves the right knee sideways."""
+    rng = np.random.default_rng(1)
+    yy, xx = np.mgrid[0:HEIGHT, 0:WIDTH]
+    img = np.dstack([80 + 60 * xx / WIDTH, 90 + 50 * yy / HEIGHT, np.full(xx.shape, 120.0)])
+    img = np.clip(img + rng.normal(0, 6, img.shape), 0, 255).astype(np.uint8)
+    landmarks = standing_landmarks()
+    landmarks[26, 0] += knee_shift_px / WIDTH
+    points = (landmarks[:, :2] * [WIDTH, HEIGHT]).astype(int)
+    cv2.fillConvexPoly(img, points[[11, 12, 24, 23]], (60, 50, 200))
+    cv2.circle(img, tuple(points[0]), 25, (60, 50, 200), -1)
+    for a, b in [(11, 13), (13, 15), (12, 14), (14, 16), (23, 25), (24, 26), (25, 27), (26, 28)]:
+        cv2.line(img, tuple(points[a]), tuple(points[b]), (60, 50, 200), 18)
+    return img, landmarks
+
+
+def reencode(img, quality):
+    return cv2.imdecode(np.frombuffer(jpeg(img, quality), np.uint8), cv2.IMREAD_COLOR)
+
+
+def distance(a, b):
+    return bin(dhash(a) ^ dhash(b)).count("1")
+
+
+def test_dhash_survives_reencoding_and_rescaling():
+    img, _ = scene()
+    assert distance(img, reencode(img, 80)) <= 4
+    smaller = cv2.resize(img, (WIDTH * 3 // 4, HEIGHT * 3 // 4), interpolation=cv2.INTER_AREA)
+    assert distance(img, smaller) <= 4
+    assert distance(img, np.ascontiguousarray(img[:, ::-1])) > 4
+
+
+def test_joint_patches_catch_what_the_hash_misses():
+    # A knee moved by 20 px bends the leg by ~30 degrees but barely changes the hash
+    img, landmarks = scene()
+    moved, _ = scene(knee_shift_px=20)
+    assert distance(img, moved) <= 4
+    patches = joint_patches(img, landmarks, KNEE)
+    assert patches.shape == (3, 17, 17)
+    assert patch_difference(patches, joint_patches(moved, landmarks, KNEE)) > 12
+    assert patch_difference(patches, joint_patches(reencode(img, 80), landmarks, KNEE)) < 3
+
+
+def test_index_scoped_by_session_metric_and_side():
+    index = PerceptualIndex(max_distance=4, max_entries=16)
+    patches = np.zeros((3, 17, 17), np.float32)
+    index.add("session-a", "knee", "right", 0b1011, (480, 360), "content", patches)
+    content_hash, bits, found = index.find("session-a", "knee", "right", 0b0011, (480, 360))
+    assert (content_hash, bits) == ("content", 1)
+    assert found is patches
+    assert index.find("session-b", "knee", "right", 0b1011, (480, 360)) is None
+    assert index.find("session-a", "ankle", "right", 0b1011, (480, 360)) is None
+    assert index.find("session-a", "knee", "left", 0b1011, (480, 360)) is None
+    assert index.find("session-a", "knee", "right", 0b1011, (360, 480)) is None  # Aspect ratio differs
+    assert index.find("session-a", "knee", "right", 0xFFFF, (480, 360)) is None
+
+
+def test_index_eviction_and_discard():
+    index = PerceptualIndex(max_distance=0, max_entries=2)
+    patches = np.zeros((3, 17, 17), np.float32)
+    for n in range(3):
+        index.add("session-a", "knee", "right", n, (480, 360), f"content-{n}", patches)
+    assert index.find("session-a", "knee", "right", 0, (480, 360)) is None
+    assert index.find("session-a", "knee", "right", 2, (480, 360))[0] == "content-2"
+    index.add("session-b", "knee", "right", 7, (480, 360), "other", patches)
+    index.discard("session-a")
+    assert index.find("session-a", "knee", "right", 2, (480, 360)) is None
+    assert index.find("session-b", "knee", "right", 7, (480, 360))[0] == "other"
+    assert index._size == 1
+
+
+@pytest.fixture
+def phash_api(api, monkeypatch):
+    import config
+
+    monkeypatch.setattr(config, "PHASH_ENABLED", True)
+    return api
+
+
+def submit(api, session_id, img):
+    response = api.post("/analyze-metric/knee", files={"file": ("knee.jpg", jpeg(img, 95), "image/jpeg")},
+                        data={"session_id": session_id, "side": "right", "render": "none"})
+    assert response.status_code == 202
+    return api.get(f"/sessions/{session_id}/results").json()["results"]["knee"]
+
+
+def test_session_retakes(phash_api):
+    api = phash_api
+    img, landmarks = scene()
+    moved, moved_landmarks = scene(knee_shift_px=20)
+    api.backend.landmarks = landmarks
+    session = api.post("/sessions", files={"knee": ("knee.jpg", jpeg(img, 95), "image/jpeg")},
+                       data={"side": "right", "render": "none"}).json()
+    assert session["results"]["knee"]["angle"] == pytest.approx(180.0, abs=0.5)
+
+    # The bent knee matches the hash but not the joints: inference runs and measures the new angle
+    api.backend.landmarks = moved_landmarks
+    result = submit(api, session["session_id"], moved)
+    assert api.backend.calls == 2
+    assert "near_duplicate" not in result
+    assert result["angle"] < 160
+
+    # A re-encoded copy of the first frame reuses its landmarks without inference
+    api.backend.landmarks = None
+    result = submit(api, session["session_id"], reencode(img, 70))
+    assert api.backend.calls == 2
+    assert result["near_duplicate"]["joint_difference"] < 3
+    assert result["angle"] == pytest.approx(180.0, abs=0.5)
+
+
+def test_no_reuse_outside_the_session(phash_api):
+    api = phash_api
+    img, landmarks = scene()
+    api.backend.landmarks = landmarks
+    api.post("/sessions", files={"knee": ("knee.jpg", jpeg(img, 95), "image/jpeg")},
+             data={"side": "right", "render": "none"})
+    other = api.post("/sessions", files={"knee": ("knee.jpg", jpeg(reencode(img, 70), 95), "image/jpeg")},
+                     data={"side": "right", "render": "none"}).json()
+    assert "near_duplicate" not in other["results"]["knee"]
+    response = api.post("/analyze-metrics", files={"knee": ("knee.jpg", jpeg(reencode(img, 60), 95), "image/jpeg")},
+                        data={"side": "right", "render": "none"}).json()
+    assert "near_duplicate" not in response["knee"]
+    assert api.backend.calls == 3
+
+
+def test_disabled_by_default(api):
+    img, landmarks = scene()
+    api.backend.landmarks = landmarks
+    session = api.post("/sessions", files={"knee": ("knee.jpg", jpeg(img, 95), "image/jpeg")},
+                       data={"side": "right", "render": "none"}).json()
+    result = submit(api, session["session_id"], reencode(img, 70))
+    assert "near_duplicate" not in result
+    assert api.backend.calls == 2
@@ -0,0 +1,146 @@
+import os
+import threading
+import time
+from collections import Counter
+
+import pytest
+
+from conftest import jpeg
+from profiler import RequestProfile, StackSampler, format_folded, parse_folded, profiled
+
+
+def spin(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+@pytest.fixture
+def busy_thread():
+    stop = threading.Event()
+    thread = threading.Thread(target=spin, args=(stop,), name="busy_3")
+    thread.start()
+    yield thread
+    stop.set()
+    thread.join()
+
+
+def test_sample_records_running_threads(busy_thread):
+    sampler = StackSampler()
+    for _ in range(20):
+        sampler.sample()
+    busy = [stack for stack in sampler.counts() if stack.startswith("busy;")]
+    assert busy, sampler.counts()
+    assert all("test_profiler.py:spin" in stack for stack in busy)
+    # This thread (the sampler's caller) is never in its own samples
+    assert not any("test_sample_records_running_threads" in stack for stack in sampler.counts())
+    assert sampler.samples == 20
+
+
+def test_idle_threads_are_skipped():
+    event = threading.Event()
+    thread = threading.Thread(target=event.wait, name="idle")
+    thread.start()
+    try:
+        time.sleep(0.05)
+        sampler = StackSampler()
+        sampler.sample()
+        assert not any(stack.startswith("idle;") for stack in sampler.counts())
+    finally:
+        event.set()
+        thread.join()
+
+
+def test_folded_round_trip():
+    counts = Counter({"main;a.py:f;b.py:g": 5, "pose;c.py:h i": 2})
+    text = format_folded(counts)
+    assert text.splitlines()[0] == "main;a.py:f;b.py:g 5"
+    assert parse_folded(text + "garbage\n") == counts
+
+
+def test_windows_rotate(busy_thread):
+    sampler = StackSampler(interval=0.005, window_seconds=0.05)
+    sampler.start()
+    time.sleep(0.3)
+    sampler.stop()
+    # Only the last one to two windows are kept
+    assert 0 < sum(sampler.counts().values()) < sampler.samples * 2
+
+
+def test_overhead_stretches_interval(busy_thread):
+    sampler = StackSampler(interval=0.001, max_overhead=1e-9)
+    sampler.start()
+    time.sleep(0.2)
+    sampler.stop()
+    assert sampler.interval > 0.001
+    assert sampler.overhead > 0
+
+
+def test_snapshots_merge_across_workers(tmp_path):
+    sampler = StackSampler(snapshot_dir=str(tmp_path), window_seconds=60)
+    sampler._current["self;a.py:f"] = 3
+    (tmp_path / "99999.folded").write_text("other;b.py:g 4\n")
+    stale = tmp_path / "99998.folded"
+    stale.write_text("gone;c.py:h 1\n")
+    os.utime(stale, (time.time() - 1000, time.time() - 1000))
+
+    sampler.flush()
+    assert parse_folded((tmp_path / f"{os.getpid()}.folded").read_text()) == {"self;a.py:f": 3}
+    assert sampler.all_workers() == {"self;a.py:f": 3, "other;b.py:g": 4}
+
+
+def test_request_profile_merges_threads():
+    profile = RequestProfile()
+
+    def work(n):
+        return sum(range(n))
+
+    threads = [threading.Thread(target=profile.run, args=(work, 10000)) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    report = profile.report()
+    entry = next(f for f in report["functions"] if f["function"].endswith(":work"))
+    assert entry["calls"] == 3
+    assert report["wall_ms"] > 0
+
+
+def test_profiled_without_active_profile():
+    fn = lambda: 1  # noqa: E731
+    assert profiled(fn) is fn
+
+
+def test_profile_endpoints(api, frame, monkeypatch):
+    import config
+    import main
+
+    files = {"knee": ("knee.jpg", jpeg(frame), "image/jpeg")}
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "")
+    assert api.get("/admin/profile").status_code == 404
+    monkeypatch.setattr(config, "ADMIN_TOKEN", "secret")
+    assert api.get("/admin/profile", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert api.post("/analyze-metrics", files=files, data={"render": "none"},
+                    headers={"X-Profile": "1"}).status_code == 403
+
+    response = api.post("/analyze-metrics", files=files, data={"render": "none"},
+                        headers={"X-Profile": "1", "X-Admin-Token": "secret"})
+    assert response.status_code == 200
+    functions = [f["function"] for f in response.json()["profile"]["functions"]]
+    assert any(name.endswith(":_run_stages") for name in functions)
+
+    monkeypatch.setattr(main, "stack_sampler", StackSampler())
+    main.stack_sampler._current["pose;main.py:build_metric_result"] = 7
+    response = api.get("/admin/profile", params={"workers": "self"}, headers={"X-Admin-Token": "secret"})
+    assert response.text == "pose;main.py:build_metric_result 7\n"
+    assert api.get("/admin/profile", params={"workers": "some"},
+                   headers={"X-Admin-Token": "secret"}).status_code == 400
+
+
+class Python310Code:
+    """The attributes of a code object before Python 3.11, which has no co_qualname."""
+    co_filename = "/srv/app/main.py"
+    co_name = "build_metric_result"
+
+
+def test_label_without_qualname():
+    assert StackSampler()._label(Python310Code()) == "main.py:build_metric_result"
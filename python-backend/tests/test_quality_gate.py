@@ -0,0 +1,65 @@
+import cv2
+import numpy as np
+import pytest
+
+import quality_gate
+from conftest import jpeg
+from quality_gate import QualityThresholds
+
+
+def checks(img):
+    return [failure["check"] for failure in quality_gate.check(quality_gate.measure(img), QualityThresholds())]
+
+
+def test_textured_frame_passes(frame):
+    assert checks(frame) == []
+
+
+def test_small_frame(frame):
+    assert "resolution" in checks(frame[:150, :150])
+
+
+def test_blurred_frame(frame):
+    assert "blur" in checks(cv2.GaussianBlur(frame, (0, 0), 6))
+
+
+@pytest.mark.parametrize("scale, offset", [(0.1, 0), (0.1, 230)])
+def test_exposure(frame, scale, offset):
+    img = (frame * scale + offset).astype(np.uint8)
+    assert "exposure" in checks(img)
+
+
+def test_sparse_frame():
+    img = np.full((400, 400, 3), 120, np.uint8)
+    cv2.rectangle(img, (190, 190), (210, 210), (250, 250, 250), -1)
+    measurements = quality_gate.measure(img)
+    assert measurements["coverage"] < 0.1
+    assert "coverage" in checks(img)
+
+
+def test_failure_details(frame):
+    failures = quality_gate.check(quality_gate.measure(frame[:150, :150]), QualityThresholds())
+    assert failures[0] == {"check": "resolution", "value": 150.0, "threshold": 200,
+                           "message": failures[0]["message"]}
+    assert failures[0]["message"]
+
+
+def test_api_rejects_before_inference(api, frame):
+    blurred = cv2.GaussianBlur(frame, (0, 0), 6)
+    result = api.post("/analyze-metrics", files={"knee": ("knee.jpg", jpeg(blurred), "image/jpeg")},
+                      data={"render": "none"}).json()["knee"]
+    assert result["status"] == "rejected"
+    assert result["angle"] is None
+    assert "blur" in [reason["check"] for reason in result["reasons"]]
+    assert api.backend.calls == 0
+
+
+def test_api_gate_can_be_disabled(api, frame, monkeypatch):
+    import config
+
+    monkeypatch.setattr(config, "QUALITY_GATE_ENABLED", False)
+    blurred = cv2.GaussianBlur(frame, (0, 0), 6)
+    result = api.post("/analyze-metrics", files={"knee": ("knee.jpg", jpeg(blurred), "image/jpeg")},
+                      data={"render": "none"}).json()["knee"]
+    assert result["angle"] is not None
+    assert api.backend.calls == 1
@@ -0,0 +1,58 @@
+import base64
+
+import cv2
+import numpy as np
+
+from conftest import jpeg
+
+
+def analyze(api, frame, render, **data):
+    return api.post("/analyze-metrics", files={"knee": ("knee.jpg", jpeg(frame), "image/jpeg")},
+                    data={"render": render, **data})
+
+
+def test_render_none_returns_angle_only(api, frame):
+    response = analyze(api, frame, "none")
+    assert response.status_code == 200
+    result = response.json()["knee"]
+    assert abs(result["angle"] - 180.0) < 1.0
+    assert result["image"] is None
+    assert "overlay" not in result
+    assert len(result["keypoints"]) == 33
+
+
+def test_render_vector_returns_overlay(api, frame):
+    result = analyze(api, frame, "vector").json()["knee"]
+    assert result["image"] is None
+    overlay = result["overlay"]
+    assert (overlay["width"], overlay["height"]) == (frame.shape[1], frame.shape[0])
+    assert len(overlay["segments"]) == 2
+    assert overlay["label"]["text"].startswith("knee: ")
+
+
+def test_render_raster_returns_annotated_jpeg(api, frame):
+    result = analyze(api, frame, "raster").json()["knee"]
+    header, data = result["image"].split(",", 1)
+    assert header == "data:image/jpeg;base64"
+    img = cv2.imdecode(np.frombuffer(base64.b64decode(data), np.uint8), cv2.IMREAD_COLOR)
+    assert img.shape == frame.shape
+
+
+def test_render_modes_cached_separately(api, frame):
+    analyze(api, frame, "none")
+    result = analyze(api, frame, "raster").json()["knee"]
+    assert result["image"] is not None
+    assert api.backend.calls == 1  # The landmarks are shared
+
+
+def test_no_pose_without_raster_has_no_image(api, frame):
+    api.backend.landmarks = None
+    result = analyze(api, frame, "vector").json()["knee"]
+    assert result["error"] == "No pose detected"
+    assert result["image"] is None
+
+
+def test_invalid_render_mode(api, frame):
+    response = analyze(api, frame, "svg")
+    assert response.status_code == 400
+    assert "render must be one of" in response.json()["detail"]
@@ -0,0 +1,77 @@
+import threading
+
+import numpy as np
+
+import renderer
+from renderer import build_overlay, get_output_buffer, render_annotations
+
+
+def test_output_buffer_reused_for_same_shape():
+    first = get_output_buffer((120, 160, 3))
+    assert get_output_buffer((120, 160, 3)) is first
+
+
+def test_output_buffer_keeps_one_per_thread():
+    small = get_output_buffer((120, 160, 3))
+    large = get_output_buffer((240, 320, 3))
+    assert large.shape == (240, 320, 3)
+    assert large is not small
+    # The previous shape's buffer is dropped, not kept alongside
+    assert renderer._buffers.buffer is large
+    assert get_output_buffer((120, 160, 3)) is not small
+
+
+def test_output_buffer_not_shared_between_threads():
+    mine = get_output_buffer((64, 64, 3))
+    theirs = []
+    thread = threading.Thread(target=lambda: theirs.append(get_output_buffer((64, 64, 3))))
+    thread.start()
+    thread.join()
+    assert theirs[0] is not mine
+
+
+def test_render_annotations_leaves_input_untouched(frame, landmarks):
+    original = frame.copy()
+    out = render_annotations(frame, landmarks, 172.5, "knee", "left")
+    assert np.array_equal(frame, original)
+    assert out.shape == frame.shape
+    assert not np.array_equal(out, frame)
+
+
+def test_render_annotations_in_place(frame, landmarks):
+    original = frame.copy()
+    out = render_annotations(frame, landmarks, 172.5, "knee", "left", out=frame)
+    assert out is frame
+    assert not np.array_equal(frame, original)
+
+
+def test_render_annotations_without_pose_copies_image(frame):
+    out = render_annotations(frame, None, None, "knee", "left")
+    assert np.array_equal(out, frame)
+
+
+def test_full_skeleton_draws_more_than_metric_limb(frame, landmarks):
+    limb = render_annotations(frame, landmarks, None, "knee", "left").copy()
+    skeleton = render_annotations(frame, landmarks, None, "knee", "left", full_skeleton=True)
+    assert np.count_nonzero(np.any(skeleton != frame, axis=2)) > np.count_nonzero(np.any(limb != frame, axis=2))
+
+
+def test_build_overlay():
+    points = ((100.0, 50.0), (100.0, 150.0), (200.0, 150.0))
+    overlay = build_overlay(points, 90.0, "knee", (300, 400, 3))
+    assert (overlay["width"], overlay["height"]) == (400, 300)
+    assert overlay["segments"] == [[100.0, 50.0, 100.0, 150.0], [100.0, 150.0, 200.0, 150.0]]
+    assert len(overlay["points"]) == 3 and overlay["reference"] is None
+    arc = overlay["arc"]
+    assert arc["center"] == [100.0, 150.0]
+    assert abs((arc["end"] - arc["start"]) % (2 * np.pi) - np.pi / 2) < 1e-3
+    assert overlay["label"]["text"] == "knee: 90.0°"
+
+
+def test_build_overlay_reference_point_and_missing_angle():
+    points = ((100.0, 50.0), (100.0, 150.0), (200.0, 150.0))
+    overlay = build_overlay(points, None, "hipFlexion", (300, 400, 3))
+    assert overlay["reference"] == [200.0, 150.0]
+    assert len(overlay["points"]) == 2
+    assert overlay["arc"] is None and overlay["label"] is None
+    assert build_overlay(None, None, "knee", (300, 400, 3))["segments"] == []
@@ -0,0 +1,66 @@
+import gzip
+
+import numpy as np
+import orjson
+import pytest
+
+import responses
+from conftest import jpeg
+from responses import FastJSONResponse, choose_encoding, dumps, image_payload_bytes
+
+
+def test_dumps_numpy_values():
+    content = {"angle": np.float64(172.25), "count": np.int64(3), "points": np.arange(3, dtype=np.int32),
+               1: "non-str key"}
+    assert orjson.loads(dumps(content)) == {"angle": 172.25, "count": 3, "points": [0, 1, 2], "1": "non-str key"}
+
+
+def test_dumps_numpy_dtypes_orjson_rejects():
+    landmarks = np.array([[0.5, 0.25]], dtype=np.float16)
+    content = {"visibility": np.float16(0.5), "landmarks": landmarks, "single": landmarks[0, :1]}
+    assert orjson.loads(dumps(content)) == {"visibility": 0.5, "landmarks": [[0.5, 0.25]], "single": [0.5]}
+
+
+def test_dumps_rejects_unknown_types():
+    with pytest.raises(TypeError):
+        dumps({"value": object()})
+
+
+def test_image_payload_bytes():
+    content = {"knee": {"image": "data:image/jpeg;base64,AAAA", "keypoints": [{"name": "data:image/x"}]},
+               "label": "knee"}
+    assert image_payload_bytes(content) == len("data:image/jpeg;base64,AAAA")
+
+
+def test_choose_encoding(monkeypatch):
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip;q=1.0") == "gzip"
+    assert choose_encoding("identity") is None
+    assert choose_encoding(None) is None
+    monkeypatch.setattr(responses, "brotli", None)
+    assert choose_encoding("gzip, br") == "gzip"
+
+
+def test_compresses_large_text_bodies():
+    content = {"keypoints": [{"name": f"POINT_{i}", "x": i, "y": i} for i in range(200)]}
+    response = FastJSONResponse(content, accept_encoding="gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert orjson.loads(gzip.decompress(response.body)) == content
+
+
+def test_skips_small_and_image_heavy_bodies():
+    assert "content-encoding" not in FastJSONResponse({"angle": 1.0}, accept_encoding="gzip").headers
+    content = {"image": "data:image/jpeg;base64," + "A" * 4000, "angle": 1.0}
+    response = FastJSONResponse(content, accept_encoding="gzip")
+    assert "content-encoding" not in response.headers
+    assert orjson.loads(response.body) == content
+
+
+def test_api_response_is_orjson(api, frame):
+    response = api.post("/analyze-metrics", files={"knee": ("knee.jpg", jpeg(frame), "image/jpeg")},
+                        data={"render": "none"}, headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.json()["knee"]["angle"] == pytest.approx(180.0, abs=1.0)
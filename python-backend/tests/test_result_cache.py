@@ -0,0 +1,114 @@
+import numpy as np
+import pytest
+
+from result_cache import (MemoryBackend, RedisBackend, SQLiteBackend, TieredCache, content_key, pack_landmarks,
+                          unpack_landmarks)
+
+
+def test_content_key():
+    assert content_key(b"a") == content_key(b"a")
+    assert content_key(b"a") != content_key(b"b")
+    assert len(content_key(b"a")) == 40
+
+
+def test_landmarks_round_trip(landmarks):
+    assert np.array_equal(unpack_landmarks(pack_landmarks(landmarks)), landmarks)
+    assert unpack_landmarks(pack_landmarks(None)) is None
+
+
+def test_memory_lru():
+    cache = MemoryBackend(max_bytes=10)
+    cache.set("a", b"1234")
+    cache.set("b", b"1234")
+    cache.get("a")  # b is now least recently used
+    cache.set("c", b"1234")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1234" and cache.get("c") == b"1234"
+    cache.set("big", b"x" * 11)
+    assert cache.get("big") is None
+    cache.delete("a")
+    assert cache.get("a") is None
+
+
+def test_sqlite_shared_between_instances(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    SQLiteBackend(path, max_bytes=1 << 20).set("key", b"value")
+    other = SQLiteBackend(path, max_bytes=1 << 20)
+    assert other.get("key") == b"value"
+    other.delete("key")
+    assert other.get("key") is None
+
+
+def test_sqlite_evicts_least_recently_used(tmp_path):
+    cache = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_bytes=1000, touch_interval=0)
+    for key in "abcd":
+        cache.set(key, bytes(300))
+    cache.get("a")
+    cache.set("a", bytes(300))  # Replacing a value does not count twice
+    total = cache._conn().execute("SELECT total_bytes FROM meta").fetchone()[0]
+    assert total <= 1000
+    assert cache.get("a") is not None
+    assert cache.get("b") is None
+
+
+class DictRedis:
+    """Just the part of the redis-py client RedisBackend uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+
+def test_redis_prefixes_keys():
+    client = DictRedis()
+    cache = RedisBackend(client, ttl_seconds=60)
+    cache.set("key", b"value")
+    assert client.data == {"pose:key": b"value"}
+    assert cache.get("key") == b"value"
+
+
+class BrokenBackend(MemoryBackend):
+    name = "broken"
+
+    def get(self, key):
+        raise ConnectionError("down")
+
+    def set(self, key, value):
+        raise ConnectionError("down")
+
+
+def test_tiered_backfills_faster_tiers(tmp_path):
+    memory = MemoryBackend(1 << 20)
+    disk = SQLiteBackend(str(tmp_path / "cache.sqlite3"), max_bytes=1 << 20)
+    disk.set("key", b"value")
+    cache = TieredCache([memory, disk])
+    assert cache.get("key", "result") == b"value"
+    assert memory.get("key") == b"value"
+    assert cache.get("missing", "result") is None
+
+
+def test_tiered_treats_errors_as_misses():
+    memory = MemoryBackend(1 << 20)
+    cache = TieredCache([BrokenBackend(1 << 20), memory])
+    cache.set("key", b"value")
+    assert cache.get("key", "result") == b"value"
+    assert TieredCache([]).get("key", "result") is None
+
+
+@pytest.mark.parametrize("render", ["none", "raster"])
+def test_repeat_upload_served_from_cache(api, frame, render):
+    from conftest import jpeg
+
+    body = {"knee": ("knee.jpg", jpeg(frame), "image/jpeg")}
+    first = api.post("/analyze-metrics", files=body, data={"render": render}).json()
+    second = api.post("/analyze-metrics", files=body, data={"render": render}).json()
+    assert api.backend.calls == 1
+    assert second["knee"]["angle"] == first["knee"]["angle"]
@@ -0,0 +1,138 @@
+import sys
+import textwrap
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from server import FAILED, READY, STARTING, StagedApp
+
+INNER_APP = """
+import threading
+
+from fastapi import FastAPI
+
+gate = threading.Event()
+events = []
+
+
+class Pool:
+    def ensure_ready(self):
+        events.append("ensure_ready")
+        return True
+
+
+pose_pool = Pool()
+app = FastAPI()
+
+
+@app.on_event("startup")
+async def startup():
+    events.append("startup")
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    events.append("shutdown")
+
+
+@app.get("/hello")
+async def hello():
+    return {"hello": "world"}
+
+
+@app.get("/readyz")
+async def shadowed():
+    return {"from": "inner"}
+"""
+
+
+@pytest.fixture
+def inner_module(tmp_path, monkeypatch):
+    """Module whose import blocks until gate.release is set."""
+    name = f"staged_inner_{id(tmp_path)}"
+    (tmp_path / "staged_gate.py").write_text("import threading\nrelease = threading.Event()\n")
+    (tmp_path / f"{name}.py").write_text("import staged_gate\nstaged_gate.release.wait(10)\n" + INNER_APP)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    import staged_gate
+
+    yield name, staged_gate.release
+    staged_gate.release.set()
+    for module in (name, "staged_gate"):
+        sys.modules.pop(module, None)
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_serves_health_while_loading_then_forwards(inner_module):
+    name, release = inner_module
+    staged = StagedApp(f"{name}:app")
+    with TestClient(staged) as client:
+        assert client.get("/healthz").json() == {"status": "ok"}
+        response = client.get("/hello")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+        assert response.json()["status"] == STARTING
+        assert client.get("/readyz").status_code == 503
+
+        release.set()
+        wait_for(lambda: staged.state == READY)
+        module = sys.modules[name]
+        assert module.events == ["startup", "ensure_ready"]
+        assert client.get("/hello").json() == {"hello": "world"}
+        ready = client.get("/readyz").json()  # Answered by the staged app, not the inner one
+        assert ready["status"] == READY
+        assert set(ready["stages"]) == {"imported", "started", "ready"}
+    assert module.events[-1] == "shutdown"
+
+
+def test_import_failure_reports_error(tmp_path, monkeypatch):
+    (tmp_path / "staged_broken.py").write_text("raise ImportError('no such model')\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+    staged = StagedApp("staged_broken:app")
+    try:
+        with TestClient(staged) as client:
+            wait_for(lambda: staged.state == FAILED)
+            response = client.get("/readyz")
+            assert response.status_code == 503
+            assert response.json()["error"] == "ImportError: no such model"
+            assert client.get("/anything").status_code == 503
+            assert client.get("/healthz").status_code == 200
+    finally:
+        sys.modules.pop("staged_broken", None)
+
+
+def test_shutdown_waits_for_loading(inner_module):
+    name, release = inner_module
+    staged = StagedApp(f"{name}:app")
+    with TestClient(staged):
+        threading.Timer(0.1, release.set).start()
+    # Shutdown let the import finish and then ran the inner app's shutdown handlers
+    assert sys.modules[name].events == ["startup", "ensure_ready", "shutdown"]
+
+
+def test_failed_inner_startup(tmp_path, monkeypatch):
+    (tmp_path / "staged_bad_startup.py").write_text(textwrap.dedent("""
+        from fastapi import FastAPI
+
+        app = FastAPI()
+
+
+        @app.on_event("startup")
+        async def startup():
+            raise RuntimeError("model checksum mismatch")
+    """))
+    monkeypatch.syspath_prepend(str(tmp_path))
+    staged = StagedApp("staged_bad_startup:app")
+    try:
+        with TestClient(staged) as client:
+            wait_for(lambda: staged.state == FAILED)
+            assert "model checksum mismatch" in client.get("/readyz").json()["error"]
+    finally:
+        sys.modules.pop("staged_bad_startup", None)
@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+import session_store
+from session_store import MetricRecord, Session, SessionStore
+
+
+def image(value: int = 0) -> np.ndarray:
+    return np.full((100, 100, 3), value, dtype=np.uint8)  # 30000 bytes
+
+
+@pytest.fixture
+def store(tmp_path):
+    # Room for one session with one image
+    return SessionStore(ttl_seconds=60, max_memory_bytes=40_000, spill_dir=str(tmp_path))
+
+
+def test_put_and_get_metric(store, landmarks):
+    session = store.create("left", patient_id="p1")
+    store.put_metric(session.session_id, "knee", image(7), landmarks)
+    loaded = store.get(session.session_id)
+    assert loaded.side == "left"
+    assert loaded.patient_id == "p1"
+    np.testing.assert_array_equal(loaded.metrics["knee"].landmarks, landmarks)
+    assert store.stats()["memory_bytes"] == loaded.nbytes
+
+
+def test_least_recently_used_session_spills_and_loads_back(store, landmarks):
+    first = store.create("right")
+    store.put_metric(first.session_id, "knee", image(1), landmarks)
+    second = store.create("right")
+    store.put_metric(second.session_id, "ankle", image(2), None)
+    assert store.stats() == {"in_memory": 1, "spilled": 1, "memory_bytes": second.nbytes}
+
+    loaded = store.get(first.session_id)
+    assert loaded is not None
+    assert int(loaded.metrics["knee"].image[0, 0, 0]) == 1
+    np.testing.assert_array_equal(loaded.metrics["knee"].landmarks, landmarks)
+    # Loading it back spilled the other one
+    assert store.stats()["spilled"] == 1
+
+
+def test_put_metric_into_spilled_session(store, landmarks):
+    first = store.create("right")
+    store.put_metric(first.session_id, "knee", image(1), landmarks)
+    second = store.create("right")
+    store.put_metric(second.session_id, "knee", image(2), landmarks)
+    assert store.stats()["spilled"] == 1
+
+    store.put_metric(first.session_id, "ankle", image(3), None)
+    loaded = store.get(first.session_id)
+    assert sorted(loaded.metrics) == ["ankle", "knee"]
+    assert int(loaded.metrics["knee"].image[0, 0, 0]) == 1
+
+
+def test_put_result_into_spilled_session(store, landmarks):
+    first = store.create("right")
+    store.put_metric(first.session_id, "knee", image(1), landmarks)
+    second = store.create("right")
+    store.put_metric(second.session_id, "knee", image(2), landmarks)
+
+    store.put_result(first.session_id, "knee", {"angle": 12.5, "image": None})
+    assert store.get(first.session_id).results["knee"]["angle"] == 12.5
+
+
+def test_spill_is_written_without_the_lock(store, landmarks, monkeypatch):
+    first = store.create("right")
+    store.put_metric(first.session_id, "knee", image(1), landmarks)
+    savez = np.savez
+    taken_back = []
+
+    def slow_savez(file, **arrays):
+        # Another request takes the session back while its file is written
+        reader = threading.Thread(target=lambda: taken_back.append(store.get(first.session_id)))
+        reader.start()
+        reader.join(5)
+        assert not reader.is_alive()
+        savez(file, **arrays)
+
+    monkeypatch.setattr(session_store.np, "savez", slow_savez)
+    second = store.create("right")
+    store.put_metric(second.session_id, "knee", image(2), landmarks)
+    assert taken_back[0] is first
+    # The stale file was discarded; taking the first session back pushed the second one out in turn
+    assert os.listdir(store.spill_dir) == [f"{second.session_id}.npz"]
+    assert store.stats() == {"in_memory": 1, "spilled": 1, "memory_bytes": first.nbytes}
+    assert int(store.get(first.session_id).metrics["knee"].image[0, 0, 0]) == 1
+
+
+def test_failed_spill_drops_the_session(store, landmarks, monkeypatch):
+    def full_disk(file, **arrays):
+        raise OSError("No space left on device")
+
+    monkeypatch.setattr(session_store.np, "savez", full_disk)
+    first = store.create("right")
+    store.put_metric(first.session_id, "knee", image(1), landmarks)
+    second = store.create("right")
+    store.put_metric(second.session_id, "knee", image(2), landmarks)
+    assert store.get(first.session_id) is None
+    assert os.listdir(store.spill_dir) == []
+    assert store.stats() == {"in_memory": 1, "spilled": 0, "memory_bytes": second.nbytes}
+
+
+def test_unknown_session_raises(store):
+    with pytest.raises(KeyError):
+        store.put_metric("missing", "knee", image(), None)
+    with pytest.raises(KeyError):
+        store.put_result("missing", "knee", {})
+    assert store.get("missing") is None
+
+
+def test_results_count_towards_the_memory_budget(store):
+    session = store.create("right")
+    encoded = "data:image/jpeg;base64," + "A" * 20_000
+    store.put_result(session.session_id, "knee", {"angle": 10.0, "image": encoded})
+    assert session.nbytes > 20_000
+    assert store.stats()["memory_bytes"] == session.nbytes
+
+    # A second session with large results pushes the first one out
+    other = store.create("right")
+    store.put_result(other.session_id, "knee", {"angle": 11.0, "image": encoded})
+    assert store.stats()["spilled"] == 1
+    assert store.get(session.session_id).results["knee"]["image"] == encoded
+
+
+def test_memory_accounting_returns_to_zero(store, landmarks):
+    session = store.create("right")
+    store.put_metric(session.session_id, "knee", image(), landmarks)
+    store.put_metric(session.session_id, "knee", image(), landmarks)  # Replaced, not added
+    store.put_result(session.session_id, "knee", {"image": "x" * 100})
+    assert store.stats()["memory_bytes"] == session.nbytes
+    assert store.delete(session.session_id)
+    assert store.stats()["memory_bytes"] == 0
+
+
+def test_expired_sessions_are_dropped(tmp_path, landmarks):
+    store = SessionStore(ttl_seconds=0, max_memory_bytes=1 << 20, spill_dir=str(tmp_path))
+    session = store.create("right")
+    store.put_metric(session.session_id, "knee", image(), landmarks)
+    time.sleep(0.01)
+    assert store.get(session.session_id) is None
+    assert store.stats()["memory_bytes"] == 0
+
+
+def test_session_nbytes_includes_images_landmarks_and_results(landmarks):
+    session = Session(session_id="s", side="right", expires_at=0)
+    assert session.nbytes == 0
+    session.metrics["knee"] = MetricRecord(image=image(), landmarks=landmarks)
+    assert session.nbytes == 30_000 + landmarks.nbytes
+    session.results["knee"] = {"image": "x" * 1000}
+    assert session.nbytes >= 31_000 + landmarks.nbytes
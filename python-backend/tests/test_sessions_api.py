@@ -0,0 +1,81 @@
+from conftest import jpeg, standing_landmarks
+
+
+def test_create_and_recompute_session(api, frame):
+    response = api.post("/sessions", files={"knee": ("knee.jpg", jpeg(frame), "image/jpeg")},
+                        data={"side": "right", "render": "none"})
+    assert response.status_code == 200
+    body = response.json()
+    angle = body["results"]["knee"]["angle"]
+    assert angle is not None
+    assert api.backend.calls == 1
+
+    response = api.post(f"/sessions/{body['session_id']}/recompute", data={"side": "left", "metrics": "knee"})
+    assert response.status_code == 200
+    assert response.json()["results"]["knee"]["angle"] is not None
+    assert api.backend.calls == 1  # Recomputed from the stored landmarks
+
+
+def test_recompute_unknown_session(api):
+    assert api.post("/sessions/0123/recompute").status_code == 404
+
+
+def test_recompute_after_spill(api, frame, monkeypatch):
+    import main
+    from session_store import SessionStore
+
+    # Room for a single session: the first one is spilled by the second
+    store = SessionStore(ttl_seconds=60, max_memory_bytes=frame.nbytes + 1000, spill_dir=main.session_store.spill_dir)
+    monkeypatch.setattr(main, "session_store", store)
+    first = api.post("/sessions", files={"knee": ("a.jpg", jpeg(frame), "image/jpeg")},
+                     data={"render": "none"}).json()
+    api.backend.landmarks = standing_landmarks(knee_bend=0.1)
+    api.post("/sessions", files={"knee": ("b.jpg", jpeg(frame[::-1].copy()), "image/jpeg")}, data={"render": "none"})
+    assert store.stats()["spilled"] == 1
+
+    response = api.post(f"/sessions/{first['session_id']}/recompute", data={"metrics": "knee"})
+    assert response.status_code == 200
+    assert response.json()["results"]["knee"]["angle"] == first["results"]["knee"]["angle"]
+
+
+def test_delete_session(api, frame):
+    session_id = api.post("/sessions", files={"knee": ("a.jpg", jpeg(frame), "image/jpeg")},
+                          data={"render": "none"}).json()["session_id"]
+    assert api.delete(f"/sessions/{session_id}").status_code == 200
+    assert api.delete(f"/sessions/{session_id}").status_code == 404
+
+
+def test_session_io_and_rendering_run_off_the_event_loop(api, frame, monkeypatch):
+    import threading
+
+    import main
+    from session_store import SessionStore
+
+    loop_thread = api.portal.call(threading.get_ident)
+    threads = {}
+
+    class RecordingStore(SessionStore):
+        def get(self, session_id):
+            threads.setdefault("get", set()).add(threading.get_ident())
+            return super().get(session_id)
+
+        def put_result(self, session_id, metric, result):
+            threads.setdefault("put_result", set()).add(threading.get_ident())
+            return super().put_result(session_id, metric, result)
+
+    def build_metric_result(*args):
+        threads.setdefault("render", set()).add(threading.get_ident())
+        return render(*args)
+
+    render = main.build_metric_result
+    monkeypatch.setattr(main, "session_store", RecordingStore(60, 1 << 30, main.session_store.spill_dir))
+    monkeypatch.setattr(main, "build_metric_result", build_metric_result)
+    session_id = api.post("/sessions", files={"knee": ("knee.jpg", jpeg(frame), "image/jpeg")},
+                          data={"render": "none"}).json()["session_id"]
+    response = api.post(f"/sessions/{session_id}/recompute", data={"render": "raster"})
+    assert response.json()["results"]["knee"]["image"] is not None
+    api.post("/analyze-metric/ankle", files={"file": ("ankle.jpg", jpeg(frame), "image/jpeg")},
+             data={"session_id": session_id, "render": "none"})
+    assert api.get(f"/sessions/{session_id}/results").json()["results"]["ankle"]["angle"] is not None
+    assert sorted(threads) == ["get", "put_result", "render"]
+    assert all(loop_thread not in idents for idents in threads.values())
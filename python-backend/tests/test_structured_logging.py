@@ -0,0 +1,175 @@
+import asyncio
+import io
+import logging
+import queue
+import sys
+
+import orjson
+import pytest
+
+import structured_logging
+from metrics import registry
+from structured_logging import (ContextFilter, DroppingQueueHandler, JsonFormatter, RequestContextMiddleware,
+                                SamplingFilter, TextFormatter, bind_request, parse_sample_rates, record_stage,
+                                unbind_request)
+
+
+def make_record(msg="hello %s", args=("world",), level=logging.INFO, **extra):
+    record = logging.LogRecord("test", level, __file__, 1, msg, args, None)
+    ContextFilter().filter(record)
+    record.__dict__.update(extra)
+    return record
+
+
+@pytest.fixture
+def bound():
+    tokens = bind_request("req-1")
+    yield
+    unbind_request(tokens)
+
+
+def test_json_line_carries_context(bound):
+    record_stage("decode", 0.001)
+    record_stage("infer", 0.010)
+    record_stage("decode", 0.002)
+    entry = orjson.loads(JsonFormatter().format(make_record(patient="p1")))
+    assert entry["msg"] == "hello world"
+    assert entry["level"] == "INFO"
+    assert entry["request_id"] == "req-1"
+    assert entry["stage_ms"] == {"decode": 3.0, "infer": 10.0}
+    assert entry["patient"] == "p1"
+
+
+def test_timings_are_a_snapshot(bound):
+    record_stage("decode", 0.001)
+    record = make_record()
+    record_stage("infer", 0.5)  # Later stages are not in the earlier line
+    assert "infer" not in TextFormatter().format(record)
+
+
+def test_text_line():
+    line = TextFormatter().format(make_record())
+    assert line == "INFO:test:hello world"
+    tokens = bind_request("req-2")
+    try:
+        assert TextFormatter().format(make_record()).endswith(" request_id=req-2")
+    finally:
+        unbind_request(tokens)
+
+
+def test_exception_in_json():
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = logging.LogRecord("test", logging.ERROR, __file__, 1, "failed", (), sys.exc_info())
+    assert "ValueError: boom" in orjson.loads(JsonFormatter().format(record))["exc"]
+
+
+def test_parse_sample_rates():
+    assert parse_sample_rates("debug=0.01, INFO=0.5") == {logging.DEBUG: 0.01, logging.INFO: 0.5}
+    assert parse_sample_rates("") == {}
+    with pytest.raises(ValueError):
+        parse_sample_rates("LOUD=1")
+    with pytest.raises(ValueError):
+        parse_sample_rates("INFO")
+
+
+def test_sampling_keeps_or_drops_a_request_together():
+    sampling = SamplingFilter({logging.INFO: 0.5})
+    kept = set()
+    for n in range(200):
+        request_id = f"req-{n}"
+        decisions = {sampling.filter(make_record(request_id=request_id)) for _ in range(3)}
+        assert len(decisions) == 1
+        kept |= decisions
+    assert kept == {True, False}
+    assert sampling.filter(make_record(level=logging.WARNING, request_id="any"))
+    assert SamplingFilter({logging.DEBUG: 0.0}).filter(make_record(level=logging.INFO))
+
+
+def dropped():
+    return sum(registry.snapshot()["counters"].get("log_records_dropped_total", {}).values())
+
+
+def test_full_queue_drops():
+    handler = DroppingQueueHandler(queue.Queue(maxsize=1))
+    before = dropped()
+    handler.emit(make_record())
+    handler.emit(make_record())
+    assert handler.queue.qsize() == 1
+    assert dropped() == before + 1
+    assert handler.queue.get_nowait().args == ("world",)  # Not formatted on the caller's thread
+
+
+def test_configure_writes_through_listener():
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level, logging.logProcesses, logging.logMultiprocessing
+    stream = io.StringIO()
+    listener = structured_logging.configure("INFO", "json", {logging.DEBUG: 0.0}, stream=stream)
+    try:
+        # Only the handler side is tuned; callers are still located
+        assert logging.getLogger("app").findCaller()[0] == __file__
+        logging.getLogger("app").info("value %d", 42, extra={"stage": "x"})
+        logging.getLogger("app").debug("sampled out")
+    finally:
+        structured_logging.shutdown(listener)
+        structured_logging.shutdown(listener)  # Safe twice
+        root.handlers[:], logging.logProcesses, logging.logMultiprocessing = saved[0], saved[2], saved[3]
+        root.setLevel(saved[1])
+    lines = [orjson.loads(line) for line in stream.getvalue().splitlines()]
+    assert [(line["msg"], line["stage"]) for line in lines] == [("value 42", "x")]
+
+
+class Recorder(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+def test_middleware_binds_and_echoes_request_id():
+    seen = []
+
+    async def app(scope, receive, send):
+        seen.append(structured_logging.request_id_var.get())
+        record_stage("infer", 0.25)
+        await send({"type": "http.response.start", "status": 201, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    logger = logging.getLogger("test-access")
+    recorder = Recorder()
+    logger.addHandler(recorder)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    logger.addFilter(ContextFilter())
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    async def run(headers):
+        scope = {"type": "http", "method": "GET", "path": "/x", "headers": headers}
+        await RequestContextMiddleware(app, logger)(scope, None, send)
+
+    try:
+        asyncio.run(run([(b"x-request-id", b"abc")]))
+        asyncio.run(run([]))
+    finally:
+        logger.removeHandler(recorder)
+
+    assert seen[0] == "abc" and len(seen[1]) == 16
+    assert (b"x-request-id", b"abc") in messages[0]["headers"]
+    record = recorder.records[0]
+    assert record.getMessage() == "GET /x 201"
+    assert record.request_id == "abc"
+    assert "duration_ms" in record.__dict__
+    assert orjson.loads(JsonFormatter().format(record))["stage_ms"] == {"infer": 250.0}
+    assert structured_logging.request_id_var.get() is None
+
+
+def test_api_echoes_request_id(api):
+    response = api.get("/", headers={"X-Request-ID": "from-client"})
+    assert response.headers["x-request-id"] == "from-client"
+    assert api.get("/").headers["x-request-id"]
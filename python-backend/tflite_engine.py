@@ -0,0 +1,234 @@
+import logging
+import math
+import time
+from typing import Dict, Optional
+
+import cv2
+import numpy as np
+
+from pose_backends import PoseBackend
+
+logger = logging.getLogger(__name__)
+
+# BlazePose run directly through the TFLite interpreter, without a MediaPipe
+# graph: the same two models and the same pre/post-processing as
+# mp.solutions.pose in static image mode, without the graph's scheduling and
+# packet overhead. Nearly all the time is spent in the interpreter, and
+# batching several images per invoke measured no faster per image than single
+# calls, so the engine runs one image at a time.
+#
+#   detector  224x224 letterbox in [-1, 1] -> SSD boxes over 2254 anchors,
+#             weighted NMS keeping the best person
+#   ROI       centered on the hip keypoint, side 2.5x the hip-to-body-center
+#             distance, rotated to make the body upright
+#   landmarks 256x256 crop in [0, 1] -> 39 landmarks refined from the
+#             heatmap, projected back; the first 33 are returned
+#
+# Output is the (33, 4) float32 x, y, z, visibility array of the other pose
+# backends (pose_backends.py). Crops are sampled the way MediaPipe samples them;
+# given MediaPipe's own crop, the landmark stage agrees to about 0.001 of the
+# image size. The detector's keypoints differ slightly from those of the
+# TFLite build bundled with MediaPipe, and the crop amplifies that: on person
+# photos and video frames (benchmarks/bench_tflite_engine.py) x and y differ
+# by 0.01 on average and by up to 0.12 for single landmarks, and visibility
+# by 0.016 on average. Joint angles agree to about a degree.
+#
+# Models load by path, so the interpreter memory-maps them (see
+# model_registry.py). XNNPACK can be turned off to compare against the
+# reference kernels. An engine is not thread-safe; use one per thread, as
+# with Pose objects.
+
+DETECTOR_SIZE = 224
+LANDMARK_SIZE = 256
+HEATMAP_KERNEL = 7
+NUM_LANDMARKS = 39  # 33 pose landmarks and 6 auxiliary ones
+NMS_IOU = 0.3
+
+
+def _interpreter_module():
+    """:raises RuntimeError: if no TFLite interpreter is installed"""
+    for name in ("ai_edge_litert.interpreter", "tflite_runtime.interpreter"):
+        try:
+            return __import__(name, fromlist=["Interpreter"])
+        except ImportError:
+            continue
+    raise RuntimeError("The tflite engine requires a TFLite interpreter (pip install tflite-runtime)")
+
+
+# Detector feature maps: (stride, anchors per cell). Strides 8, 16, 32, 32, 32 with
+# 2 anchors per layer; layers with the same stride share a grid.
+ANCHOR_GRIDS = ((8, 2), (16, 2), (32, 6))
+
+
+def ssd_anchors() -> np.ndarray:
+    """(2254, 2) anchor centers of the pose detector, as SsdAnchorsCalculator generates them."""
+    centers = []
+    for stride, per_cell in ANCHOR_GRIDS:
+        cells = DETECTOR_SIZE // stride
+        ys, xs = np.mgrid[0:cells, 0:cells]
+        grid = np.stack([(xs + 0.5) / cells, (ys + 0.5) / cells], axis=-1).reshape(-1, 1, 2)
+        centers.append(np.repeat(grid, per_cell, axis=1).reshape(-1, 2))
+    return np.concatenate(centers).astype(np.float32)
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -80, 80)))
+
+
+def _warp(img_rgb: np.ndarray, roi, size: int, border: int, out: np.ndarray) -> None:
+    """
+    Rotated square ROI (center x, y and side in pixels, rotation) resampled into
+    out (size x size x 3, [0, 1]). Like MediaPipe's ImageToTensor, the output's
+    corners map to the ROI's corners and pixels are sampled bilinearly without
+    prefiltering; the detector is sensitive to the difference.
+    """
+    cx, cy, side, rotation = roi
+    cos, sin = math.cos(rotation), math.sin(rotation)
+    k = side / size
+    # Maps output pixels to image pixels
+    matrix = np.array([
+        [cos * k, -sin * k, cx - (cos - sin) * side / 2],
+        [sin * k, cos * k, cy - (sin + cos) * side / 2],
+    ], dtype=np.float64)
+    crop = cv2.warpAffine(img_rgb, matrix, (size, size), flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                          borderMode=border, borderValue=0)
+    np.multiply(crop, 1 / 255, out=out, dtype=np.float32)
+
+
+class TFLiteLandmarkEngine(PoseBackend):
+    def __init__(self, detector_path: str, landmark_path: str, num_threads: int = 1, use_xnnpack: bool = True,
+                 min_detection_confidence: float = 0.5, min_presence_confidence: float = 0.5):
+        """:raises RuntimeError: if no TFLite interpreter is installed"""
+        self._tflite = _interpreter_module()
+        self._resolver = self._tflite.OpResolverType.AUTO if use_xnnpack else \
+            self._tflite.OpResolverType.BUILTIN_WITHOUT_DEFAULT_DELEGATES
+        self.paths = {"detector": detector_path, "landmarks": landmark_path}
+        self.num_threads = num_threads
+        self.min_detection_confidence = min_detection_confidence
+        self.min_presence_confidence = min_presence_confidence
+        self.anchors = ssd_anchors()
+        started = time.perf_counter()
+        self._interpreters = {model: self._load(model) for model in self.paths}
+        logger.info("TFLite pose engine loaded in %.1f ms (%d threads, xnnpack %s)",
+                    (time.perf_counter() - started) * 1000, num_threads, "on" if use_xnnpack else "off")
+
+    def _load(self, model: str):
+        interpreter = self._tflite.Interpreter(model_path=self.paths[model], num_threads=self.num_threads,
+                                               experimental_op_resolver_type=self._resolver)
+        interpreter.allocate_tensors()
+        return interpreter
+
+    def _run(self, model: str, tensor: np.ndarray) -> Dict[str, np.ndarray]:
+        """Outputs by name, without the batch dimension, for one input of the model's shape."""
+        interpreter = self._interpreters[model]
+        interpreter.set_tensor(interpreter.get_input_details()[0]["index"], tensor[None])
+        interpreter.invoke()
+        return {d["name"]: interpreter.get_tensor(d["index"])[0] for d in interpreter.get_output_details()}
+
+    # Detection
+
+    @staticmethod
+    def _letterbox(img_rgb: np.ndarray, out: np.ndarray):
+        """Fit the image into out (224x224x3, [-1, 1]) keeping its aspect; returns the normalized padding."""
+        h, w = img_rgb.shape[:2]
+        side = max(w, h)
+        _warp(img_rgb, (w / 2, h / 2, side, 0.0), DETECTOR_SIZE, cv2.BORDER_CONSTANT, out)
+        out *= 2.0
+        out -= 1.0
+        return (side - w) / 2 / side, (side - h) / 2 / side, w / side, h / side
+
+    def _decode_detection(self, raw: np.ndarray, logits: np.ndarray, padding) -> Optional[np.ndarray]:
+        """(2, 2) normalized image coordinates of the hip center and body-center keypoints of the best person."""
+        scores = _sigmoid(logits)
+        candidates = np.flatnonzero(scores >= self.min_detection_confidence)
+        if candidates.size == 0:
+            return None
+        raw = raw[candidates] / DETECTOR_SIZE
+        anchors = self.anchors[candidates]
+        scores = scores[candidates]
+        centers = raw[:, 0:2] + anchors
+        sizes = raw[:, 2:4]
+        keypoints = raw[:, 4:8].reshape(-1, 2, 2) + anchors[:, None, :]
+
+        # Weighted NMS, first cluster only: average everything overlapping the best box
+        mins, maxs = centers - sizes / 2, centers + sizes / 2
+        best = int(np.argmax(scores))
+        inter = np.clip(np.minimum(maxs, maxs[best]) - np.maximum(mins, mins[best]), 0, None).prod(axis=1)
+        union = sizes.prod(axis=1) + sizes[best].prod() - inter
+        cluster = inter / np.maximum(union, 1e-9) > NMS_IOU
+        cluster[best] = True
+        weights = scores[cluster] / scores[cluster].sum()
+        points = (keypoints[cluster] * weights[:, None, None]).sum(axis=0)
+
+        # Remove the letterbox
+        left, top, width, height = padding
+        return (points - (left, top)) / (width, height)
+
+    # Landmarks
+
+    @staticmethod
+    def _roi(points: np.ndarray, image_shape):
+        """Center (px), side (px) and rotation of the landmark crop, as pose_detection_to_roi computes them."""
+        h, w = image_shape[:2]
+        (x0, y0), (x1, y1) = points[0] * (w, h), points[1] * (w, h)
+        side = 2 * math.hypot(x1 - x0, y1 - y0) * 1.25
+        rotation = math.pi / 2 - math.atan2(-(y1 - y0), x1 - x0)
+        rotation -= 2 * math.pi * math.floor((rotation + math.pi) / (2 * math.pi))
+        return x0, y0, side, rotation
+
+    @staticmethod
+    def _refine(landmarks: np.ndarray, heatmap: np.ndarray) -> None:
+        """Move x, y (normalized to the crop) to the heatmap-weighted mean around them, as MediaPipe does."""
+        hm_h, hm_w = heatmap.shape[:2]
+        confidence = _sigmoid(heatmap)
+        offset = (HEATMAP_KERNEL - 1) // 2
+        for i, (x, y) in enumerate(landmarks[:, :2]):
+            col, row = int(x * hm_w), int(y * hm_h)
+            if not (0 <= col < hm_w and 0 <= row < hm_h):
+                continue
+            rows = slice(max(0, row - offset), min(hm_h, row + offset + 1))
+            cols = slice(max(0, col - offset), min(hm_w, col + offset + 1))
+            window = confidence[rows, cols, i]
+            total = window.sum()
+            if window.max() < 0.5 or total <= 0:
+                continue
+            ys, xs = np.mgrid[rows, cols]
+            landmarks[i, 0] = (xs * window).sum() / total / hm_w
+            landmarks[i, 1] = (ys * window).sum() / total / hm_h
+
+    def _decode_landmarks(self, raw: np.ndarray, heatmap: np.ndarray, roi, image_shape) -> np.ndarray:
+        h, w = image_shape[:2]
+        values = raw.reshape(NUM_LANDMARKS, 5)
+        landmarks = values[:, :3] / LANDMARK_SIZE
+        self._refine(landmarks, heatmap)
+        cx, cy, side, rotation = roi
+        cos, sin = math.cos(rotation), math.sin(rotation)
+        dx, dy = (landmarks[:, 0] - 0.5) * side, (landmarks[:, 1] - 0.5) * side
+        out = np.empty((33, 4), dtype=np.float32)
+        out[:, 0] = ((cx + cos * dx - sin * dy) / w)[:33]
+        out[:, 1] = ((cy + sin * dx + cos * dy) / h)[:33]
+        out[:, 2] = (landmarks[:33, 2] * side / w)
+        out[:, 3] = _sigmoid(values[:33, 3])
+        return out
+
+    # Inference
+
+    def infer(self, img_rgb: np.ndarray) -> Optional[np.ndarray]:
+        """(33, 4) landmarks of an RGB image, or None if no pose was found."""
+        tensor = np.empty((DETECTOR_SIZE, DETECTOR_SIZE, 3), dtype=np.float32)
+        padding = self._letterbox(img_rgb, tensor)
+        outputs = self._run("detector", tensor)
+        points = self._decode_detection(outputs["Identity"], outputs["Identity_1"][:, 0], padding)
+        if points is None:
+            return None
+
+        roi = self._roi(points, img_rgb.shape)
+        crop = np.empty((LANDMARK_SIZE, LANDMARK_SIZE, 3), dtype=np.float32)
+        _warp(img_rgb, roi, LANDMARK_SIZE, cv2.BORDER_REPLICATE, crop)
+        outputs = self._run("landmarks", crop)
+        if _sigmoid(outputs["Identity_1"].reshape(-1))[0] < self.min_presence_confidence:
+            return None
+        return self._decode_landmarks(outputs["Identity"], outputs["Identity_3"], roi, img_rgb.shape)
+
+    def close(self) -> None:
+        self._interpreters.clear()